@@ -1,4 +1,4 @@
-from db.session import get_session
+from db.session import get_db_session
 
 # For now, this dependency simply yields the DB session.
-db_session = get_session
+db_session = get_db_session
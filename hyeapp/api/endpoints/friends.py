@@ -2,7 +2,8 @@
 Friend-related endpoints.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.friends import (
     GetFriendListResponse,
@@ -11,47 +12,254 @@ from schemas.friends import (
     SendFriendRequestResponse,
     AcceptFriendRequestResponse,
     RemoveFriendResponse,
+    FriendChange,
+    GetFriendChangesResponse,
+    FriendBatchRequest,
+    FriendBatchResult,
+    FriendBatchResponse,
+    FriendSuggestion,
+    GetFriendSuggestionsResponse,
+    GetMutualFriendsResponse,
 )
 import dbcrud.friends as dbcrudfriends
-from db.session import get_db_session
+from db.session import DatabaseUnavailable, get_db_session, query_budget
 import logging
+import time
 from dataclasses import asdict
+from typing import Awaitable, Callable, Optional, Tuple
+from pydantic import BaseModel
 from api.auth import verify_token
+from api.responses import ModelResponse
+from api.etag import make_etag, not_modified, etag_headers
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ModelResponse)
+
+
+async def _not_modified_or_etag(
+    kind: str, request: Request, user_id: str, db: AsyncSession
+) -> Tuple[Optional[Response], str]:
+    """
+    Probe the user's friend list version and build the ETag for `kind`.
+    Returns a 304 response if the client's copy is current, so the list queries can be skipped.
+    The version is read before the list itself: if a write lands in between, the response is
+    tagged with the older version and the next poll simply gets a full response again.
+    """
+    version = await dbcrudfriends.get_friend_list_version(user_id, db)
+    etag = make_etag(kind, user_id, version)
+    return not_modified(request, etag), etag
+
+
+# Set on responses the read endpoints below serve from memory while the database is unavailable,
+# with an Age header (seconds since the value was read from the database).
+STALE_HEADER = "X-Hye-Stale"
+
+
+def _stale_headers(stored_at: float) -> dict:
+    return {STALE_HEADER: "true", "Age": str(int(time.monotonic() - stored_at))}
+
+
+async def _read_or_stale(
+    kind: str,
+    request: Request,
+    user_id: str,
+    db: AsyncSession,
+    read: Callable[[], Awaitable[BaseModel]],
+) -> Response:
+    """
+    Serve one of the user's lists with an ETag (304 when the client's copy is current), keeping
+    the response as the user's last known value. While the database is unavailable (db/session.py's
+    circuit breaker is open, or it cannot be reached) that value is served instead, with its ETag,
+    X-Hye-Stale: true and its Age; without one the 503 goes through.
+    """
+    stale_reads = request.app.state.stale_reads
+    try:
+        not_modified_response, etag = await _not_modified_or_etag(kind, request, user_id, db)
+        if not_modified_response:
+            logger.info("%s of user %s not modified", kind, user_id)
+            return not_modified_response
+        model = await read()
+    except DatabaseUnavailable:
+        cached = stale_reads.get((kind, user_id))
+        if cached is None:
+            raise
+        etag, model, stored_at = cached
+        logger.warning("Database unavailable, serving stale %s of user %s", kind, user_id)
+        response = not_modified(request, etag) or ModelResponse(model, headers=etag_headers(etag))
+        response.headers.update(_stale_headers(stored_at))
+        return response
+    stale_reads.set((kind, user_id), (etag, model, time.monotonic()))
+    return ModelResponse(model, headers=etag_headers(etag))
 
 
 @router.get("/getFriendList", response_model=GetFriendListResponse)
+@query_budget(3)
 async def get_friend_list(
+    request: Request,
     # userId: str,
     token_payload: dict = Depends(verify_token),
     db: AsyncSession = Depends(get_db_session),
 ):
     userId = token_payload["sub"]
-    logging.info(f"Getting friend list for user: {userId}")
-    friends = await dbcrudfriends.get_friend_list(userId, db)
-    logging.info(f"Friend list for user {userId}: {friends}")
-    return GetFriendListResponse(friends=friends)
+    logger.info("Getting friend list for user: %s", userId)
+
+    async def read():
+        friends = await dbcrudfriends.get_friend_list(userId, db)
+        logger.info("Friend list for user %s: %d friends", userId, len(friends))
+        return GetFriendListResponse(friends=friends)
+
+    return await _read_or_stale("friends", request, userId, db, read)
 
 
 @router.get("/getFriendRequestList", response_model=GetFriendRequestListResponse)
+@query_budget(3)
 async def get_friend_request_list(
+    request: Request,
     # userId: str,
     token_payload: dict = Depends(verify_token),
     db: AsyncSession = Depends(get_db_session),
 ):
     userId = token_payload["sub"]
-    logging.info(f"Getting friend request list for user: {userId}")
-    sent, received = await dbcrudfriends.get_friend_request_list(userId, db)
-    logging.info(
-        f"Friend request list for user {userId}: sent: {sent}, received: {received}"
+    logger.info("Getting friend request list for user: %s", userId)
+
+    async def read():
+        sent, received = await dbcrudfriends.get_friend_request_list(userId, db)
+        logger.info(
+            "Friend request list for user %s: %d sent, %d received",
+            userId,
+            len(sent),
+            len(received),
+        )
+        return GetFriendRequestListResponse(requests_sent=sent, requests_received=received)
+
+    return await _read_or_stale("requests", request, userId, db, read)
+
+
+@router.get("/changes", response_model=GetFriendChangesResponse)
+@query_budget(1)
+async def get_friend_changes(
+    since: Optional[int] = Query(default=None, ge=0),
+    limit: int = Query(default=500, ge=1, le=1000),
+    token_payload: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    Delta sync: edges added, accepted or removed after cursor `since`.
+    Call without `since` before downloading the full lists to get the starting cursor.
+    """
+    userId = token_payload["sub"]
+    logger.info("Getting friend changes for user %s since %s", userId, since)
+    changes, next_cursor, has_more, resync_required = (
+        await dbcrudfriends.get_friend_changes(userId, since, limit, db)
+    )
+    logger.info("%d friend changes for user %s", len(changes), userId)
+    return ModelResponse(
+        GetFriendChangesResponse(
+            changes=[FriendChange(**change) for change in changes],
+            next_cursor=next_cursor,
+            has_more=has_more,
+            resync_required=resync_required,
+        )
+    )
+
+
+async def _friend_event_stream(hub, subscription, heartbeat: float):
+    """
+    Server-sent events: "ready" once subscribed, then "friends_changed" whenever the user's friend
+    graph changed (call /changes), and comment lines as heartbeats in between.
+    """
+    try:
+        yield b"event: ready\ndata: {}\n\n"
+        while True:
+            if await subscription.wait(heartbeat):
+                yield b"event: friends_changed\ndata: {}\n\n"
+            else:
+                yield b": heartbeat\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def get_friend_events(
+    request: Request,
+    token_payload: dict = Depends(verify_token),
+):
+    """
+    Live stream replacing polling of /getFriendRequestList and /getFriendList: a
+    "friends_changed" event is sent when a request is sent, accepted or rejected, or a friend
+    removed. Long-running server only (HYE_EVENTS_ENABLED).
+    """
+    settings = request.app.state.settings.events
+    if not settings.ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    userId = token_payload["sub"]
+    hub = request.app.state.friend_events
+    try:
+        subscription = await hub.subscribe(userId)
+    except Exception as e:
+        logger.error("Failed to subscribe to friend events: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Friend events unavailable.",
+        )
+    logger.info("User %s subscribed to friend events", userId)
+    return StreamingResponse(
+        _friend_event_stream(hub, subscription, settings.HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/suggestions", response_model=GetFriendSuggestionsResponse)
+@query_budget(1)
+async def get_friend_suggestions(
+    limit: int = Query(default=20, ge=1, le=100),
+    token_payload: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """People you may know, precomputed offline by batch/friend_suggestions.py."""
+    userId = token_payload["sub"]
+    logger.info("Getting friend suggestions for user: %s", userId)
+    suggestions = await dbcrudfriends.get_friend_suggestions(userId, limit, db)
+    return ModelResponse(
+        GetFriendSuggestionsResponse(
+            suggestions=[FriendSuggestion(**suggestion) for suggestion in suggestions]
+        )
+    )
+
+
+@router.get("/mutual", response_model=GetMutualFriendsResponse)
+@query_budget(4)
+async def get_mutual_friends(
+    request: Request,
+    username: str,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=200),
+    token_payload: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """Friends the user has in common with `username`, paged."""
+    userId = token_payload["sub"]
+    logger.info("Getting mutual friends of user %s and %s", userId, username)
+    mutual = await dbcrudfriends.get_mutual_friends(
+        userId, username, offset, limit, request.app.state.friend_sets, db
+    )
+    if mutual is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+    mutual_friends, mutual_count = mutual
+    next_offset = offset + limit
+    return ModelResponse(
+        GetMutualFriendsResponse(
+            mutual_count=mutual_count,
+            mutual_friends=mutual_friends,
+            next_offset=next_offset if next_offset < mutual_count else None,
+        )
     )
-    return GetFriendRequestListResponse(requests_sent=sent, requests_received=received)
 
 
 @router.post("/sendFriendRequest", response_model=SendFriendRequestResponse)
+@query_budget(4)
 async def send_friend_request(
     # senderId: str,
     content: FriendRequestPostContent,
@@ -59,46 +267,82 @@ async def send_friend_request(
     db: AsyncSession = Depends(get_db_session),
 ):
     senderId = token_payload["sub"]
-    logging.info(f"Sending friend request to user: {content.recipientUsername}")
+    logger.info("Sending friend request to user: %s", content.recipientUsername)
     sent, already_exist = await dbcrudfriends.send_friend_request(
         sender_id=senderId, recipient_username=content.recipientUsername, db=db
     )
-    logging.info(f"Friend request sent to user {content.recipientUsername}: {sent}")
-    return SendFriendRequestResponse(
-        friend_request_sent=sent, friend_request_already_exist=already_exist
+    logger.info("Friend request sent to user %s: %s", content.recipientUsername, sent)
+    return ModelResponse(
+        SendFriendRequestResponse(
+            friend_request_sent=sent, friend_request_already_exist=already_exist
+        )
     )
 
 
 @router.post("/acceptFriendRequest", response_model=AcceptFriendRequestResponse)
+@query_budget(1)
 async def accept_friend_request(
     content: FriendRequestPostContent,
     token_payload: dict = Depends(verify_token),
     db: AsyncSession = Depends(get_db_session),
 ):
     senderId = token_payload["sub"]
-    logging.info(f"Resolving friend request from user: {content.recipientUsername}")
+    logger.info("Resolving friend request from user: %s", content.recipientUsername)
     accepted = await dbcrudfriends.accept_friend_request(
         recipient_id=senderId,
         sender_username=content.recipientUsername,
         accept=content.accept,
         db=db,
     )
-    logging.info(
-        f"Friend request from user {content.recipientUsername} status: {accepted}"
-    )
-    return AcceptFriendRequestResponse(friend_request_accepted=accepted)
+    logger.info("Friend request from user %s status: %s", content.recipientUsername, accepted)
+    return ModelResponse(AcceptFriendRequestResponse(friend_request_accepted=accepted))
 
 
 @router.post("/removeFriend", response_model=RemoveFriendResponse)
+@query_budget(1)
 async def remove_friend(
     content: FriendRequestPostContent,
     token_payload: dict = Depends(verify_token),
     db: AsyncSession = Depends(get_db_session),
 ):
     senderId = token_payload["sub"]
-    logging.info(f"Removing friend: {content.recipientUsername}")
+    logger.info("Removing friend: %s", content.recipientUsername)
     removed = await dbcrudfriends.remove_friend(
         sender_id=senderId, recipient_username=content.recipientUsername, db=db
     )
-    logging.info(f"Friend {content.recipientUsername} removed: {removed}")
-    return RemoveFriendResponse(friend_removed=removed)
+    logger.info("Friend %s removed: %s", content.recipientUsername, removed)
+    return ModelResponse(RemoveFriendResponse(friend_removed=removed))
+
+
+_BATCH_RESULT_MODELS = {
+    "send": SendFriendRequestResponse,
+    "accept": AcceptFriendRequestResponse,
+    "reject": AcceptFriendRequestResponse,
+    "remove": RemoveFriendResponse,
+}
+
+
+@router.post("/batch", response_model=FriendBatchResponse)
+@query_budget(4)
+async def apply_friend_batch(
+    content: FriendBatchRequest,
+    token_payload: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """Send, accept, reject and remove in one request and one transaction."""
+    senderId = token_payload["sub"]
+    logger.info("Applying %d friend operations", len(content.operations))
+    operations = [(item.op, item.recipientUsername) for item in content.operations]
+    results = await dbcrudfriends.apply_friend_batch(senderId, operations, db)
+    return ModelResponse(
+        FriendBatchResponse(
+            results=[
+                FriendBatchResult(
+                    op=op,
+                    recipientUsername=username,
+                    result=_BATCH_RESULT_MODELS[op](**result),
+                )
+                for (op, username), result in zip(operations, results)
+            ]
+        )
+    )
@@ -0,0 +1,69 @@
+"""
+Home screen endpoint: one request for what the app loads on open.
+"""
+
+import asyncio
+import logging
+from dataclasses import asdict
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import sessionmaker
+from schemas.home import HomeResponse
+from schemas.user import UserProfile
+import dbcrud.friends as dbcrudfriends
+import dbcrud.user as dbcruduser
+from db.session import get_session_maker, query_budget
+from api.auth import verify_token
+from api.responses import ModelResponse
+from api.etag import make_etag, not_modified, etag_headers
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(default_response_class=ModelResponse)
+
+
+async def _read(session_maker: sessionmaker, crud_function, user_id: str):
+    async with session_maker() as db:
+        return await crud_function(user_id, db)
+
+
+@router.get("", response_model=HomeResponse)
+@query_budget(6)
+async def home(
+    request: Request,
+    token_payload: dict = Depends(verify_token),
+    session_maker: sessionmaker = Depends(get_session_maker),
+):
+    """
+    Profile, friend list and friend request list in one response, replacing three requests.
+    The token is verified once; the friend list version is probed first (304 if unchanged), then
+    the three reads run concurrently, each on its own pooled connection. The profile is not
+    covered by the version since it cannot change after signup.
+    """
+    userId = token_payload["sub"]
+    logger.info("Getting home screen for user: %s", userId)
+
+    version = await _read(session_maker, dbcrudfriends.get_friend_list_version, userId)
+    etag = make_etag("home", userId, version)
+    not_modified_response = not_modified(request, etag)
+    if not_modified_response:
+        logger.info("Home screen for user %s not modified", userId)
+        return not_modified_response
+
+    profile, friends, (sent, received) = await asyncio.gather(
+        _read(session_maker, dbcruduser.get_user_profile, userId),
+        _read(session_maker, dbcrudfriends.get_friend_list, userId),
+        _read(session_maker, dbcrudfriends.get_friend_request_list, userId),
+    )
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found.")
+
+    return ModelResponse(
+        HomeResponse(
+            version=version,
+            profile=UserProfile(**asdict(profile)),
+            friends=friends,
+            requests_sent=sent,
+            requests_received=received,
+        ),
+        headers=etag_headers(etag),
+    )
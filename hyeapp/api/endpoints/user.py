@@ -9,6 +9,9 @@ from schemas.user import (
     UserProfile,
     UsernameCheckResponse,
     UserEmailCheckResponse,
+    ContactMatchRequest,
+    ContactMatch,
+    ContactMatchResponse,
 )
 from schemas.friends import (
     GetFriendListResponse,
@@ -18,17 +21,19 @@ from schemas.friends import (
 )
 import dbcrud.user as dbcruduser
 import dbcrud.friends as dbcrudfriends
-from db.session import get_db_session
+from db.session import get_db_session, query_budget
 import logging
 from dataclasses import asdict
 from api.auth import verify_token
+from api.responses import ModelResponse
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ModelResponse)
 
 
 @router.post("/signup", response_model=UserProfile, status_code=status.HTTP_201_CREATED)
+@query_budget(2)
 async def signup(
     user: UserCreate,
     # userId: str,
@@ -44,29 +49,50 @@ async def signup(
             # "id": userId,
         },
     )
-    logging.info(f"New user created: {new_user}")
-    return UserProfile(**(asdict(new_user)))
+    logger.info("New user created: %s", new_user)
+    return ModelResponse(
+        UserProfile(**(asdict(new_user))), status_code=status.HTTP_201_CREATED
+    )
 
 
 @router.get("/checkUsername", response_model=UsernameCheckResponse)
+@query_budget(1)
 async def check_username_availability(
     username: str,
     token_payload: dict = Depends(verify_token),
     db: AsyncSession = Depends(get_db_session),
 ):
-    logging.info(f"Checking availability of username: {username}")
+    logger.info("Checking availability of username: %s", username)
     available = await dbcruduser.check_username_availability(username, db)
-    logging.info(f"Username {username} availability: {available}")
-    return UsernameCheckResponse(available=available)
+    logger.info("Username %s availability: %s", username, available)
+    return ModelResponse(UsernameCheckResponse(available=available))
 
 
 @router.get("/checkUserEmailExistence", response_model=UserEmailCheckResponse)
+@query_budget(1)
 async def check_user_email_existence(
     userEmail: str,
     token_payload: dict = Depends(verify_token),
     db: AsyncSession = Depends(get_db_session),
 ):
-    logging.info(f"Checking if user email exists: {userEmail}")
+    logger.info("Checking if user email exists: %s", userEmail)
     exists = await dbcruduser.check_user_email_existence(userEmail, db)
-    logging.info(f"User id {userEmail} existence: {exists}")
-    return UserEmailCheckResponse(exists=exists)
+    logger.info("User id %s existence: %s", userEmail, exists)
+    return ModelResponse(UserEmailCheckResponse(exists=exists))
+
+
+@router.post("/matchContacts", response_model=ContactMatchResponse)
+@query_budget(5, max_repeats=5)
+async def match_contacts(
+    content: ContactMatchRequest,
+    token_payload: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_db_session),
+):
+    """Find friends from the caller's contacts: thousands of hashed emails in one request."""
+    userId = token_payload["sub"]
+    logger.info("Matching %s contacts for user: %s", len(content.emailHashes), userId)
+    matches = await dbcruduser.match_contacts(userId, content.emailHashes, db)
+    logger.info("%s contacts matched for user: %s", len(matches), userId)
+    return ModelResponse(
+        ContactMatchResponse(matches=[ContactMatch(**match) for match in matches])
+    )
@@ -0,0 +1,52 @@
+"""
+Helpers for HTTP conditional GET (ETag / If-None-Match).
+"""
+
+import hashlib
+from typing import Optional
+from fastapi import Request, Response, status
+
+# Clients may keep a copy but must revalidate it (If-None-Match) before every use.
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(kind: str, user_id: str, version: int) -> str:
+    """
+    Strong ETag for a per-user resource at a given version.
+    The user id is hashed in so two users at the same version never share a tag.
+    """
+    digest = hashlib.blake2b(
+        f"{kind}:{user_id}:{version}".encode(), digest_size=8
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """
+    True if the If-None-Match header matches `etag`, i.e. the client copy is current.
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def etag_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the request's If-None-Match matches `etag`, otherwise None."""
+    if if_none_match(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag)
+        )
+    return None
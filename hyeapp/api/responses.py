@@ -0,0 +1,28 @@
+"""
+Response classes shared by all routers.
+"""
+
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from core import tracing
+from core.timing import timed
+
+
+class ModelResponse(JSONResponse):
+    """
+    JSON response rendered in a single pass.
+
+    Endpoints build their response model and return ModelResponse(model): FastAPI passes a returned
+    Response through untouched, so the model is neither re-validated against response_model nor run
+    through jsonable_encoder; pydantic-core writes the JSON bytes directly. Routes keep
+    response_model for the OpenAPI schema. Anything that is not a model (e.g. a dict returned by a
+    route without a model) is rendered with orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"), tracing.span("serialize"):
+            if isinstance(content, BaseModel):
+                return content.__pydantic_serializer__.to_json(content)
+            return orjson.dumps(content)
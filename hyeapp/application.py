@@ -0,0 +1,105 @@
+"""
+Application factory shared by the Lambda handler (main.py) and the uvicorn server (server.py).
+"""
+
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI
+from api.auth import TokenVerifier
+from api.endpoints import user, friends, home
+from core.admission import AdmissionMiddleware
+from core.cache import LRUCache
+from core.config import Settings
+from core.friend_events import FriendEventHub
+from core.friend_graph import FriendSetCache
+from core.loop_health import LoopMonitor
+from core.memory import MemoryMiddleware, MemoryMonitor
+from core.metrics import MetricsMiddleware, MetricsRegistry
+from core.profiling import ProfilingMiddleware
+from core.tracing import TracingMiddleware
+from core.warmup import warmup
+from db.session import Database
+from jobs.handlers import HANDLERS
+from jobs.outbox import JobQueueSink, OutboxDispatcher
+from jobs.queue import JobQueue
+from log.logging_config import LogSamplingMiddleware, setup_logging
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up, start the outbox dispatcher and event loop probe and take the init memory report
+    before serving; on shutdown (long-running servers) finish queued background jobs and release
+    the LISTEN and pooled connections.
+    """
+    await warmup(app)
+    if app.state.settings.outbox.ENABLED:
+        app.state.outbox.start()
+    if app.state.settings.metrics.ENABLED:
+        app.state.loop_monitor.start()
+    if app.state.memory.enabled:
+        app.state.memory.report("init")
+    yield
+    await app.state.loop_monitor.stop()
+    await app.state.outbox.stop()
+    await app.state.jobs.drain(app.state.settings.server.GRACEFUL_SHUTDOWN_SECONDS)
+    await app.state.friend_events.close()
+    await app.state.database.dispose()
+    app.state.metrics.flush()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build an app for `settings` (read from the environment when omitted).
+    Per-configuration resources live on app.state and are resolved by the dependencies:
+    the database (engine and session factory, created on first use), the token verifier
+    (with its signing key caches), the background job queue (transport created on first use),
+    the outbox dispatcher, the friend event hub, the metrics registry (with the pool and event loop
+    health probes) and the in-process caches. Nothing here opens a connection or does network I/O.
+    """
+    settings = settings or Settings()
+    setup_logging(settings.logging)
+
+    app = FastAPI(title="HYE", version="1.0.0", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.metrics = MetricsRegistry(settings.metrics)
+    app.state.memory = MemoryMonitor(settings.memory, app.state.metrics)
+    # Started before the app's resources are built, so tracemalloc attributes them.
+    app.state.memory.start()
+    metrics = app.state.metrics if settings.metrics.ENABLED else None
+    app.state.database = Database(settings.db, metrics)
+    app.state.verifier = TokenVerifier(settings.auth)
+    app.state.friend_events = FriendEventHub(settings.db)
+    app.state.friend_sets = FriendSetCache(settings.cache.FRIEND_SET_CACHE_SIZE)
+    app.state.stale_reads = LRUCache(settings.cache.STALE_READ_CACHE_SIZE)
+    app.state.jobs = JobQueue(settings.jobs, HANDLERS, app.state)
+    app.state.outbox = OutboxDispatcher(
+        app.state.database, JobQueueSink(app.state.jobs), settings.outbox
+    )
+    app.state.loop_monitor = LoopMonitor(app.state.metrics, settings.metrics)
+
+    # Added first, so it runs innermost: shed requests are still timed and traced.
+    if settings.admission.MAX_CONCURRENCY > 0:
+        app.add_middleware(AdmissionMiddleware, config=settings.admission, registry=metrics)
+    if settings.metrics.ENABLED or settings.metrics.SERVER_TIMING != "off":
+        app.add_middleware(MetricsMiddleware, registry=metrics, config=settings.metrics)
+    if settings.profiling.RATE > 0 or settings.profiling.SECRET:
+        app.add_middleware(ProfilingMiddleware, config=settings.profiling)
+    if settings.logging.SAMPLE_RATES:
+        app.add_middleware(LogSamplingMiddleware, rates=settings.logging.SAMPLE_RATES)
+    if app.state.memory.enabled:
+        app.add_middleware(MemoryMiddleware, monitor=app.state.memory)
+    if settings.tracing.EXPORTER != "off":
+        app.add_middleware(TracingMiddleware, config=settings.tracing)
+
+    # Include our user routes under the "/users" path.
+    app.include_router(user.router, prefix="/users", tags=["users"])
+    app.include_router(friends.router, prefix="/friends", tags=["friends"])
+    app.include_router(home.router, prefix="/home", tags=["home"])
+
+    @app.get("/health", include_in_schema=False)
+    async def health():
+        """Liveness check for load balancer target groups; touches neither auth nor the database."""
+        return {"status": "ok"}
+
+    return app
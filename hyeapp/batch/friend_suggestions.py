@@ -0,0 +1,229 @@
+"""
+Offline job computing friend-of-friend suggestions ("people you may know").
+
+    python -m batch.friend_suggestions [--top-k 20] [--block-rows 5000]
+
+The users and the accepted friendships and pending requests are read under one REPEATABLE READ
+snapshot, and the friendships are streamed into a symmetric sparse adjacency matrix A.
+Mutual friend counts are the entries of A·A, computed one block of rows at a time so memory
+stays bounded by the block, not by the square of the graph. Existing friends, pending requests
+(either direction) and the user themself are masked out, and the top-K per user are written to
+friend_suggestions (db/sql/004_friend_suggestions.sql), replacing that user's previous rows.
+Needs numpy and scipy (batch/requirements.txt).
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Iterator, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy.sql import text
+
+from core.config import Settings
+from db.session import Database
+from log.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+FETCH_USER_IDS = text("SELECT id FROM users")
+
+FETCH_EDGES = text(
+    """
+    SELECT sender_id, recipient_id FROM friends WHERE status = :status
+"""
+)
+
+COUNT_EDGES = text(
+    """
+    SELECT COUNT(*) FROM friends WHERE status = :status
+"""
+)
+
+DELETE_SUGGESTIONS_FOR_USERS = text(
+    """
+    DELETE FROM friend_suggestions WHERE user_id = ANY(CAST(:user_ids AS TEXT[]))
+"""
+)
+
+INSERT_SUGGESTIONS = text(
+    """
+    INSERT INTO friend_suggestions (user_id, rank, suggested_id, mutual_count, computed_at)
+    SELECT user_id, rank, suggested_id, mutual_count, :computed_at
+    FROM unnest(
+        CAST(:user_ids AS TEXT[]),
+        CAST(:ranks AS SMALLINT[]),
+        CAST(:suggested_ids AS TEXT[]),
+        CAST(:mutual_counts AS INTEGER[])
+    ) AS s(user_id, rank, suggested_id, mutual_count)
+"""
+)
+
+DELETE_STALE_SUGGESTIONS = text(
+    """
+    DELETE FROM friend_suggestions WHERE computed_at < :computed_at
+"""
+)
+
+
+def build_matrix(row: np.ndarray, col: np.ndarray, n: int, symmetric: bool) -> sp.csr_matrix:
+    """Boolean n x n CSR matrix from (row, column) index arrays."""
+    if symmetric:
+        row, col = np.concatenate([row, col]), np.concatenate([col, row])
+    data = np.ones(len(row), dtype=np.int32)
+    matrix = sp.csr_matrix((data, (row, col)), shape=(n, n), dtype=np.int32)
+    # Duplicate edges would be summed; the graph is a simple graph.
+    matrix.data[:] = 1
+    return matrix
+
+
+def top_k_mutual_friends(
+    adjacency: sp.csr_matrix, pending: sp.csr_matrix, k: int, block_rows: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Yield (block_users, users, ranks, suggested, mutual_counts) per block of rows, where
+    block_users are all row indices of the block and the other arrays list each user's top-k
+    suggestions: rank 0 is the most mutual friends, ties broken by the lower index.
+    """
+    n = adjacency.shape[0]
+    exclude = (adjacency + pending + pending.T).tocsr()
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        m = stop - start
+        mutual = (adjacency[start:stop] @ adjacency).tocsr()
+
+        # Mask out the user themself, existing friends and pending requests either way.
+        identity = sp.csr_matrix(
+            (np.ones(m, dtype=np.int32), (np.arange(m), np.arange(start, stop))), shape=(m, n)
+        )
+        mask = (exclude[start:stop] + identity).astype(bool).astype(np.int32)
+        mutual = (mutual - mutual.multiply(mask)).tocsr()
+        mutual.eliminate_zeros()
+
+        # Vectorised per-row top-k: sort by (row, count desc, column), rank within the row.
+        rows = np.repeat(np.arange(m), np.diff(mutual.indptr))
+        order = np.lexsort((mutual.indices, -mutual.data, rows))
+        rows, cols, counts = rows[order], mutual.indices[order], mutual.data[order]
+        ranks = np.arange(len(order)) - mutual.indptr[rows]
+        keep = ranks < k
+        yield (
+            np.arange(start, stop),
+            rows[keep] + start,
+            ranks[keep],
+            cols[keep],
+            counts[keep],
+        )
+
+
+async def _load_user_ids(conn) -> np.ndarray:
+    result = await conn.stream(FETCH_USER_IDS)
+    ids = [user_id async for (user_id,) in result]
+    return np.sort(np.array(ids, dtype=str))
+
+
+def _user_indices(user_ids: np.ndarray, ids) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of `ids` in the sorted `user_ids`, and a mask of the ids that are in it;
+    searchsorted alone would map an unknown id to a neighbouring index (or to n).
+    """
+    values = np.array(ids, dtype=str)
+    indices = np.searchsorted(user_ids, values)
+    known = indices < len(user_ids)
+    known[known] = user_ids[indices[known]] == values[known]
+    return indices.astype(np.int32), known
+
+
+async def _load_edges(
+    conn, status: str, user_ids: np.ndarray, fetch_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (sender, recipient) index arrays for friends rows with `status`. The rows are streamed in
+    chunks of `fetch_size` straight into arrays sized by a count in the same snapshot, so memory
+    is the two index arrays plus one chunk. Edges of users missing from `user_ids` are dropped.
+    """
+    total = (await conn.execute(COUNT_EDGES, {"status": status})).scalar_one()
+    senders = np.empty(total, dtype=np.int32)
+    recipients = np.empty(total, dtype=np.int32)
+    filled = 0
+    result = await conn.stream(FETCH_EDGES, {"status": status})
+    async for partition in result.partitions(fetch_size):
+        sender_ids, recipient_ids = zip(*partition)
+        sender_indices, known_senders = _user_indices(user_ids, sender_ids)
+        recipient_indices, known_recipients = _user_indices(user_ids, recipient_ids)
+        known = known_senders & known_recipients
+        count = int(known.sum())
+        senders[filled : filled + count] = sender_indices[known]
+        recipients[filled : filled + count] = recipient_indices[known]
+        filled += count
+    if filled < total:
+        logger.warning("Dropped %d %s edges of unknown users", total - filled, status)
+    return senders[:filled], recipients[:filled]
+
+
+async def run(settings: Settings, top_k: int, block_rows: int, fetch_size: int) -> None:
+    # Streaming the friends table can take longer than the API's statement timeout.
+    database = Database(replace(settings.db, DB_STATEMENT_TIMEOUT_SECONDS=0))
+    computed_at = datetime.now(timezone.utc)
+    try:
+        # One snapshot for all reads, so every edge refers to a loaded user and the counts match
+        # the streamed rows.
+        async with database.engine.connect() as conn:
+            await conn.execution_options(isolation_level="REPEATABLE READ")
+            async with conn.begin():
+                user_ids = await _load_user_ids(conn)
+                accepted = await _load_edges(conn, "accepted", user_ids, fetch_size)
+                requested = await _load_edges(conn, "pending", user_ids, fetch_size)
+        n = len(user_ids)
+        adjacency = build_matrix(*accepted, n, symmetric=True)
+        pending = build_matrix(*requested, n, symmetric=False)
+        logger.info(
+            "Loaded %d users, %d friendships, %d pending requests",
+            n,
+            adjacency.nnz // 2,
+            pending.nnz,
+        )
+
+        written = 0
+        for block_users, users, ranks, suggested, counts in top_k_mutual_friends(
+            adjacency, pending, top_k, block_rows
+        ):
+            async with database.engine.begin() as conn:
+                await conn.execute(
+                    DELETE_SUGGESTIONS_FOR_USERS, {"user_ids": user_ids[block_users].tolist()}
+                )
+                if len(users):
+                    await conn.execute(
+                        INSERT_SUGGESTIONS,
+                        {
+                            "user_ids": user_ids[users].tolist(),
+                            "ranks": ranks.tolist(),
+                            "suggested_ids": user_ids[suggested].tolist(),
+                            "mutual_counts": counts.tolist(),
+                            "computed_at": computed_at,
+                        },
+                    )
+            written += len(users)
+
+        async with database.engine.begin() as conn:
+            await conn.execute(DELETE_STALE_SUGGESTIONS, {"computed_at": computed_at})
+        logger.info("Wrote %d friend suggestions", written)
+    finally:
+        await database.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--block-rows", type=int, default=5000)
+    parser.add_argument("--fetch-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(run(Settings(), args.top_k, args.block_rows, args.fetch_size))
+
+
+if __name__ == "__main__":
+    main()
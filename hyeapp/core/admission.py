@@ -0,0 +1,132 @@
+"""
+Per-process admission control for the long-running server.
+
+Without a limit, a burst turns into hundreds of coroutines queued on the connection pool, all of
+which time out together. AdmissionMiddleware, right in front of the routers, serves at most
+AdmissionConfig.MAX_CONCURRENCY requests at once and lets up to MAX_QUEUE more wait for
+QUEUE_TIMEOUT_SECONDS at most. Anything beyond that gets a 503 with Retry-After at once, so
+the requests that are admitted keep a bounded latency.
+
+Waiting requests are admitted by priority, then in arrival order: conditional reads (likely a
+304 after one version probe, or an in-memory cache hit), other reads, then writes. When the queue
+is full, a new request displaces the newest waiter of a lower priority, which is shed instead.
+"""
+
+import asyncio
+from collections import deque
+from time import perf_counter
+
+import orjson
+
+ROUTE = "admission"
+
+CACHED_READ, READ, WRITE = range(3)
+
+
+def request_priority(scope) -> int:
+    if scope["method"] not in ("GET", "HEAD"):
+        return WRITE
+    for name, _ in scope["headers"]:
+        if name == b"if-none-match":
+            return CACHED_READ
+    return READ
+
+
+class AdmissionController:
+    """Concurrency slots and the priority queue of requests waiting for one."""
+
+    def __init__(self, config):
+        self.limit = config.MAX_CONCURRENCY
+        self.max_queue = config.MAX_QUEUE
+        self.timeout = config.QUEUE_TIMEOUT_SECONDS
+        self.active = 0
+        self.queued = 0
+        self._queues = tuple(deque() for _ in range(WRITE + 1))
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot; False if the request is to be shed. Call release() after True."""
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return True
+        if self.queued >= self.max_queue and not self._displace(priority):
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].append(waiter)
+        self.queued += 1
+        try:
+            return await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Timed out, or the client went away; hand on a slot granted in the meantime.
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            else:
+                self._withdraw(waiter, priority)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+
+    def release(self) -> None:
+        """Hand the slot to the next waiter, or free it."""
+        for queue in self._queues:
+            while queue:
+                waiter = queue.popleft()
+                self.queued -= 1
+                if not waiter.done():
+                    waiter.set_result(True)
+                    return
+        self.active -= 1
+
+    def _displace(self, priority: int) -> bool:
+        for queue in reversed(self._queues[priority + 1 :]):
+            if queue:
+                self.queued -= 1
+                waiter = queue.pop()
+                if not waiter.done():
+                    waiter.set_result(False)
+                return True
+        return False
+
+    def _withdraw(self, waiter, priority: int) -> None:
+        try:
+            self._queues[priority].remove(waiter)
+        except ValueError:
+            return
+        self.queued -= 1
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware admitting requests through an AdmissionController."""
+
+    def __init__(self, app, config, registry=None):
+        self.app = app
+        self.controller = AdmissionController(config)
+        self.exempt = frozenset(config.EXEMPT_PATHS)
+        self.registry = registry
+        self.rejection_headers = [
+            (b"content-type", b"application/json"),
+            (b"retry-after", str(config.RETRY_AFTER_SECONDS).encode()),
+        ]
+        self.rejection_body = orjson.dumps({"detail": "Server is busy. Please retry later."})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            return await self.app(scope, receive, send)
+
+        started = perf_counter()
+        admitted = await self.controller.acquire(request_priority(scope))
+        if self.registry is not None:
+            if admitted:
+                self.registry.observe(ROUTE, "queue_wait", (perf_counter() - started) * 1000)
+            else:
+                self.registry.observe(ROUTE, "shed", 1)
+        if not admitted:
+            await send(
+                {"type": "http.response.start", "status": 503, "headers": self.rejection_headers}
+            )
+            await send({"type": "http.response.body", "body": self.rejection_body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
@@ -0,0 +1,66 @@
+"""
+Circuit breaker for a dependency that can become unreachable (the database, see db/session.py).
+
+After FAILURES consecutive failures the breaker opens and callers fail fast for RESET_SECONDS
+instead of each waiting out its own timeout. Then it lets a single probe through (half-open): the
+probe's success closes the breaker, its failure opens it for another RESET_SECONDS. A probe that
+reports neither within RESET_SECONDS is given up and another one is let through.
+"""
+
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    """Not locked: it is only used from the event loop thread."""
+
+    def __init__(self, name: str, failures: int, reset_seconds: float, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; while half-open, only the probe may."""
+        if self.state == CLOSED:
+            return True
+        now = self.clock()
+        if now - self._opened_at < self.reset_seconds:
+            return False
+        # Open long enough, or the last probe never reported back: let one probe through.
+        self.state = HALF_OPEN
+        self._opened_at = now
+        return True
+
+    @property
+    def retry_after(self) -> int:
+        """Seconds until the next probe is let through; 1 while closed."""
+        if self.state == CLOSED:
+            return 1
+        remaining = self.reset_seconds - (self.clock() - self._opened_at)
+        return max(1, math.ceil(remaining))
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info("Circuit %s closed", self.name)
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.failures >= self.failure_threshold
+        ):
+            logger.warning(
+                "Circuit %s open after %d consecutive failures", self.name, self.failures
+            )
+            self.state = OPEN
+            self._opened_at = self.clock()
@@ -1,15 +1,270 @@
 import os
-from dotenv import load_dotenv
+from dataclasses import dataclass, field
 
-load_dotenv()
 
+def load_local_env() -> None:
+    """
+    Load variables from a local .env file.
+    Skipped on Lambda, where configuration always comes from the function environment,
+    so python-dotenv is never imported during the init phase.
+    """
+    if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return
+    from dotenv import load_dotenv
 
+    load_dotenv()
+
+
+load_local_env()
+
+
+def _env(name: str, default: str = None, cast=str):
+    """Dataclass field read from the environment when the config object is built."""
+
+    def read():
+        value = os.getenv(name, default)
+        return value if value is None else cast(value)
+
+    return field(default_factory=read)
+
+
+def _flag(value: str) -> bool:
+    return value.lower() == "true"
+
+
+@dataclass
 class DatabaseConfig:
-    DB_USERNAME: str = os.getenv("HYE_DB_USERNAME")
-    DB_PASSWORD: str = os.getenv("HYE_DB_PASSWORD")
-    DB_HOST: str = os.getenv("HYE_DB_HOST")
-    DB_PORT: str = os.getenv("HYE_DB_PORT", "5432")
-    DB_NAME: str = os.getenv("HYE_DB_NAME")
+    DB_USERNAME: str = _env("HYE_DB_USERNAME")
+    DB_PASSWORD: str = _env("HYE_DB_PASSWORD")
+    DB_HOST: str = _env("HYE_DB_HOST")
+    DB_PORT: str = _env("HYE_DB_PORT", "5432")
+    DB_NAME: str = _env("HYE_DB_NAME")
+    # Per-process connection pool; SQLAlchemy's defaults unless overridden.
+    DB_POOL_SIZE: int = _env("HYE_DB_POOL_SIZE", "5", int)
+    DB_MAX_OVERFLOW: int = _env("HYE_DB_MAX_OVERFLOW", "10", int)
+    DB_ECHO: bool = _env("HYE_DB_ECHO", "true", _flag)
+    # Bounds on each wait, so an unreachable or stalled database fails requests in seconds rather
+    # than at the Lambda timeout. 0 disables the statement timeout (e.g. for batch jobs).
+    DB_CONNECT_TIMEOUT_SECONDS: float = _env("HYE_DB_CONNECT_TIMEOUT_SECONDS", "5", float)
+    DB_POOL_TIMEOUT_SECONDS: float = _env("HYE_DB_POOL_TIMEOUT_SECONDS", "10", float)
+    DB_STATEMENT_TIMEOUT_SECONDS: float = _env("HYE_DB_STATEMENT_TIMEOUT_SECONDS", "10", float)
+    # Circuit breaker (db/session.py): consecutive connection failures or timeouts before requests
+    # fail fast with a 503, and how long until a request is let through to probe the database.
+    DB_BREAKER_FAILURES: int = _env("HYE_DB_BREAKER_FAILURES", "5", int)
+    DB_BREAKER_RESET_SECONDS: float = _env("HYE_DB_BREAKER_RESET_SECONDS", "10", float)
+    # What to do when a request exceeds its endpoint's query budget or repeats a statement
+    # (db/session.py): "warn" logs it, "raise" fails the request (tests), "off" skips the check.
+    DB_QUERY_BUDGET: str = _env("HYE_DB_QUERY_BUDGET", "warn")
+
+
+@dataclass
+class AuthConfig:
+    """Cognito user pool details"""
+
+    USER_POOL_ID: str = _env("COGNITO_USER_POOL_ID")
+    REGION: str = _env("REGION")
+    AUDIENCE: str = _env("COGNITO_APP_CLIENT_ID")
+
+    @property
+    def ISSUER(self) -> str:
+        return f"https://cognito-idp.{self.REGION}.amazonaws.com/{self.USER_POOL_ID}"
+
+    @property
+    def JWKS_URL(self) -> str:
+        return f"{self.ISSUER}/.well-known/jwks.json"
+
+
+@dataclass
+class WarmupConfig:
+    # Run the init-phase warmup (DB connection, JWKS, hot statements) before the first request.
+    ENABLED: bool = _env("HYE_WARMUP_ENABLED", "true", _flag)
+    # Upper bound for each warmup step; a step that overruns is abandoned, never fatal.
+    STEP_TIMEOUT_SECONDS: float = _env("HYE_WARMUP_STEP_TIMEOUT_SECONDS", "3.0", float)
+
+
+@dataclass
+class ServerConfig:
+    """Settings for the long-running uvicorn deployment (server.py); unused on Lambda."""
+
+    HOST: str = _env("HYE_SERVER_HOST", "0.0.0.0")
+    PORT: int = _env("HYE_SERVER_PORT", "8000", int)
+    WORKERS: int = _env("HYE_SERVER_WORKERS", str(os.cpu_count() or 1), int)
+    # "auto" picks uvloop and httptools when they are installed (see requirements.txt).
+    LOOP: str = _env("HYE_SERVER_LOOP", "auto")
+    HTTP: str = _env("HYE_SERVER_HTTP", "auto")
+    # Time in-flight requests get to finish after SIGTERM before workers are stopped.
+    GRACEFUL_SHUTDOWN_SECONDS: int = _env("HYE_SERVER_GRACEFUL_SHUTDOWN_SECONDS", "20", int)
+
+
+@dataclass
+class CacheConfig:
+    # Users whose friend sets are kept in memory for /friends/mutual (LRU).
+    FRIEND_SET_CACHE_SIZE: int = _env("HYE_FRIEND_SET_CACHE_SIZE", "10000", int)
+    # Users whose last friend and friend request lists are kept to serve while the database is
+    # unavailable (LRU).
+    STALE_READ_CACHE_SIZE: int = _env("HYE_STALE_READ_CACHE_SIZE", "10000", int)
+
+
+@dataclass
+class JobsConfig:
+    """Background jobs (jobs/); see jobs/transports.py for the transports."""
+
+    # "sqs", "sqlite", "inprocess", or "inline" (run handlers inside the request, no queue).
+    TRANSPORT: str = _env("HYE_JOBS_TRANSPORT", "inprocess")
+    SQS_QUEUE_URL: str = _env("HYE_JOBS_SQS_QUEUE_URL")
+    SQLITE_PATH: str = _env("HYE_JOBS_SQLITE_PATH", "hye-jobs.sqlite3")
+    # Jobs received and handled together by one consumer poll (SQS allows at most 10).
+    BATCH_SIZE: int = _env("HYE_JOBS_BATCH_SIZE", "10", int)
+    POLL_WAIT_SECONDS: float = _env("HYE_JOBS_POLL_WAIT_SECONDS", "1.0", float)
+    # A job is retried with exponential backoff (full jitter) until MAX_ATTEMPTS, then dropped
+    # (SQS: left to the queue's redrive policy, which should use the same count).
+    MAX_ATTEMPTS: int = _env("HYE_JOBS_MAX_ATTEMPTS", "5", int)
+    BACKOFF_BASE_SECONDS: float = _env("HYE_JOBS_BACKOFF_BASE_SECONDS", "1.0", float)
+    BACKOFF_MAX_SECONDS: float = _env("HYE_JOBS_BACKOFF_MAX_SECONDS", "300", float)
+
+
+@dataclass
+class OutboxConfig:
+    """Friend outbox dispatcher (jobs/outbox.py)."""
+
+    # Run a dispatcher in each long-running server worker (the Lambda stack schedules its own).
+    ENABLED: bool = _env("HYE_OUTBOX_ENABLED", "true", _flag)
+    BATCH_SIZE: int = _env("HYE_OUTBOX_BATCH_SIZE", "100", int)
+    POLL_INTERVAL_SECONDS: float = _env("HYE_OUTBOX_POLL_INTERVAL_SECONDS", "1.0", float)
+    # How long claimed events stay invisible to other dispatchers; must exceed a batch's delivery.
+    LEASE_SECONDS: float = _env("HYE_OUTBOX_LEASE_SECONDS", "60", float)
+
+
+@dataclass
+class EventsConfig:
+    """Live /friends/events stream (core/friend_events.py)."""
+
+    # Streams need a long-running server; server.py turns this on, API Gateway would buffer them.
+    ENABLED: bool = _env("HYE_EVENTS_ENABLED", "false", _flag)
+    # Comment lines sent on idle streams so proxies keep them open and dead clients are noticed.
+    HEARTBEAT_SECONDS: float = _env("HYE_EVENTS_HEARTBEAT_SECONDS", "15", float)
+
+
+@dataclass
+class AdmissionConfig:
+    """Per-process admission control (core/admission.py); off unless MAX_CONCURRENCY is set."""
+
+    # Requests served at once; server.py defaults it to the connection pool's capacity. Lambda
+    # serves one request per container, so it stays off there.
+    MAX_CONCURRENCY: int = _env("HYE_ADMISSION_MAX_CONCURRENCY", "0", int)
+    # Requests waiting for a slot; beyond that they get a 503 at once.
+    MAX_QUEUE: int = _env("HYE_ADMISSION_MAX_QUEUE", "64", int)
+    # Longest wait for a slot before giving up with a 503.
+    QUEUE_TIMEOUT_SECONDS: float = _env("HYE_ADMISSION_QUEUE_TIMEOUT_SECONDS", "2", float)
+    RETRY_AFTER_SECONDS: int = _env("HYE_ADMISSION_RETRY_AFTER_SECONDS", "1", int)
+    # Never queued nor counted: liveness checks, and event streams that stay open for minutes.
+    EXEMPT_PATHS: tuple = _env(
+        "HYE_ADMISSION_EXEMPT_PATHS", "/health,/friends/events", lambda v: tuple(v.split(","))
+    )
+
+
+def _rates(value: str) -> dict[str, float]:
+    """"/path=0.1,/other=0.5" -> {"/path": 0.1, "/other": 0.5}"""
+    pairs = (item.split("=", 1) for item in value.split(",") if item.strip())
+    return {path.strip(): float(rate) for path, rate in pairs}
+
+
+@dataclass
+class LoggingConfig:
+    LEVEL: str = _env("HYE_LOG_LEVEL", "INFO")
+    # Fraction of requests per path whose info logs are kept (log/logging_config.py); paths not
+    # listed keep all. The defaults are the polling endpoints, which make up most requests.
+    SAMPLE_RATES: dict = _env(
+        "HYE_LOG_SAMPLE_RATES",
+        "/friends/getFriendList=0.1,/friends/getFriendRequestList=0.1,/home=0.1",
+        _rates,
+    )
+
+
+@dataclass
+class MetricsConfig:
+    """Request metrics published as CloudWatch EMF lines on stdout (core/metrics.py)."""
+
+    ENABLED: bool = _env("HYE_METRICS_ENABLED", "true", _flag)
+    NAMESPACE: str = _env("HYE_METRICS_NAMESPACE", "HYE")
+    # 0 flushes after every request, i.e. once per invocation on Lambda.
+    FLUSH_INTERVAL_SECONDS: float = _env(
+        "HYE_METRICS_FLUSH_INTERVAL_SECONDS",
+        "0" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "60",
+        float,
+    )
+    # Per-request phase timings as a Server-Timing response header: "off", "always", "header"
+    # (requests sending X-Server-Timing: 1), or "claim" (such requests whose verified token lists
+    # SERVER_TIMING_GROUP in cognito:groups).
+    SERVER_TIMING: str = _env("HYE_SERVER_TIMING", "claim")
+    SERVER_TIMING_GROUP: str = _env("HYE_SERVER_TIMING_GROUP", "debug")
+    # Event loop lag probe (core/loop_health.py; 0 disables it). It is started by the lifespan,
+    # which does not run on Lambda.
+    LOOP_PROBE_INTERVAL_SECONDS: float = _env("HYE_METRICS_LOOP_PROBE_INTERVAL_SECONDS", "0.1", float)
+    # A loop blocked this long is recorded as a stall and the blocking stack is logged.
+    LOOP_STALL_MS: float = _env("HYE_METRICS_LOOP_STALL_MS", "100", float)
+
+
+@dataclass
+class ProfilingConfig:
+    """Request sampling profiler (core/profiling.py); off unless RATE or SECRET is set."""
+
+    # Fraction of requests profiled.
+    RATE: float = _env("HYE_PROFILE_RATE", "0", float)
+    # Requests sending this value in X-Profile are always profiled.
+    SECRET: str = _env("HYE_PROFILE_SECRET")
+    INTERVAL_MS: float = _env("HYE_PROFILE_INTERVAL_MS", "5", float)
+    # Directory for one .collapsed file per profile; stdout (one JSON line each) when unset.
+    OUTPUT_DIR: str = _env("HYE_PROFILE_OUTPUT_DIR")
+
+
+@dataclass
+class TracingConfig:
+    """Request tracing spans (core/tracing.py); off unless EXPORTER is set."""
+
+    # "off", "xray" (UDP to the X-Ray daemon, Lambda's included), "otlp" (OTLP/HTTP JSON to
+    # OTLP_ENDPOINT) or "file" (JSON lines in FILE_PATH, for tests and local runs).
+    EXPORTER: str = _env("HYE_TRACING_EXPORTER", "off")
+    # Fraction of requests traced, unless the incoming trace header already decided.
+    RATE: float = _env("HYE_TRACING_RATE", "0.05", float)
+    SERVICE_NAME: str = _env("HYE_TRACING_SERVICE_NAME", "hye-api")
+    XRAY_DAEMON_ADDRESS: str = _env("AWS_XRAY_DAEMON_ADDRESS", "127.0.0.1:2000")
+    OTLP_ENDPOINT: str = _env("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+    FILE_PATH: str = _env("HYE_TRACING_FILE", "traces.jsonl")
+
+
+@dataclass
+class MemoryConfig:
+    """Memory diagnostics (core/memory.py); off unless EVERY_N_REQUESTS is set."""
+
+    # Report RSS (and the top allocators, with TRACEMALLOC) at init and after every N requests.
+    EVERY_N_REQUESTS: int = _env("HYE_MEMORY_EVERY_N_REQUESTS", "0", int)
+    # Trace Python allocations so reports list the top allocators and their growth since init
+    # and since the previous report. Tracing slows allocation-heavy code down while it is on.
+    TRACEMALLOC: bool = _env("HYE_MEMORY_TRACEMALLOC", "false", _flag)
+    TRACEMALLOC_FRAMES: int = _env("HYE_MEMORY_TRACEMALLOC_FRAMES", "1", int)
+    TOP: int = _env("HYE_MEMORY_TOP", "10", int)
+
 
+@dataclass
+class Settings:
+    """
+    Complete configuration for one app instance (see application.create_app).
+    Defaults come from the environment at construction time; pass explicit sections to run
+    several configurations side by side, e.g. Settings(db=DatabaseConfig(DB_POOL_SIZE=1)).
+    """
 
-db_configuration = DatabaseConfig()
+    db: DatabaseConfig = field(default_factory=DatabaseConfig)
+    auth: AuthConfig = field(default_factory=AuthConfig)
+    warmup: WarmupConfig = field(default_factory=WarmupConfig)
+    server: ServerConfig = field(default_factory=ServerConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    jobs: JobsConfig = field(default_factory=JobsConfig)
+    outbox: OutboxConfig = field(default_factory=OutboxConfig)
+    events: EventsConfig = field(default_factory=EventsConfig)
+    logging: LoggingConfig = field(default_factory=LoggingConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    profiling: ProfilingConfig = field(default_factory=ProfilingConfig)
+    tracing: TracingConfig = field(default_factory=TracingConfig)
+    memory: MemoryConfig = field(default_factory=MemoryConfig)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
@@ -0,0 +1,136 @@
+"""
+Live friend graph notifications for the long-running server (/friends/events).
+
+Each process holds one dedicated LISTEN connection for the friend_events channel
+(db/sql/006_friend_notify.sql) and fans its notifications out to the subscribed users. A
+subscription is a single coalescing flag: any number of notifications arriving while the client is
+busy collapse into one wake-up, so memory per idle subscriber stays constant. Clients react by
+calling /friends/changes, which returns what changed.
+"""
+
+import asyncio
+import logging
+from typing import Optional
+
+from core.config import DatabaseConfig
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "friend_events"
+
+
+class Subscription:
+    __slots__ = ("user_id", "_changed")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self._changed = asyncio.Event()
+
+    def notify(self) -> None:
+        self._changed.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """True once the user's friend graph changed; False if `timeout` elapsed first."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+
+class FriendEventHub:
+    """
+    Attached to app.state.friend_events. The LISTEN connection is opened by the first subscriber
+    and reopened (with backoff) if it drops; subscribers are woken after a reconnect, since
+    notifications sent in between were lost.
+    """
+
+    RECONNECT_MAX_SECONDS = 30.0
+
+    def __init__(self, config: DatabaseConfig):
+        self.config = config
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._conn = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    async def subscribe(self, user_id: str) -> Subscription:
+        await self._ensure_listening()
+        subscription = Subscription(user_id)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    def publish(self, payload: str) -> None:
+        """Wake the subscribers of both users of a "<sender_id>,<recipient_id>" notification."""
+        for user_id in payload.split(","):
+            for subscription in self._subscribers.get(user_id, ()):
+                subscription.notify()
+
+    def _wake_all(self) -> None:
+        for subscriptions in self._subscribers.values():
+            for subscription in subscriptions:
+                subscription.notify()
+
+    async def _connect(self):
+        """asyncpg is imported here; SQLAlchemy imports it lazily as well (see db/session.py)."""
+        import asyncpg
+
+        conn = await asyncpg.connect(
+            user=self.config.DB_USERNAME,
+            password=self.config.DB_PASSWORD,
+            host=self.config.DB_HOST,
+            port=self.config.DB_PORT,
+            database=self.config.DB_NAME,
+        )
+        await conn.add_listener(CHANNEL, lambda _conn, _pid, _channel, payload: self.publish(payload))
+        conn.add_termination_listener(self._on_connection_lost)
+        return conn
+
+    async def _ensure_listening(self) -> None:
+        if self._conn is not None and not self._conn.is_closed():
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._conn is None or self._conn.is_closed():
+                self._conn = await self._connect()
+                logger.info("Listening for %s notifications", CHANNEL)
+
+    def _on_connection_lost(self, _conn) -> None:
+        self._conn = None
+        if not self._closed and (self._reconnect is None or self._reconnect.done()):
+            logger.warning("Lost the %s LISTEN connection, reconnecting", CHANNEL)
+            self._reconnect = asyncio.get_running_loop().create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self) -> None:
+        delay = 1.0
+        while not self._closed and self._subscribers:
+            try:
+                await self._ensure_listening()
+            except Exception as e:
+                logger.error("Reconnecting the %s LISTEN connection failed: %s", CHANNEL, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+                continue
+            self._wake_all()
+            return
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -0,0 +1,73 @@
+"""
+Compact friend sets for mutual friend queries.
+
+Each user's accepted friends are held as a sorted array('q') of 63-bit keys derived from the
+friend's user id, with the user ids in a parallel tuple. The keys are deterministic, so the merge
+order (and therefore paging) is the same in every process, and an intersection is a linear merge
+over two flat int arrays instead of a comparison of username strings.
+"""
+
+import hashlib
+from array import array
+from typing import Iterable, NamedTuple, Optional
+
+from core.cache import LRUCache
+
+
+def user_key(user_id: str) -> int:
+    """63-bit key for a user id (non-negative, so it fits array('q'))."""
+    digest = hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class FriendSet(NamedTuple):
+    version: int
+    keys: array
+    user_ids: tuple
+
+
+def build_friend_set(version: int, friend_ids: Iterable[str]) -> FriendSet:
+    pairs = sorted({user_key(friend_id): friend_id for friend_id in friend_ids}.items())
+    return FriendSet(
+        version,
+        array("q", (key for key, _ in pairs)),
+        tuple(friend_id for _, friend_id in pairs),
+    )
+
+
+def intersect_sorted(a: array, b: array) -> list[int]:
+    """Positions in `a` of the keys also in `b`; linear merge of two sorted arrays of unique keys."""
+    positions = []
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a and j < len_b:
+        x, y = a[i], b[j]
+        if x == y:
+            positions.append(i)
+            i += 1
+            j += 1
+        elif x < y:
+            i += 1
+        else:
+            j += 1
+    return positions
+
+
+class FriendSetCache:
+    """
+    LRU of FriendSets tagged with the friend list version they were read at (friend_list_versions,
+    bumped on every friend mutation). A lookup with a newer version misses, so mutations made by
+    any process invalidate the entry without cross-process messaging.
+    """
+
+    def __init__(self, max_users: int):
+        self._sets = LRUCache(max_users)
+
+    def get(self, user_id: str, version: int) -> Optional[FriendSet]:
+        friend_set = self._sets.get(user_id)
+        if friend_set is None or friend_set.version != version:
+            return None
+        return friend_set
+
+    def set(self, user_id: str, friend_set: FriendSet) -> None:
+        self._sets.set(user_id, friend_set)
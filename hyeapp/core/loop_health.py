@@ -0,0 +1,88 @@
+"""
+Event loop health, recorded into the metrics registry (core/metrics.py) under the "event_loop" route.
+
+A probe task sleeps MetricsConfig.LOOP_PROBE_INTERVAL_SECONDS at a time and records how late it
+woke up ("loop_lag"): any callback holding the loop, such as an RSA signature check, a large JSON
+dump or a synchronous client call, delays it along with every concurrent request. Wake-ups later
+than LOOP_STALL_MS are also recorded as "loop_stall".
+
+Lag says that the loop was blocked, not by what. A watchdog thread therefore watches the probe's
+heartbeat and, once the loop has been stuck for LOOP_STALL_MS, logs the loop thread's stack, i.e.
+the slow callback itself. Unlike asyncio's debug mode this costs nothing per callback and also
+works under uvloop.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import traceback
+from time import perf_counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+ROUTE = "event_loop"
+
+
+class LoopMonitor:
+    """Lag probe and stall watchdog for the running loop; attached to app.state.loop_monitor."""
+
+    def __init__(self, registry, config):
+        self.registry = registry
+        self.interval = config.LOOP_PROBE_INTERVAL_SECONDS
+        self.stall = config.LOOP_STALL_MS / 1000
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread = None
+        self._heartbeat = 0.0
+
+    async def _probe(self) -> None:
+        while True:
+            self._heartbeat = started = perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = perf_counter() - started - self.interval
+            self.registry.observe(ROUTE, "loop_lag", max(lag, 0.0) * 1000)
+            if lag >= self.stall:
+                self.registry.observe(ROUTE, "loop_stall", lag * 1000)
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopped.wait(self.stall / 2):
+            heartbeat = self._heartbeat
+            if heartbeat == reported or perf_counter() - heartbeat - self.interval < self.stall:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            # Report each stall once, however long it lasts.
+            reported = heartbeat
+            stack = "".join(traceback.format_stack(frame, limit=12))
+            logger.warning(
+                "Event loop blocked for over %.0f ms in:\n%s", self.stall * 1000, stack
+            )
+
+    def start(self) -> None:
+        """Start probing the running loop; a no-op when the probe interval is 0."""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+        self._watchdog = threading.Thread(target=self._watch, name="hye-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._watchdog.join()
+        self._watchdog = None
@@ -0,0 +1,111 @@
+"""
+Memory diagnostics for sizing the function's memory and the in-process caches.
+
+With MemoryConfig.EVERY_N_REQUESTS set, MemoryMonitor reports the process RSS at init (after the
+warmup) and after every N requests: as the "rss" metric under the "memory" route
+(core/metrics.py) and as one JSON line on stdout. With TRACEMALLOC the report also lists the top
+allocating source lines and how each grew since the init report and since the previous one,
+which is where a leak shows up; tracemalloc is started when the app is built, so allocations of
+the caches, pools and clients created afterwards are attributed to their source lines.
+"""
+
+import os
+import sys
+import tracemalloc
+from typing import Optional
+
+import orjson
+
+ROUTE = "memory"
+
+# Allocations made by tracemalloc itself (taking snapshots) would otherwise top every report.
+_IGNORED = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+
+def rss_bytes() -> int:
+    """Current resident set size; the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _where(traceback) -> str:
+    frame = traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
+
+
+class MemoryMonitor:
+    """Periodic memory reports; attached to app.state.memory."""
+
+    def __init__(self, config, registry, stream=None):
+        self.config = config
+        self.registry = registry
+        self.stream = stream
+        self.enabled = config.EVERY_N_REQUESTS > 0
+        self.requests = 0
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if self.enabled and self.config.TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.TRACEMALLOC_FRAMES)
+
+    def _top(self, statistics, size_attr: str) -> list[dict]:
+        top = []
+        for stat in statistics[: self.config.TOP]:
+            size = getattr(stat, size_attr)
+            if size_attr == "size_diff" and size <= 0:
+                break
+            top.append({"where": _where(stat.traceback), "kb": round(size / 1024, 1)})
+        return top
+
+    def report(self, label: str) -> dict:
+        """Record and write a report; returns it."""
+        rss_mb = round(rss_bytes() / 2**20)
+        self.registry.observe(ROUTE, "rss", rss_mb)
+        report = {"memory": label, "requests": self.requests, "rss_mb": rss_mb}
+
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+            traced_mb = round(tracemalloc.get_traced_memory()[0] / 2**20)
+            self.registry.observe(ROUTE, "traced", traced_mb)
+            report["traced_mb"] = traced_mb
+            report["top"] = self._top(snapshot.statistics("lineno"), "size")
+            if self._baseline is not None:
+                report["growth_since_init"] = self._top(
+                    snapshot.compare_to(self._baseline, "lineno"), "size_diff"
+                )
+                report["growth_since_previous"] = self._top(
+                    snapshot.compare_to(self._previous, "lineno"), "size_diff"
+                )
+            else:
+                self._baseline = snapshot
+            self._previous = snapshot
+
+        stream = self.stream or sys.stdout
+        stream.write(orjson.dumps(report).decode() + "\n")
+        stream.flush()
+        return report
+
+
+class MemoryMiddleware:
+    """Pure ASGI middleware counting requests and reporting after every EVERY_N_REQUESTS."""
+
+    def __init__(self, app, monitor: MemoryMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            monitor = self.monitor
+            monitor.requests += 1
+            if monitor.requests % monitor.config.EVERY_N_REQUESTS == 0:
+                monitor.report(f"after {monitor.requests} requests")
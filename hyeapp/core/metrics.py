@@ -0,0 +1,192 @@
+"""
+In-process request metrics, published as CloudWatch embedded metric format (EMF).
+
+MetricsMiddleware records each request's latency and phase timings (core/timing.py: auth, jwks,
+session, db, serialize) into per-route histograms; process-wide health (db/session.py's pool,
+core/loop_health.py's event loop, core/memory.py, core/admission.py) goes into the same registry
+under the "pool", "event_loop", "memory" and "admission" routes. They are flushed as one EMF JSON line per route on stdout:
+after every invocation on Lambda, where CloudWatch Logs extracts the metrics from the function's
+log stream, and every MetricsConfig.FLUSH_INTERVAL_SECONDS elsewhere. Publishing therefore makes
+no network calls, and recording costs a dict update per value.
+"""
+
+import math
+import sys
+import time
+from time import perf_counter
+from typing import Optional, TextIO
+
+import orjson
+
+from core import timing
+
+
+# Histograms are plain dicts of log-spaced bucket -> count, four buckets per doubling (each about
+# 19% wide), which keeps a percentile within that error and well under EMF's limit of 100 distinct
+# values per metric.
+BUCKETS_PER_DOUBLING = 4
+_ZERO_BUCKET = -1000
+
+
+# Metrics not in milliseconds. Counts and (whole) megabytes are few distinct integers, kept exactly.
+UNITS = {
+    "pool_connections": "Count",
+    "pool_checked_out": "Count",
+    "pool_connection_age": "Seconds",
+    "rss": "Megabytes",
+    "traced": "Megabytes",
+    "shed": "Count",
+}
+_EXACT_UNITS = ("Count", "Megabytes")
+
+
+def bucket_of(value: float) -> int:
+    return round(math.log2(value) * BUCKETS_PER_DOUBLING) if value > 0 else _ZERO_BUCKET
+
+
+def histogram_to_emf(counts: dict[int, int], exact: bool = False) -> dict:
+    buckets = sorted(counts)
+    if exact:
+        return {"Values": buckets, "Counts": [counts[value] for value in buckets]}
+    return {
+        "Values": [
+            2 ** (bucket / BUCKETS_PER_DOUBLING) if bucket != _ZERO_BUCKET else 0
+            for bucket in buckets
+        ],
+        "Counts": [counts[bucket] for bucket in buckets],
+    }
+
+
+class MetricsRegistry:
+    """Histograms per route and metric name since the last flush; attached to app.state.metrics."""
+
+    def __init__(self, config, stream: Optional[TextIO] = None):
+        self.config = config
+        self.stream = stream
+        self._routes: dict[str, dict[str, dict[int, int]]] = {}
+        self._last_flush = time.monotonic()
+
+    def observe(self, route: str, name: str, value: float) -> None:
+        histograms = self._routes.get(route)
+        if histograms is None:
+            histograms = self._routes[route] = {}
+        counts = histograms.get(name)
+        if counts is None:
+            counts = histograms[name] = {}
+        bucket = value if UNITS.get(name) in _EXACT_UNITS else bucket_of(value)
+        counts[bucket] = counts.get(bucket, 0) + 1
+
+    def record_request(self, route: str, seconds: float, phases: dict) -> None:
+        """Record a request (durations in seconds, published in milliseconds)."""
+        histograms = self._routes.get(route)
+        if histograms is None:
+            histograms = self._routes[route] = {}
+        # observe() inlined: this runs on every request.
+        phases["latency"] = seconds
+        for name, phase_seconds in phases.items():
+            counts = histograms.get(name)
+            if counts is None:
+                counts = histograms[name] = {}
+            bucket = bucket_of(phase_seconds * 1000)
+            counts[bucket] = counts.get(bucket, 0) + 1
+        if time.monotonic() - self._last_flush >= self.config.FLUSH_INTERVAL_SECONDS:
+            self.flush()
+
+    def emf_documents(self) -> list[dict]:
+        timestamp = int(time.time() * 1000)
+        documents = []
+        for route, histograms in self._routes.items():
+            document = {
+                "_aws": {
+                    "Timestamp": timestamp,
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": self.config.NAMESPACE,
+                            "Dimensions": [["Route"]],
+                            "Metrics": [
+                                {"Name": name, "Unit": UNITS.get(name, "Milliseconds")}
+                                for name in histograms
+                            ],
+                        }
+                    ],
+                },
+                "Route": route,
+            }
+            for name, counts in histograms.items():
+                document[name] = histogram_to_emf(counts, UNITS.get(name) in _EXACT_UNITS)
+            documents.append(document)
+        return documents
+
+    def flush(self) -> None:
+        """Write and reset the histograms."""
+        self._last_flush = time.monotonic()
+        if not self._routes:
+            return
+        documents = self.emf_documents()
+        self._routes = {}
+        stream = self.stream or sys.stdout
+        stream.write("".join(orjson.dumps(document).decode() + "\n" for document in documents))
+        stream.flush()
+
+
+def route_template(scope, default: str = "unmatched") -> str:
+    """
+    The matched route's template path, which keeps per-route dimensions' cardinality bounded.
+    Routes of included routers carry their own path only; FastAPI keeps the prefixed one in the
+    effective route context.
+    """
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    if context is not None:
+        return context.path
+    return getattr(scope.get("route"), "path", default)
+
+
+def server_timing_header(phases: dict, total: float) -> bytes:
+    entries = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries).encode()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request and collecting its phase timings: into the
+    registry (None when metrics are disabled), and into a Server-Timing header for the requests
+    MetricsConfig.SERVER_TIMING allows, so a slow call can be attributed from the client side.
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry], config):
+        self.app = app
+        self.registry = registry
+        self.server_timing = config.SERVER_TIMING
+        self.server_timing_group = config.SERVER_TIMING_GROUP
+
+    def wants_server_timing(self, scope) -> bool:
+        if self.server_timing == "always":
+            return True
+        if self.server_timing == "off" or (b"x-server-timing", b"1") not in scope["headers"]:
+            return False
+        if self.server_timing == "header":
+            return True
+        # "claim": verify_token leaves the verified payload in request.state.
+        payload = scope.get("state", {}).get("token_payload") or {}
+        return self.server_timing_group in payload.get("cognito:groups", ())
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        phases, token = timing.begin()
+        started = perf_counter()
+
+        async def send_with_server_timing(message):
+            if message["type"] == "http.response.start" and self.wants_server_timing(scope):
+                header = (b"server-timing", server_timing_header(phases, perf_counter() - started))
+                message = {**message, "headers": [*message.get("headers", ()), header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            elapsed = perf_counter() - started
+            timing.end(token)
+            if self.registry is not None:
+                self.registry.record_request(route_template(scope), elapsed, phases)
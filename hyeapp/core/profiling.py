@@ -0,0 +1,177 @@
+"""
+Sampling profiler for individual requests, usable where no profiler can be attached (Lambda).
+
+ProfilingMiddleware profiles a random ProfilingConfig.RATE of requests, and any request whose
+X-Profile header carries ProfilingConfig.SECRET. While profiled requests are in flight, a daemon
+thread samples their stacks every INTERVAL_MS:
+
+- a request whose task is running contributes the loop thread's stack from the task's root frame
+  down, so CPU time (token verification, serialization) is attributed to the code doing it (the
+  thread gets the GIL at least every sys.getswitchinterval(), 5 ms by default);
+- a suspended request contributes its coroutine await chain ending in "[await <Future type>]", so
+  time spent waiting on asyncpg, httpx or the pool is attributed to the awaiting code as well.
+
+Each profile is written in collapsed-stack format ("root;caller;callee count" lines, the input
+of flamegraph.pl and speedscope) to a file in OUTPUT_DIR, or as one JSON line on stdout.
+"""
+
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from time import perf_counter
+from typing import Optional
+
+import orjson
+
+from core.metrics import route_template
+
+
+def _label(code) -> str:
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> list[str]:
+    """Labels of a suspended coroutine and the coroutines it awaits, outermost first."""
+    labels = []
+    awaited = coro
+    while awaited is not None:
+        frame = getattr(awaited, "cr_frame", None) or getattr(awaited, "gi_frame", None)
+        if frame is None:
+            if not hasattr(awaited, "cr_await") and not hasattr(awaited, "gi_yieldfrom"):
+                # `await future` suspends in the future's iterator (FutureIter in the C asyncio).
+                kind = type(awaited).__name__.replace("FutureIter", "Future")
+                labels.append(f"[await {kind}]")
+            break
+        labels.append(_label(frame.f_code))
+        awaited = getattr(awaited, "cr_await", None) or getattr(awaited, "gi_yieldfrom", None)
+    return labels
+
+
+def _running_stack(frame, root_code) -> list[str]:
+    """Labels from the frame running `root_code` down to `frame`, outermost first."""
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame.f_code))
+        if frame.f_code is root_code:
+            break
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class StackSampler:
+    """
+    Samples the stacks of the registered request tasks from a daemon thread, which waits on
+    `_active` while no task is registered. Counts are only updated under the lock and only for
+    tasks still registered, so a task's counts are final once stop() returns.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles: dict[asyncio.Task, tuple[int, Counter]] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, task: asyncio.Task) -> Counter:
+        """Start sampling `task`, which must be running on the calling thread."""
+        counts = Counter()
+        with self._lock:
+            self._profiles[task] = (threading.get_ident(), counts)
+            self._active.set()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="request-profiler", daemon=True
+                )
+                self._thread.start()
+        return counts
+
+    def stop(self, task: asyncio.Task) -> None:
+        with self._lock:
+            self._profiles.pop(task, None)
+            if not self._profiles:
+                self._active.clear()
+
+    def sample(self) -> None:
+        with self._lock:
+            profiles = list(self._profiles.items())
+        if not profiles:
+            return
+        # Walk the stacks without the lock, which stop() takes on the loop thread.
+        frames = sys._current_frames()
+        stacks = []
+        for task, (thread_id, counts) in profiles:
+            coro = task.get_coro()
+            if asyncio.current_task(task.get_loop()) is task:
+                root = getattr(coro, "cr_code", None)
+                stack = _running_stack(frames.get(thread_id), root)
+            else:
+                stack = _await_chain(coro)
+            if stack:
+                stacks.append((task, counts, ";".join(stack)))
+        with self._lock:
+            for task, counts, stack in stacks:
+                if task in self._profiles:
+                    counts[stack] += 1
+
+    def _run(self) -> None:
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception:
+                # A task can change under the sampler (it runs without the loop's cooperation);
+                # losing one sample is fine.
+                pass
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+        self.sampler = StackSampler(config.INTERVAL_MS / 1000)
+        self._secret = config.SECRET.encode() if config.SECRET else None
+
+    def should_profile(self, scope) -> bool:
+        if self._secret is not None:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, self._secret)
+        return random.random() < self.config.RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            return await self.app(scope, receive, send)
+        task = asyncio.current_task()
+        counts = self.sampler.start(task)
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.sampler.stop(task)
+            self.write(scope, perf_counter() - started, counts)
+
+    def write(self, scope, seconds: float, counts: Counter) -> None:
+        route = route_template(scope, scope.get("path", ""))
+        collapsed = "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+        if self.config.OUTPUT_DIR:
+            name = f"{time.strftime('%Y%m%dT%H%M%S')}-{route.strip('/').replace('/', '_') or 'root'}"
+            path = os.path.join(self.config.OUTPUT_DIR, f"{name}-{id(counts):x}.collapsed")
+            with open(path, "w") as f:
+                f.write(collapsed)
+            return
+        record = {
+            "profile": route,
+            "method": scope.get("method"),
+            "duration_ms": round(seconds * 1000, 2),
+            "samples": sum(counts.values()),
+            "collapsed": collapsed,
+        }
+        sys.stdout.write(orjson.dumps(record).decode() + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,46 @@
+"""
+Request-scoped phase timings.
+
+The metrics middleware (core/metrics.py) opens a RequestTimings for every HTTP request; layers
+below report the time spent in their phase into it with `timed(phase)` or `record(phase, s)`.
+Outside a request (warmup, batch jobs) there is no RequestTimings and reporting is a no-op.
+"""
+
+from contextvars import ContextVar, Token
+from time import perf_counter
+from typing import Optional
+
+_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+
+def begin() -> tuple[dict, Token]:
+    """Start collecting for the current request; returns the phase dict and a reset token."""
+    phases = {}
+    return phases, _timings.set(phases)
+
+
+def end(token: Token) -> None:
+    _timings.reset(token)
+
+
+def record(phase: str, seconds: float) -> None:
+    phases = _timings.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+class timed:
+    """`with timed("auth"):` adds the block's duration to the phase (repeated blocks add up)."""
+
+    __slots__ = ("phase", "started")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.phase, perf_counter() - self.started)
+        return False
@@ -0,0 +1,358 @@
+"""
+Lightweight request tracing.
+
+TracingMiddleware makes the sampling decision once per request (head-based): an incoming X-Ray
+or W3C trace header that says sampled or not decides, otherwise TracingConfig.RATE does. A
+sampled request gets a root span in a context variable; the layers below open child spans with
+`with span(name):` (verify_token, get_signing_key, serialize) or start_span()/finish() (each SQL
+statement, from engine events in db/session.py). An unsampled request, or an app without tracing,
+has no current span, so both return at once after one context variable read.
+
+Finished spans are handed to an exporter when the request completes: XRayExporter sends them as
+segment documents to the X-Ray daemon over UDP (on Lambda, as subsegments of the function's
+segment, which makes `Tracing: Active` show them), OTLPExporter posts OTLP/HTTP JSON from a
+background thread, and FileExporter appends JSON lines to a file for tests and local runs.
+"""
+
+import logging
+import os
+import queue
+import random
+import secrets
+import socket
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import orjson
+
+from core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """One timed operation; times are epoch nanoseconds."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id", "start", "end", "attributes", "error",
+        "_spans", "_token",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], spans: list, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+        self.error = None
+        # Shared by all spans of the request; a span is added to it when it finishes.
+        self._spans = spans
+        self._token = None
+
+    def child(self, name: str, attributes: dict) -> "Span":
+        return Span(name, self.trace_id, self.span_id, self._spans, attributes)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.end = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self._spans.append(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current.reset(self._token)
+        self.finish(exc)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoSpan:
+    """Stand-in for span() outside a sampled request."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+def span(name: str, **attributes):
+    """Context manager timing a child of the current span, if the request is sampled."""
+    parent = _current.get()
+    if parent is None:
+        return _NO_SPAN
+    return parent.child(name, attributes)
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """
+    Start a child of the current span without making it current, for operations that begin and
+    end in separate callbacks; call finish() on the result when it is not None.
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    return parent.child(name, attributes)
+
+
+_HEX = frozenset("0123456789abcdef")
+_NO_CONTEXT = (None, None, None)
+
+
+def _is_hex(value: str, length: int) -> bool:
+    return len(value) == length and all(c in _HEX for c in value)
+
+
+def _is_id(value: str, length: int) -> bool:
+    # The ids are echoed into exported documents; an all-zero id is invalid in both formats.
+    return _is_hex(value, length) and value != "0" * length
+
+
+def parse_trace_header(value: str) -> tuple[Optional[str], Optional[str], Optional[bool]]:
+    """
+    (trace id, parent span id, sampled) from an X-Ray header (Root=1-5759e988-bd86...;
+    Parent=53995c3f42cd8ad8;Sampled=1) or a W3C traceparent (00-<trace>-<parent>-<flags>).
+    Sampled is None when the caller left the decision to us. A header that does not parse, or
+    carries malformed ids, is treated as no incoming context at all.
+    """
+    if value.startswith("Root=") or ";" in value:
+        fields = dict(part.split("=", 1) for part in value.split(";") if "=" in part)
+        root = fields.get("Root", "").split("-")
+        if len(root) != 3 or root[0] != "1" or not _is_id(root[1] + root[2], 32):
+            return _NO_CONTEXT
+        parent = fields.get("Parent")
+        if parent is not None and not _is_id(parent, 16):
+            return _NO_CONTEXT
+        sampled = {"1": True, "0": False}.get(fields.get("Sampled"))
+        return root[1] + root[2], parent, sampled
+    parts = value.split("-")
+    if len(parts) != 4 or not (
+        _is_id(parts[1], 32) and _is_id(parts[2], 16) and _is_hex(parts[3], 2)
+    ):
+        return _NO_CONTEXT
+    return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+
+
+def new_trace_id() -> str:
+    # 32 hex digits starting with the epoch seconds, which makes it a valid X-Ray id too.
+    return f"{int(time.time()):08x}{secrets.token_hex(12)}"
+
+
+class FileExporter:
+    """Appends each span as a JSON line to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        lines = b"".join(orjson.dumps(span.to_dict()) + b"\n" for span in spans)
+        with self._lock, open(self.path, "ab") as f:
+            f.write(lines)
+
+
+class XRayExporter:
+    """
+    Sends spans to the X-Ray daemon (AWS_XRAY_DAEMON_ADDRESS) as UDP segment documents.
+    Root spans become segments, or subsegments of the caller's segment when there is one.
+    """
+
+    HEADER = b'{"format": "json", "version": 1}\n'
+
+    def __init__(self, address: str, service_name: str):
+        host, port = address.rsplit(":", 1)
+        self.address = (host, int(port))
+        self.service_name = service_name
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    @staticmethod
+    def document(span: Span, service_name: str) -> dict:
+        document = {
+            "name": span.name,
+            "id": span.span_id,
+            "trace_id": f"1-{span.trace_id[:8]}-{span.trace_id[8:]}",
+            "start_time": span.start / 1e9,
+            "end_time": span.end / 1e9,
+        }
+        if span.parent_id is None:
+            document["name"] = service_name
+            document["annotations"] = {"route": span.name}
+        else:
+            document["type"] = "subsegment"
+            document["parent_id"] = span.parent_id
+        statement = span.attributes.get("statement")
+        if statement is not None:
+            document["namespace"] = "remote"
+            document["sql"] = {"sanitized_query": statement}
+        elif span.attributes:
+            document["metadata"] = {"hye": span.attributes}
+        if span.error is not None:
+            document["fault"] = True
+            document["cause"] = {"exceptions": [{"message": span.error}]}
+        return document
+
+    def export(self, spans: list[Span]) -> None:
+        for span in spans:
+            payload = self.HEADER + orjson.dumps(self.document(span, self.service_name))
+            try:
+                self._socket.sendto(payload, self.address)
+            except OSError as e:
+                logger.warning("Failed to send span to the X-Ray daemon: %s", e)
+
+
+class OTLPExporter:
+    """
+    Posts spans as OTLP/HTTP JSON to OTLP_ENDPOINT/v1/traces from a daemon thread, so requests
+    only pay for a queue put. httpx is imported by that thread.
+    """
+
+    def __init__(self, endpoint: str, service_name: str, max_queued: int = 10000):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self._queue: queue.Queue = queue.Queue(max_queued)
+        self._thread = None
+
+    @staticmethod
+    def otlp_span(span: Span) -> dict:
+        otlp = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 2 if span.parent_id is None else 1,
+            "startTimeUnixNano": str(span.start),
+            "endTimeUnixNano": str(span.end),
+            "attributes": [
+                {"key": key, "value": {"stringValue": str(value)}}
+                for key, value in span.attributes.items()
+            ],
+        }
+        if span.parent_id is not None:
+            otlp["parentSpanId"] = span.parent_id
+        if span.error is not None:
+            otlp["status"] = {"code": 2, "message": span.error}
+        return otlp
+
+    def export(self, spans: list[Span]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hye-otlp", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("OTLP export queue full, dropping %d spans", len(spans))
+
+    def _run(self) -> None:
+        import httpx
+
+        resource = {
+            "attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]
+        }
+        with httpx.Client(timeout=5.0) as client:
+            while True:
+                spans = self._queue.get()
+                # Send whatever else has queued up in the same request.
+                while len(spans) < 512 and not self._queue.empty():
+                    spans = spans + self._queue.get_nowait()
+                body = {
+                    "resourceSpans": [
+                        {
+                            "resource": resource,
+                            "scopeSpans": [
+                                {"scope": {"name": "hye"}, "spans": list(map(self.otlp_span, spans))}
+                            ],
+                        }
+                    ]
+                }
+                try:
+                    client.post(
+                        self.url,
+                        content=orjson.dumps(body),
+                        headers={"content-type": "application/json"},
+                    ).raise_for_status()
+                except Exception as e:
+                    logger.warning("Failed to export %d spans over OTLP: %s", len(spans), e)
+
+
+def create_exporter(config):
+    if config.EXPORTER == "xray":
+        return XRayExporter(config.XRAY_DAEMON_ADDRESS, config.SERVICE_NAME)
+    if config.EXPORTER == "otlp":
+        return OTLPExporter(config.OTLP_ENDPOINT, config.SERVICE_NAME)
+    if config.EXPORTER == "file":
+        return FileExporter(config.FILE_PATH)
+    raise ValueError(f"Unknown tracing exporter: {config.EXPORTER}")
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening the root span of sampled requests and exporting their spans
+    once the response is sent.
+    """
+
+    def __init__(self, app, config, exporter=None):
+        self.app = app
+        self.rate = config.RATE
+        self.exporter = exporter or create_exporter(config)
+
+    @staticmethod
+    def incoming_context(scope) -> tuple[Optional[str], Optional[str], Optional[bool]]:
+        # On Lambda the runtime sets the function segment's header for each invocation.
+        header = os.environ.get("_X_AMZN_TRACE_ID")
+        if header is None:
+            headers = dict(scope.get("headers", ()))
+            header = headers.get(b"x-amzn-trace-id") or headers.get(b"traceparent")
+            header = header.decode("latin-1") if header else None
+        return parse_trace_header(header) if header else (None, None, None)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trace_id, parent_id, sampled = self.incoming_context(scope)
+        if sampled is None:
+            sampled = random.random() < self.rate
+        if not sampled:
+            return await self.app(scope, receive, send)
+
+        spans = []
+        root = Span(scope["method"], trace_id or new_trace_id(), parent_id, spans, {})
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root.attributes["status"] = message["status"]
+            await send(message)
+
+        error = None
+        token = _current.set(root)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            _current.reset(token)
+            root.name = f"{scope['method']} {route_template(scope, scope['path'])}"
+            root.finish(error)
+            self.exporter.export(spans)
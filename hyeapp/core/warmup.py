@@ -0,0 +1,73 @@
+"""
+Init-phase warmup.
+
+Everything here runs before the first request: on Lambda during the init phase (larger CPU share,
+unbilled on provisioned concurrency), on a long-running server from the ASGI lifespan startup.
+Each step is bounded by a timeout and failures are only logged, so a slow or unavailable
+dependency degrades to the old behaviour (the first request pays for it) instead of failing init.
+"""
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy.sql import text
+
+import dbcrud.friends as dbcrudfriends
+import dbcrud.user as dbcruduser
+
+logger = logging.getLogger(__name__)
+
+
+async def open_db_connection(database) -> None:
+    """
+    Check out a pooled connection, validate it, and run each hot statement once so it is compiled
+    into the engine's statement cache and prepared on the connection that stays in the pool.
+    The statements are read-only and run with empty parameters, so they match no rows.
+    """
+    async with database.engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        for statement in dbcrudfriends.HOT_STATEMENTS + dbcruduser.HOT_STATEMENTS:
+            params = dict.fromkeys(statement.compile().params, "")
+            await conn.execute(statement, params)
+
+
+async def prime_jwks_cache(verifier) -> None:
+    """Download the Cognito signing keys so the first verify_token does not have to."""
+    await verifier.fetch_jwks()
+
+
+async def _run_step(name: str, step, timeout: float) -> bool:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(step(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Warmup step %s timed out after %.1fs", name, timeout)
+        return False
+    except Exception as e:
+        logger.warning("Warmup step %s failed: %s", name, e)
+        return False
+    logger.info(
+        "Warmup step %s finished in %.1f ms", name, (time.perf_counter() - started) * 1000
+    )
+    return True
+
+
+async def warmup(app) -> dict[str, bool]:
+    """
+    Run all warmup steps for the app's database and token verifier concurrently and return
+    whether each one succeeded. Never raises; disabled entirely with HYE_WARMUP_ENABLED=false.
+    """
+    config = app.state.settings.warmup
+    if not config.ENABLED:
+        return {}
+
+    timeout = config.STEP_TIMEOUT_SECONDS
+    steps = {
+        "db_connection": lambda: open_db_connection(app.state.database),
+        "jwks": lambda: prime_jwks_cache(app.state.verifier),
+    }
+    results = await asyncio.gather(
+        *(_run_step(name, step, timeout) for name, step in steps.items())
+    )
+    return dict(zip(steps, results))
@@ -1,31 +1,343 @@
-from typing import AsyncGenerator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import functools
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from typing import AsyncGenerator, Optional
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine import URL
-from core.config import db_configuration
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from core import timing, tracing
+from core.circuit_breaker import CircuitBreaker
+from core.metrics import route_template
+from core.config import DatabaseConfig
 
-# Create the connection URL.
-url_object = URL.create(
-    drivername="postgresql+asyncpg",
-    username=db_configuration.DB_USERNAME,
-    password=db_configuration.DB_PASSWORD,
-    host=db_configuration.DB_HOST,
-    port=db_configuration.DB_PORT,
-    database=db_configuration.DB_NAME,
-)
+logger = logging.getLogger(__name__)
 
-# Create async engine.
-engine = create_async_engine(url_object, echo=True)
 
-# Create async session factory.
-async_session_maker = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+class DatabaseUnavailable(HTTPException):
+    """
+    The database cannot be reached, or the circuit breaker is open: a 503 unless the endpoint has
+    a fallback. Not a SQLAlchemyError, so the CRUD functions let it through.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable. Please retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def is_connection_failure(error: BaseException) -> bool:
+    """
+    Whether `error` means the server is unreachable or not accepting connections (refused, reset,
+    timed out, failing over), as opposed to a problem with the statement.
+    """
+    if isinstance(error, OSError):  # TimeoutError included
+        return True
+    sqlstate = getattr(error, "sqlstate", None) or ""
+    # Class 08 is connection exceptions; 57P01-03 are shutdowns and "cannot connect now".
+    return sqlstate.startswith("08") or sqlstate in ("57P01", "57P02", "57P03")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default async pool, reporting the time each checkout took (waiting for a free connection,
+    or opening a new one) to the request's "session" phase. With a circuit breaker
+    (instrument_breaker), checkouts fail fast while it is open, and failing to connect counts
+    against it.
+    """
+
+    breaker: Optional[CircuitBreaker] = None
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.breaker = self.breaker
+        return pool
+
+    def _do_get(self):
+        breaker = self.breaker
+        if breaker is not None and not breaker.allow():
+            raise DatabaseUnavailable(breaker.retry_after)
+        started = perf_counter()
+        try:
+            record = super()._do_get()
+        except Exception as e:
+            if breaker is None or not is_connection_failure(e):
+                raise
+            breaker.record_failure()
+            raise DatabaseUnavailable(breaker.retry_after) from e
+        finally:
+            waited = perf_counter() - started
+            timing.record("session", waited)
+        # Read by instrument_pool's checkout listener, which runs right after.
+        record.info["hye_waited"] = waited
+        return record
+
+
+def create_engine(config: DatabaseConfig, metrics=None, breaker=None) -> AsyncEngine:
+    # Create the connection URL.
+    url_object = URL.create(
+        drivername="postgresql+asyncpg",
+        username=config.DB_USERNAME,
+        password=config.DB_PASSWORD,
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        database=config.DB_NAME,
+    )
+
+    # Create async engine.
+    engine = create_async_engine(
+        url_object,
+        echo=config.DB_ECHO,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+        poolclass=TimedQueuePool,
+        connect_args={
+            "timeout": config.DB_CONNECT_TIMEOUT_SECONDS,
+            "command_timeout": config.DB_STATEMENT_TIMEOUT_SECONDS or None,
+        },
+    )
+    instrument_engine(engine)
+    if metrics is not None:
+        instrument_pool(engine, metrics)
+    if breaker is not None:
+        instrument_breaker(engine, breaker)
+    return engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more statements than its endpoint's budget, or repeated one statement."""
+
+
+class QueryStats:
+    """
+    Statements run and total database time for one request, keyed by statement text, with the
+    request's route and the budget mode to check them in.
+    """
+
+    __slots__ = ("statements", "seconds", "fingerprints", "path", "mode")
+
+    def __init__(self, path: str = "", mode: str = "off"):
+        self.statements = 0
+        self.seconds = 0.0
+        self.fingerprints = Counter()
+        self.path = path
+        self.mode = mode
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("hye_query_stats", default=None)
+
+
+def begin_query_stats(path: str = "", mode: str = "off") -> QueryStats:
+    """
+    Count the statements run from here on in the current request. Tasks spawned later (e.g.
+    asyncio.gather in the home endpoint) copy the context and add to the same stats.
+    """
+    stats = QueryStats(path, mode)
+    _query_stats.set(stats)
+    return stats
+
+
+def query_budget(statements: int, max_repeats: int = 2):
+    """
+    Declare the most statements an endpoint may run per request, and how often one statement
+    may repeat before it is reported as a possible N+1. The budget is checked as soon as the
+    endpoint returns, before the response is sent, so in "raise" mode the request fails; a request
+    that failed is not checked.
+    """
+
+    def decorate(endpoint):
+        @functools.wraps(endpoint)
+        async def checked(*args, **kwargs):
+            response = await endpoint(*args, **kwargs)
+            stats = _query_stats.get()
+            if stats is not None:
+                check_query_budget(stats, stats.path, checked, stats.mode)
+            return response
+
+        checked.query_budget = (statements, max_repeats)
+        return checked
+
+    return decorate
+
+
+def check_query_budget(stats: QueryStats, path: str, endpoint, mode: str) -> None:
+    """Warn about, or raise QueryBudgetExceeded for, a request that exceeded its budget."""
+    if mode == "off":
+        return
+    budget, max_repeats = getattr(endpoint, "query_budget", (None, 2))
+
+    problems = []
+    if budget is not None and stats.statements > budget:
+        problems.append(
+            f"{path} ran {stats.statements} statements ({stats.seconds * 1000:.1f} ms), "
+            f"budget {budget}"
+        )
+    for statement, count in stats.fingerprints.items():
+        if count > max_repeats:
+            problems.append(
+                f"{path} ran one statement {count} times, possible N+1: {' '.join(statement.split())}"
+            )
+    if not problems:
+        return
+    if mode == "raise":
+        raise QueryBudgetExceeded("; ".join(problems))
+    for problem in problems:
+        logger.warning(problem)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._hye_span = tracing.start_span("SQL", statement=statement)
+    context._hye_started = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - context._hye_started
+    if context._hye_span is not None:
+        context._hye_span.finish()
+    timing.record("db", elapsed)
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+        stats.fingerprints[statement] += 1
+
+
+def _handle_error(exception_context):
+    span = getattr(exception_context.execution_context, "_hye_span", None)
+    if span is not None:
+        span.finish(exception_context.original_exception)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Report each statement's execution time (including the round trip) to the request's "db"
+    phase (core/timing.py) and query stats, and trace it as a span of sampled requests
+    (core/tracing.py). SQLAlchemy runs the events in the awaiting task's context, so they see
+    the request's context variables.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+def instrument_pool(engine: AsyncEngine, metrics) -> None:
+    """
+    Record the pool's state at every checkout into `metrics` (core/metrics.py) under the "pool"
+    route: open and checked-out connections, the checkout's wait, and the age of the connection
+    handed out. Listeners on the engine carry over to the pool it recreates after dispose().
+    """
+    sync_engine = engine.sync_engine
+
+    def connect(dbapi_connection, record):
+        record.info["hye_connected"] = time.monotonic()
+
+    def checkout(dbapi_connection, record, proxy):
+        pool = sync_engine.pool
+        checked_out = pool.checkedout()
+        metrics.observe("pool", "pool_checked_out", checked_out)
+        metrics.observe("pool", "pool_connections", checked_out + pool.checkedin())
+        metrics.observe("pool", "pool_checkout_wait", record.info.pop("hye_waited", 0.0) * 1000)
+        connected = record.info.get("hye_connected")
+        if connected is not None:
+            metrics.observe("pool", "pool_connection_age", time.monotonic() - connected)
+
+    event.listen(sync_engine, "connect", connect)
+    event.listen(sync_engine, "checkout", checkout)
+
+
+def instrument_breaker(engine: AsyncEngine, breaker: CircuitBreaker) -> None:
+    """
+    Trip `breaker` on connection failures and statement timeouts, and close it on any statement
+    that completes. Checkouts check it (TimedQueuePool).
+
+    Such failures on a connection that is already checked out (a statement timing out, which
+    asyncpg raises as a bare TimeoutError, or the connection dropped in a failover) are raised
+    as DatabaseUnavailable in place of the error SQLAlchemy would raise, so endpoints handle them
+    like a checkout the breaker refused. SQLAlchemy still invalidates a disconnected connection.
+    """
+    sync_engine = engine.sync_engine
+    sync_engine.pool.breaker = breaker
+
+    def succeeded(conn, cursor, statement, parameters, context, executemany):
+        breaker.record_success()
+
+    def failed(exception_context):
+        if exception_context.is_disconnect or is_connection_failure(
+            exception_context.original_exception
+        ):
+            breaker.record_failure()
+            # Registered after _handle_error, so the statement's span is finished first.
+            raise DatabaseUnavailable(breaker.retry_after)
+
+    event.listen(sync_engine, "after_cursor_execute", succeeded)
+    event.listen(sync_engine, "handle_error", failed)
+
+
+class Database:
+    """
+    Engine and session factory for one database configuration, attached to app.state.database.
+    Both are created on first use, so building an app does not touch SQLAlchemy's dialect machinery.
+    With a metrics registry, the pool's health is recorded into it (instrument_pool). The circuit
+    breaker outlives engines, so disposing the pool does not reset it.
+    """
+
+    def __init__(self, config: DatabaseConfig, metrics=None):
+        self.config = config
+        self.metrics = metrics
+        self.breaker = CircuitBreaker(
+            "database", config.DB_BREAKER_FAILURES, config.DB_BREAKER_RESET_SECONDS
+        )
+        self._engine = None
+        self._session_maker = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = create_engine(self.config, self.metrics, self.breaker)
+        return self._engine
+
+    @property
+    def session_maker(self) -> sessionmaker:
+        # Create async session factory.
+        if self._session_maker is None:
+            self._session_maker = sessionmaker(
+                bind=self.engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+            )
+        return self._session_maker
+
+    async def dispose(self) -> None:
+        """Close pooled connections; the engine is rebuilt if the database is used again."""
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._session_maker = None
+
+
+# Both dependencies start counting the request's statements, for the endpoint's query_budget.
+def _begin_request_stats(request: Request) -> None:
+    mode = request.app.state.settings.db.DB_QUERY_BUDGET
+    begin_query_stats(route_template(request.scope), mode)
 
 
 # Dependency for obtaining a DB session.
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    _begin_request_stats(request)
+    async with request.app.state.database.session_maker() as session:
         yield session
+
+
+# Dependency for endpoints that run several reads concurrently, one session (and pooled
+# connection) per read, since a single AsyncSession cannot run statements concurrently.
+async def get_session_maker(request: Request) -> AsyncGenerator[sessionmaker, None]:
+    _begin_request_stats(request)
+    yield request.app.state.database.session_maker
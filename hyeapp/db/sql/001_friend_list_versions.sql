@@ -0,0 +1,34 @@
+-- Per-user version of the friend graph, used as a cheap probe by the conditional GET endpoints
+-- (/friends/getFriendList, /friends/getFriendRequestList answer If-None-Match with 304).
+-- Bumped by trigger for both users of every inserted, updated or deleted friends row, so every
+-- write path (including ones added later) keeps it current without extra round trips.
+
+CREATE TABLE IF NOT EXISTS friend_list_versions (
+    user_id TEXT PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION bump_friend_list_versions() RETURNS trigger AS $$
+DECLARE
+    affected TEXT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        affected := ARRAY[NEW.sender_id, NEW.recipient_id];
+    ELSIF TG_OP = 'DELETE' THEN
+        affected := ARRAY[OLD.sender_id, OLD.recipient_id];
+    ELSE
+        affected := ARRAY[OLD.sender_id, OLD.recipient_id, NEW.sender_id, NEW.recipient_id];
+    END IF;
+
+    INSERT INTO friend_list_versions AS v (user_id, version)
+    SELECT DISTINCT user_id, 1 FROM unnest(affected) AS user_id
+    ON CONFLICT (user_id) DO UPDATE SET version = v.version + 1;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS friends_bump_versions ON friends;
+CREATE TRIGGER friends_bump_versions
+    AFTER INSERT OR UPDATE OR DELETE ON friends
+    FOR EACH ROW EXECUTE FUNCTION bump_friend_list_versions();
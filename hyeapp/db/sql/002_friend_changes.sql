@@ -0,0 +1,35 @@
+-- Append-only log of friend graph changes, read by /friends/changes (delta sync).
+-- Written by trigger for every inserted, updated or deleted friends row; deletes (rejected
+-- requests and removed friends) are recorded as 'removed' tombstones.
+--
+-- The sync cursor and pruning are defined in db/sql/007_friend_changes_commit_order.sql; the id
+-- only orders the changes within one transaction.
+
+CREATE TABLE IF NOT EXISTS friend_changes (
+    id BIGSERIAL PRIMARY KEY,
+    sender_id TEXT NOT NULL,
+    recipient_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS friend_changes_sender_id_idx ON friend_changes (sender_id, id);
+CREATE INDEX IF NOT EXISTS friend_changes_recipient_id_idx ON friend_changes (recipient_id, id);
+
+CREATE OR REPLACE FUNCTION log_friend_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO friend_changes (sender_id, recipient_id, status)
+        VALUES (OLD.sender_id, OLD.recipient_id, 'removed');
+    ELSE
+        INSERT INTO friend_changes (sender_id, recipient_id, status)
+        VALUES (NEW.sender_id, NEW.recipient_id, NEW.status);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS friends_log_changes ON friends;
+CREATE TRIGGER friends_log_changes
+    AFTER INSERT OR UPDATE OR DELETE ON friends
+    FOR EACH ROW EXECUTE FUNCTION log_friend_change();
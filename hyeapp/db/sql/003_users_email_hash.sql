@@ -0,0 +1,7 @@
+-- Hashed, normalized email for contact discovery (/users/matchContacts). Clients send
+-- hex(sha256(lower(trim(email)))) for each contact; matching is a set-based lookup on this index.
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS email_hash BYTEA
+    GENERATED ALWAYS AS (sha256(convert_to(lower(trim(email)), 'UTF8'))) STORED;
+
+CREATE INDEX IF NOT EXISTS users_email_hash_idx ON users (email_hash);
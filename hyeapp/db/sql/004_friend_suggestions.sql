@@ -0,0 +1,12 @@
+-- "People you may know": top-K friend-of-friend suggestions per user by mutual friend count.
+-- Written by the offline job batch/friend_suggestions.py, served by /friends/suggestions with a
+-- single primary key range scan.
+
+CREATE TABLE IF NOT EXISTS friend_suggestions (
+    user_id TEXT NOT NULL,
+    rank SMALLINT NOT NULL,
+    suggested_id TEXT NOT NULL,
+    mutual_count INTEGER NOT NULL,
+    computed_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, rank)
+);
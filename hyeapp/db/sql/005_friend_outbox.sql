@@ -0,0 +1,43 @@
+-- Transactional outbox of friend graph events for downstream consumers (jobs/outbox.py).
+-- Written by trigger in the same transaction as the friends row change, so an event exists if and
+-- only if the change committed, and the request path pays no extra round trip.
+-- The dispatcher claims rows with FOR UPDATE SKIP LOCKED, hands them to its sink and deletes them
+-- (see db/sql/008_friend_outbox_leases.sql); several dispatchers can run side by side.
+
+CREATE TABLE IF NOT EXISTS friend_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    event_type TEXT NOT NULL,
+    sender_id TEXT NOT NULL,
+    recipient_id TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION write_friend_outbox() RETURNS trigger AS $$
+DECLARE
+    event TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        event := CASE NEW.status WHEN 'accepted' THEN 'friend.added' ELSE 'friend_request.sent' END;
+    ELSIF TG_OP = 'DELETE' THEN
+        event := CASE OLD.status WHEN 'accepted' THEN 'friend.removed' ELSE 'friend_request.rejected' END;
+    ELSIF NEW.status = 'accepted' AND OLD.status <> 'accepted' THEN
+        event := 'friend_request.accepted';
+    ELSE
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO friend_outbox (event_type, sender_id, recipient_id)
+        VALUES (event, OLD.sender_id, OLD.recipient_id);
+    ELSE
+        INSERT INTO friend_outbox (event_type, sender_id, recipient_id)
+        VALUES (event, NEW.sender_id, NEW.recipient_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS friends_write_outbox ON friends;
+CREATE TRIGGER friends_write_outbox
+    AFTER INSERT OR UPDATE OR DELETE ON friends
+    FOR EACH ROW EXECUTE FUNCTION write_friend_outbox();
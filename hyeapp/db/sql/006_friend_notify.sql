@@ -0,0 +1,24 @@
+-- Live friend graph notifications for the /friends/events stream (core/friend_events.py).
+-- Every change to a friends row sends NOTIFY friend_events with "<sender_id>,<recipient_id>";
+-- Postgres delivers it when the transaction commits, and not at all if it rolls back.
+-- Listeners only learn that a user's friend graph changed; the changes themselves are read from
+-- friend_changes (/friends/changes).
+
+CREATE OR REPLACE FUNCTION notify_friend_change() RETURNS trigger AS $$
+DECLARE
+    changed friends%ROWTYPE;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+    PERFORM pg_notify('friend_events', changed.sender_id || ',' || changed.recipient_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS friends_notify_changes ON friends;
+CREATE TRIGGER friends_notify_changes
+    AFTER INSERT OR UPDATE OR DELETE ON friends
+    FOR EACH ROW EXECUTE FUNCTION notify_friend_change();
@@ -0,0 +1,50 @@
+-- Commit-ordered cursor for /friends/changes (db/sql/002_friend_changes.sql).
+--
+-- friend_changes.id is handed out at insert time, not in commit order: a transaction holding id
+-- 100 can commit after one holding id 101 has been read, and a cursor past 101 would never see
+-- 100. Each change now records the id of the transaction that wrote it (txid), and readers only
+-- return changes of transactions older than every transaction still in flight
+-- (pg_snapshot_xmin of the reading statement's snapshot). Those have all committed or rolled
+-- back, and any change committed later has a larger txid, so the cursor (a txid) never passes a
+-- change that is yet to be delivered. A long-running transaction anywhere in the cluster delays
+-- delta sync until it ends; it cannot make it skip changes.
+--
+-- Transaction ids are the 64-bit xid8 values (no wraparound), stored as BIGINT.
+
+ALTER TABLE friend_changes ADD COLUMN IF NOT EXISTS txid BIGINT NOT NULL
+    DEFAULT CAST(CAST(pg_current_xact_id() AS TEXT) AS BIGINT);
+
+CREATE INDEX IF NOT EXISTS friend_changes_sender_txid_idx ON friend_changes (sender_id, txid);
+CREATE INDEX IF NOT EXISTS friend_changes_recipient_txid_idx ON friend_changes (recipient_id, txid);
+DROP INDEX IF EXISTS friend_changes_sender_id_idx;
+DROP INDEX IF EXISTS friend_changes_recipient_id_idx;
+
+-- Low-water mark of the log: every change with txid <= pruned_through may have been deleted.
+-- Clients with an older cursor are told to resync; sequence gaps no longer matter.
+-- The initial mark covers the rows backfilled above and every cursor handed out before this
+-- migration (those were ids, not txids), so those clients resync once.
+CREATE TABLE IF NOT EXISTS friend_changes_pruned (
+    singleton BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (singleton),
+    pruned_through BIGINT NOT NULL
+);
+
+INSERT INTO friend_changes_pruned (pruned_through)
+VALUES (CAST(CAST(pg_current_xact_id() AS TEXT) AS BIGINT))
+ON CONFLICT (singleton) DO NOTHING;
+
+-- Prune old entries and raise the mark in the same transaction, e.g. daily:
+--     SELECT prune_friend_changes(interval '30 days');
+CREATE OR REPLACE FUNCTION prune_friend_changes(retain INTERVAL) RETURNS BIGINT AS $$
+DECLARE
+    pruned BIGINT;
+BEGIN
+    WITH deleted AS (
+        DELETE FROM friend_changes WHERE changed_at < now() - retain RETURNING txid
+    )
+    SELECT MAX(txid) INTO pruned FROM deleted;
+    IF pruned IS NOT NULL THEN
+        UPDATE friend_changes_pruned SET pruned_through = GREATEST(pruned_through, pruned);
+    END IF;
+    RETURN pruned;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,7 @@
+-- Leases for claimed outbox events (jobs/outbox.py).
+-- The dispatcher used to hold its FOR UPDATE SKIP LOCKED claim, in an open transaction, while the
+-- sink sent the events to SQS. Now a short transaction sets claimed_until on the claimed rows,
+-- delivery runs without a transaction, and a second short transaction deletes them. Rows whose
+-- lease has expired (the dispatcher died mid-batch) are claimed again.
+
+ALTER TABLE friend_outbox ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;
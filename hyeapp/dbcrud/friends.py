@@ -2,43 +2,289 @@
 Database operations for friend management.
 """
 
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from sqlalchemy.sql import text
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 import logging
-from typing import Tuple
+from typing import Optional, Tuple
+from core.friend_graph import FriendSet, FriendSetCache, build_friend_set, intersect_sorted
 
 logger = logging.getLogger(__name__)
 
 
-async def get_friend_list(user_id: str, db: AsyncSession) -> list[str]:
-    """Get the list of friends for a given user"""
+# Read statements are built once at import time rather than on every call, and are listed in
+# HOT_STATEMENTS so the init-phase warmup can compile and prepare them ahead of the first request.
+FETCH_FRIENDS_AS_SENDER = text(
+    """
+    SELECT u.username AS recipient_username FROM friends f
+    JOIN users u ON u.id = f.recipient_id
+    WHERE sender_id = :user_id AND status = 'accepted'
+"""
+)
 
-    fetch_friends1 = text(
-        """
-        SELECT u.username AS recipient_username FROM friends f
-        JOIN users u ON u.id = f.recipient_id
-        WHERE sender_id = :user_id AND status = 'accepted'
+FETCH_FRIENDS_AS_RECIPIENT = text(
     """
-    )
+    SELECT u.username AS sender_username FROM friends f
+    JOIN users u ON u.id = f.sender_id
+    WHERE recipient_id = :user_id AND status = 'accepted'
+"""
+)
 
-    fetch_friends2 = text(
-        """
-        SELECT u.username AS sender_username FROM friends f
-        JOIN users u ON u.id = f.sender_id
-        WHERE recipient_id = :user_id AND status = 'accepted'
+FETCH_REQUESTS_SENT = text(
+    """
+    SELECT u.username AS recipient_username FROM friends f
+    JOIN users u ON u.id = f.recipient_id
+    WHERE f.sender_id = :user_id AND f.status = 'pending'
+"""
+)
+
+FETCH_REQUESTS_RECEIVED = text(
+    """
+    SELECT u.username AS sender_username FROM friends f
+    JOIN users u ON u.id = f.sender_id
+    WHERE recipient_id = :user_id AND status = 'pending'
+"""
+)
+
+# Maintained by the friends_bump_versions trigger (db/sql/001_friend_list_versions.sql).
+FETCH_FRIEND_LIST_VERSION = text(
+    """
+    SELECT version FROM friend_list_versions WHERE user_id = :user_id
+"""
+)
+
+# Written by the friends_log_changes trigger (db/sql/002_friend_changes.sql). The cursor is a
+# transaction id, and only transactions older than every one still in flight are read
+# (db/sql/007_friend_changes_commit_order.sql). A page ends on a transaction boundary, so it can
+# run past :limit. Every row carries the snapshot's xmin, the pruning mark and the page's size and
+# last transaction; the mark is read with the same snapshot as the changes, so a concurrent prune
+# is either reflected in it or has not removed anything yet. Without changes there is one row of
+# NULLs besides those. Changes involving a deleted user are still returned, with a NULL username.
+FETCH_FRIEND_CHANGES = text(
     """
+    WITH snapshot AS (
+        SELECT CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS TEXT) AS BIGINT) AS xmin,
+            (SELECT pruned_through FROM friend_changes_pruned) AS pruned_through
+    ),
+    page AS (
+        SELECT c.txid FROM friend_changes c, snapshot s
+        WHERE (c.sender_id = :user_id OR c.recipient_id = :user_id)
+            AND c.txid > :since AND c.txid < s.xmin
+        ORDER BY c.txid
+        LIMIT :limit
+    ),
+    page_bounds AS (
+        SELECT COUNT(*) AS page_rows, MAX(txid) AS page_end FROM page
     )
+    SELECT s.xmin, s.pruned_through, b.page_rows, b.page_end, c.txid, c.status, c.other_id,
+        u.username, c.direction
+    FROM snapshot s
+    CROSS JOIN page_bounds b
+    LEFT JOIN (
+        SELECT id, txid, status,
+            CASE WHEN sender_id = :user_id THEN recipient_id ELSE sender_id END AS other_id,
+            CASE WHEN sender_id = :user_id THEN 'sent' ELSE 'received' END AS direction
+        FROM friend_changes
+        WHERE (sender_id = :user_id OR recipient_id = :user_id) AND txid > :since
+    ) c ON c.txid <= b.page_end
+    LEFT JOIN users u ON u.id = c.other_id
+    ORDER BY c.txid, c.id
+"""
+)
+
+# Every transaction before the oldest one in flight has ended, so the lists read afterwards
+# include all of its changes.
+FETCH_CHANGE_CURSOR = text(
+    """
+    SELECT CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS TEXT) AS BIGINT) - 1
+"""
+)
+
+# Written by batch/friend_suggestions.py (db/sql/004_friend_suggestions.sql).
+FETCH_FRIEND_SUGGESTIONS = text(
+    """
+    SELECT u.username, s.mutual_count FROM friend_suggestions s
+    JOIN users u ON u.id = s.suggested_id
+    WHERE s.user_id = :user_id AND s.rank < :limit
+    ORDER BY s.rank
+"""
+)
+
+# Both users of a /mutual query with their friend list versions, in one round trip.
+FETCH_MUTUAL_PAIR = text(
+    """
+    SELECT u.id, u.username, COALESCE(v.version, 0) AS version FROM users u
+    LEFT JOIN friend_list_versions v ON v.user_id = u.id
+    WHERE u.id = :user_id OR u.username = :username
+"""
+)
+
+FETCH_FRIEND_IDS = text(
+    """
+    SELECT CASE WHEN sender_id = :user_id THEN recipient_id ELSE sender_id END FROM friends
+    WHERE (sender_id = :user_id OR recipient_id = :user_id) AND status = 'accepted'
+"""
+)
+
+FETCH_USERNAMES_BY_ID = text(
+    """
+    SELECT id, username FROM users WHERE id = ANY(CAST(:ids AS TEXT[]))
+"""
+)
+
+HOT_STATEMENTS = (
+    FETCH_FRIEND_LIST_VERSION,
+    FETCH_FRIENDS_AS_SENDER,
+    FETCH_FRIENDS_AS_RECIPIENT,
+    FETCH_REQUESTS_SENT,
+    FETCH_REQUESTS_RECEIVED,
+)
+
+
+async def get_friend_changes(
+    user_id: str, since: Optional[int], limit: int, db: AsyncSession
+) -> Tuple[list[dict], int, bool, bool]:
+    """
+    Get the changes to a user's friend graph committed after cursor `since`
+    (db/sql/007_friend_changes_commit_order.sql).
+    Reads about `limit` log entries (whole transactions) and keeps only the latest change per edge.
+    Returns (changes, next_cursor, has_more, resync_required). Without `since` no changes are
+    returned, only the current cursor, for clients about to download the full lists.
+    """
+
+    try:
+        if since is None:
+            result = await db.execute(FETCH_CHANGE_CURSOR)
+            return [], result.scalar_one(), False, False
+
+        result = await db.execute(
+            FETCH_FRIEND_CHANGES, {"user_id": user_id, "since": since, "limit": limit}
+        )
+        rows = result.fetchall()
+    except SQLAlchemyError as e:
+        logger.error("Failed to get friend changes: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to get friend changes.")
+
+    snapshot = rows[0]
+    rows = [row for row in rows if row.txid is not None]
+    resync_required = snapshot.pruned_through is not None and since < snapshot.pruned_through
+
+    # Collapse to the latest change per edge, ordered by when that change happened.
+    latest = {}
+    for row in rows:
+        key = (row.direction, row.other_id)
+        latest.pop(key, None)
+        latest[key] = {"username": row.username, "direction": row.direction, "status": row.status}
+
+    # Decided by the page itself, not by the rows returned for it.
+    has_more = snapshot.page_rows >= limit
+    # A page that was not full covered every transaction before the oldest one in flight.
+    next_cursor = snapshot.page_end if has_more else max(since, snapshot.xmin - 1)
+    return list(latest.values()), next_cursor, has_more, resync_required
+
+
+async def get_friend_suggestions(
+    user_id: str, limit: int, db: AsyncSession
+) -> list[dict]:
+    """Get the precomputed friend-of-friend suggestions for a user, most mutual friends first"""
+
+    try:
+        result = await db.execute(
+            FETCH_FRIEND_SUGGESTIONS, {"user_id": user_id, "limit": limit}
+        )
+        suggestions = [dict(row._mapping) for row in result.fetchall()]
+    except SQLAlchemyError as e:
+        logger.error("Failed to get friend suggestions: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to get friend suggestions.")
+
+    return suggestions
+
+
+async def _get_friend_set(
+    user_id: str, version: int, cache: FriendSetCache, db: AsyncSession
+) -> FriendSet:
+    friend_set = cache.get(user_id, version)
+    if friend_set is None:
+        result = await db.execute(FETCH_FRIEND_IDS, {"user_id": user_id})
+        friend_set = build_friend_set(version, (row[0] for row in result.fetchall()))
+        cache.set(user_id, friend_set)
+    return friend_set
+
+
+async def get_mutual_friends(
+    user_id: str,
+    username: str,
+    offset: int,
+    limit: int,
+    cache: FriendSetCache,
+    db: AsyncSession,
+) -> Optional[Tuple[list[str], int]]:
+    """
+    Get one page of the friends a user has in common with `username`, and the total count.
+    Friend sets come from `cache` when their version is current; only the usernames on the
+    requested page are looked up. The order is stable across calls (by user key, see
+    core/friend_graph.py), so offset paging is consistent while neither friend list changes.
+    Returns None if `username` does not exist.
+    """
+
+    try:
+        result = await db.execute(
+            FETCH_MUTUAL_PAIR, {"user_id": user_id, "username": username}
+        )
+        rows = result.fetchall()
+        other_id = next((row.id for row in rows if row.username == username), None)
+        if other_id is None:
+            return None
+        versions = {row.id: row.version for row in rows}
+
+        # Versions are read before the friend lists, so a concurrent write can only leave a
+        # cache entry tagged older than its contents, which the next version check replaces.
+        mine = await _get_friend_set(user_id, versions.get(user_id, 0), cache, db)
+        theirs = await _get_friend_set(other_id, versions[other_id], cache, db)
+
+        positions = intersect_sorted(mine.keys, theirs.keys)
+        page_ids = [mine.user_ids[i] for i in positions[offset : offset + limit]]
+        usernames = await _usernames(page_ids, db)
+    except SQLAlchemyError as e:
+        logger.error("Failed to get mutual friends: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to get mutual friends.")
+
+    return [usernames[id_] for id_ in page_ids if id_ in usernames], len(positions)
+
+
+async def _usernames(user_ids: list[str], db: AsyncSession) -> dict[str, str]:
+    if not user_ids:
+        return {}
+    result = await db.execute(FETCH_USERNAMES_BY_ID, {"ids": list(user_ids)})
+    return {row.id: row.username for row in result.fetchall()}
+
+
+async def get_friend_list_version(user_id: str, db: AsyncSession) -> int:
+    """
+    Get the version of a user's friend graph (friends and pending requests).
+    It changes whenever a friends row involving the user changes; 0 if it never has.
+    """
+
+    try:
+        result = await db.execute(FETCH_FRIEND_LIST_VERSION, {"user_id": user_id})
+        version = result.scalar_one_or_none()
+    except SQLAlchemyError as e:
+        logger.error("Failed to get friend list version: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to get friend list.")
+
+    return version or 0
+
+
+async def get_friend_list(user_id: str, db: AsyncSession) -> list[str]:
+    """Get the list of friends for a given user"""
 
     try:
-        result = await db.execute(fetch_friends1, {"user_id": user_id})
+        result = await db.execute(FETCH_FRIENDS_AS_SENDER, {"user_id": user_id})
         friends = [row[0] for row in result.fetchall()]
 
-        result = await db.execute(fetch_friends2, {"user_id": user_id})
+        result = await db.execute(FETCH_FRIENDS_AS_RECIPIENT, {"user_id": user_id})
         friends += [row[0] for row in result.fetchall()]
     except SQLAlchemyError as e:
         logger.error("Failed to get friend list for user: %s", e, exc_info=True)
@@ -50,24 +296,8 @@ async def get_friend_list(user_id: str, db: AsyncSession) -> list[str]:
 async def get_friend_request_list(user_id: str, db: AsyncSession) -> list[dict]:
     """Get the list of friend requests received and sent by a given user that have not been accepted nor rejected"""
 
-    fetch_requests_sent = text(
-        """
-        SELECT u.username AS recipient_username FROM friends f
-        JOIN users u ON u.id = f.recipient_id
-        WHERE f.sender_id = :user_id AND f.status = 'pending'
-    """
-    )
-
-    fetch_requests_received = text(
-        """
-        SELECT u.username AS sender_username FROM friends f
-        JOIN users u ON u.id = f.sender_id
-        WHERE recipient_id = :user_id AND status = 'pending'
-    """
-    )
-
     try:
-        result = await db.execute(fetch_requests_sent, {"user_id": user_id})
+        result = await db.execute(FETCH_REQUESTS_SENT, {"user_id": user_id})
         sent = [row[0] for row in result.fetchall()]
     except SQLAlchemyError as e:
         logger.error(
@@ -78,7 +308,7 @@ async def get_friend_request_list(user_id: str, db: AsyncSession) -> list[dict]:
         )
 
     try:
-        result = await db.execute(fetch_requests_received, {"user_id": user_id})
+        result = await db.execute(FETCH_REQUESTS_RECEIVED, {"user_id": user_id})
         received = [row[0] for row in result.fetchall()]
     except SQLAlchemyError as e:
         logger.error(
@@ -109,7 +339,7 @@ async def send_friend_request(
         )
         friend_exists = result.fetchone()._mapping["cnt"] == 1
         if not friend_exists:
-            logging.info("Friend username: {friend_username} does not exist.")
+            logger.info("Friend username: %s does not exist.", recipient_username)
             return False, False
     except SQLAlchemyError as e:
         logger.error("Failed to check friend username: %s", e, exc_info=True)
@@ -139,7 +369,7 @@ async def send_friend_request(
         )
         already_friends = result.fetchone()._mapping["cnt"] == 1
         if already_friends:
-            logging.info(f"{sender_id} and {recipient_username} are already friends.")
+            logger.info("%s and %s are already friends.", sender_id, recipient_username)
             return True, True
     except SQLAlchemyError as e:
         logger.error(
@@ -171,8 +401,8 @@ async def send_friend_request(
         )
         already_sent = result.fetchone()._mapping["cnt"] == 1
         if already_sent:
-            logging.info(
-                f"{sender_id} has already sent a friend request to {recipient_username}."
+            logger.info(
+                "%s has already sent a friend request to %s.", sender_id, recipient_username
             )
             return False, True
     except SQLAlchemyError as e:
@@ -212,7 +442,7 @@ async def send_friend_request(
             detail="Failed to send friend request. Please try again later.",
         )
     else:
-        logging.info(f"Friend request sent to {recipient_username}")
+        logger.info("Friend request sent to %s", recipient_username)
         return True, False
 
 
@@ -259,7 +489,7 @@ async def accept_friend_request(
             detail="Failed to accept friend request. Please try again later.",
         )
     else:
-        logging.info(f"Friend request from {sender_username} accepted")
+        logger.info("Friend request from %s accepted", sender_username)
         return True
 
 
@@ -298,5 +528,170 @@ async def remove_friend(
             detail="Failed to remove friend. Please try again later.",
         )
     else:
-        logging.info(f"Friend {recipient_username} removed")
+        logger.info("Friend %s removed", recipient_username)
         return deleted.rowcount == 1
+
+
+# Set-wise statements for apply_friend_batch. Arrays are cast explicitly since asyncpg cannot
+# infer the element type of unnest() parameters.
+FETCH_BATCH_EDGES = text(
+    """
+    SELECT u.id, u.username,
+        CASE WHEN f.sender_id = :user_id THEN 'sent' ELSE 'received' END AS direction,
+        f.status
+    FROM users u
+    LEFT JOIN friends f
+        ON (f.sender_id = :user_id AND f.recipient_id = u.id)
+        OR (f.recipient_id = :user_id AND f.sender_id = u.id)
+    WHERE u.username = ANY(CAST(:usernames AS TEXT[]))
+"""
+)
+
+DELETE_BATCH_EDGES = text(
+    """
+    DELETE FROM friends f
+    USING unnest(CAST(:sender_ids AS TEXT[]), CAST(:recipient_ids AS TEXT[])) AS d(sender_id, recipient_id)
+    WHERE f.sender_id = d.sender_id AND f.recipient_id = d.recipient_id
+"""
+)
+
+ACCEPT_BATCH_REQUESTS = text(
+    """
+    UPDATE friends SET status = 'accepted'
+    WHERE recipient_id = :user_id AND sender_id = ANY(CAST(:sender_ids AS TEXT[])) AND status = 'pending'
+"""
+)
+
+INSERT_BATCH_REQUESTS = text(
+    """
+    INSERT INTO friends (sender_id, recipient_id, status)
+    SELECT :user_id, recipient_id, 'pending' FROM unnest(CAST(:recipient_ids AS TEXT[])) AS recipient_id
+"""
+)
+
+
+def plan_friend_batch(
+    user_id: str, operations: list[Tuple[str, str]], edges: dict
+) -> Tuple[list[dict], dict]:
+    """
+    Work out the per-item results and the net changes of a batch of friend operations.
+
+    operations: (op, username) pairs, op one of "send", "accept", "reject", "remove", applied in order.
+    edges: username -> (user id, edge) for every username that exists, where edge is None or a
+    (direction, status) pair seen from `user_id`.
+    Results follow send_friend_request, accept_friend_request and remove_friend, except that
+    accept only reports True if a pending request from that user was actually accepted.
+    Returns (results, changes) where changes has the "delete", "accept" and "insert" edge lists.
+    """
+    state = {username: edge for username, (_, edge) in edges.items()}
+    results = []
+    for op, username in operations:
+        exists = username in state
+        edge = state.get(username)
+        if op == "send":
+            if not exists:
+                result = {"friend_request_sent": False, "friend_request_already_exist": False}
+            elif edge and edge[1] == "accepted":
+                result = {"friend_request_sent": True, "friend_request_already_exist": True}
+            elif edge:
+                result = {"friend_request_sent": False, "friend_request_already_exist": True}
+            else:
+                state[username] = ("sent", "pending")
+                result = {"friend_request_sent": True, "friend_request_already_exist": False}
+        elif op == "accept":
+            accepted = edge == ("received", "pending")
+            if accepted:
+                state[username] = ("received", "accepted")
+            result = {"friend_request_accepted": accepted}
+        elif op == "reject":
+            if edge == ("received", "pending"):
+                state[username] = None
+            result = {"friend_request_accepted": False}
+        elif op == "remove":
+            removed = bool(edge) and edge[1] == "accepted"
+            if removed:
+                state[username] = None
+            result = {"friend_removed": removed}
+        else:
+            raise ValueError(f"Unknown friend batch operation: {op}")
+        results.append(result)
+
+    changes = {"delete": [], "accept": [], "insert": []}
+    for username, (friend_id, initial) in edges.items():
+        final = state[username]
+        if final == initial:
+            continue
+        if initial == ("received", "pending") and final == ("received", "accepted"):
+            changes["accept"].append(friend_id)
+            continue
+        if initial:
+            pair = (user_id, friend_id) if initial[0] == "sent" else (friend_id, user_id)
+            changes["delete"].append(pair)
+        if final:
+            changes["insert"].append(friend_id)
+    return results, changes
+
+
+async def apply_friend_batch(
+    user_id: str, operations: list[Tuple[str, str]], db: AsyncSession
+) -> list[dict]:
+    """
+    Apply a batch of friend operations for a user in one transaction.
+    All usernames and their current edges are read with one query, the net changes are applied
+    with at most one DELETE, UPDATE and INSERT, and the transaction is committed once.
+    """
+
+    usernames = sorted({username for _, username in operations})
+    try:
+        result = await db.execute(
+            FETCH_BATCH_EDGES, {"user_id": user_id, "usernames": usernames}
+        )
+        edges = {}
+        for row in result.fetchall():
+            edge = (row.direction, row.status) if row.status else None
+            if row.username not in edges or edge:
+                edges[row.username] = (row.id, edge)
+
+        results, changes = plan_friend_batch(user_id, operations, edges)
+
+        if changes["delete"]:
+            sender_ids, recipient_ids = zip(*changes["delete"])
+            await db.execute(
+                DELETE_BATCH_EDGES,
+                {"sender_ids": list(sender_ids), "recipient_ids": list(recipient_ids)},
+            )
+        if changes["accept"]:
+            await db.execute(
+                ACCEPT_BATCH_REQUESTS,
+                {"user_id": user_id, "sender_ids": changes["accept"]},
+            )
+        if changes["insert"]:
+            await db.execute(
+                INSERT_BATCH_REQUESTS,
+                {"user_id": user_id, "recipient_ids": changes["insert"]},
+            )
+        await db.commit()
+    except IntegrityError as ie:
+        # A concurrent request changed one of the edges between the read and the writes.
+        await db.rollback()
+        logger.info("Integrity error while applying friend batch: %s", ie, exc_info=True)
+        raise HTTPException(
+            status_code=409,
+            detail="Friend list changed while applying the batch. Please retry.",
+        )
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error("Database error while applying friend batch: %s", e, exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to apply friend operations. Please try again later.",
+        )
+
+    logger.info(
+        "Friend batch of %d operations applied: %d deleted, %d accepted, %d sent",
+        len(operations),
+        len(changes["delete"]),
+        len(changes["accept"]),
+        len(changes["insert"]),
+    )
+    return results
@@ -2,9 +2,7 @@
 Database operations for user management.
 """
 
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from sqlalchemy.sql import text
 from sqlalchemy.exc import SQLAlchemyError
 import models.models as m
@@ -12,9 +10,52 @@ from schemas.user import UserCreate
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 import logging
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# Read statements built once at import time; see HOT_STATEMENTS in dbcrud.friends.
+COUNT_USERNAME = text(
+    """
+    SELECT COUNT(1) as cnt FROM users WHERE username ILIKE :username
+"""
+)
+
+COUNT_EMAIL = text(
+    """
+    SELECT COUNT(1) as cnt FROM users WHERE email = :email
+"""
+)
+
+FETCH_USER_PROFILE = text(
+    """
+    SELECT id, email, username, created_at FROM users WHERE id = :id
+"""
+)
+
+HOT_STATEMENTS = (COUNT_USERNAME, COUNT_EMAIL, FETCH_USER_PROFILE)
+
+# Uses users.email_hash (db/sql/003_users_email_hash.sql).
+MATCH_CONTACTS = text(
+    """
+    SELECT encode(u.email_hash, 'hex') AS email_hash, u.username,
+        CASE
+            WHEN f.status = 'accepted' THEN 'friends'
+            WHEN f.sender_id = :user_id THEN 'request_sent'
+            WHEN f.recipient_id = :user_id THEN 'request_received'
+            ELSE 'none'
+        END AS friendship_status
+    FROM users u
+    LEFT JOIN friends f
+        ON (f.sender_id = :user_id AND f.recipient_id = u.id)
+        OR (f.recipient_id = :user_id AND f.sender_id = u.id)
+    WHERE u.email_hash = ANY(CAST(:email_hashes AS BYTEA[])) AND u.id <> :user_id
+"""
+)
+
+# Hashes matched per statement; keeps each array parameter well below protocol limits.
+CONTACT_MATCH_CHUNK_SIZE = 2000
+
 
 async def create_user(db: AsyncSession, user: dict) -> m.Users:
     """
@@ -70,7 +111,7 @@ async def create_user(db: AsyncSession, user: dict) -> m.Users:
             status_code=500, detail="Failed to create user. Please try again later."
         )
     else:
-        logger.info(f"User created successfully: {user_profile}")
+        logger.info("User created successfully: %s", user_profile)
     return m.Users(**user_profile)
 
 
@@ -79,15 +120,22 @@ async def get_user_by_email(db: AsyncSession, email: str):
     return result.scalar_one_or_none()
 
 
+async def get_user_profile(user_id: str, db: AsyncSession) -> Optional[m.Users]:
+    """Get the user with the given id, or None if the user has not signed up"""
+    try:
+        result = await db.execute(FETCH_USER_PROFILE, {"id": user_id})
+        row = result.fetchone()
+    except SQLAlchemyError as e:
+        logger.error("Failed to get user profile: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Failed to get user profile.")
+
+    return m.Users(**row._mapping) if row else None
+
+
 async def check_username_availability(username: str, db: AsyncSession) -> bool:
     """Check if the username is already taken in the database"""
-    select_sql = text(
-        """
-        SELECT COUNT(1) as cnt FROM users WHERE username ILIKE :username
-    """
-    )
     try:
-        result = await db.execute(select_sql, {"username": username})
+        result = await db.execute(COUNT_USERNAME, {"username": username})
         available = result.fetchone()._mapping["cnt"] == 0
     except SQLAlchemyError as e:
         raise HTTPException(status_code=400, detail="username check failed.")
@@ -97,14 +145,8 @@ async def check_username_availability(username: str, db: AsyncSession) -> bool:
 
 async def check_user_email_existence(user_email: str, db: AsyncSession) -> bool:
     """Check if the user with given user_id already exists in the database"""
-    select_sql = text(
-        """
-        SELECT COUNT(1) as cnt FROM users WHERE email = :email
-    """
-    )
-
     try:
-        result = await db.execute(select_sql, {"email": user_email})
+        result = await db.execute(COUNT_EMAIL, {"email": user_email})
         exists = result.fetchone()._mapping["cnt"] == 1
     except SQLAlchemyError as e:
         raise HTTPException(
@@ -112,3 +154,27 @@ async def check_user_email_existence(user_email: str, db: AsyncSession) -> bool:
         )
 
     return exists
+
+
+async def match_contacts(
+    user_id: str, email_hashes: list[str], db: AsyncSession
+) -> list[dict]:
+    """
+    Find the registered users among a user's contacts, given as hex email hashes, together with
+    their friendship status with the user. Hashes are de-duplicated and matched set-wise against
+    the users.email_hash index, CONTACT_MATCH_CHUNK_SIZE per statement, on one session.
+    """
+    unique_hashes = sorted({bytes.fromhex(email_hash) for email_hash in email_hashes})
+    matches = []
+    try:
+        for start in range(0, len(unique_hashes), CONTACT_MATCH_CHUNK_SIZE):
+            chunk = unique_hashes[start : start + CONTACT_MATCH_CHUNK_SIZE]
+            result = await db.execute(
+                MATCH_CONTACTS, {"user_id": user_id, "email_hashes": chunk}
+            )
+            matches += [dict(row._mapping) for row in result.fetchall()]
+    except SQLAlchemyError as e:
+        logger.error("Failed to match contacts: %s", e, exc_info=True)
+        raise HTTPException(status_code=400, detail="Contact matching failed.")
+
+    return matches
@@ -0,0 +1,42 @@
+"""
+Lambda handlers for background work: the jobs SQS queue consumer (HYE_JOBS_TRANSPORT=sqs) and
+the scheduled friend outbox dispatcher.
+
+The queue event source mapping delivers batches of up to HYE_JOBS_BATCH_SIZE messages. Successful jobs
+are deleted, failed ones get a backoff visibility timeout and are reported as batch item
+failures, so only they are redelivered.
+"""
+
+import asyncio
+from application import create_app
+from jobs.transports import SQSTransport
+
+app = create_app()
+jobs = app.state.jobs
+
+
+async def consume(event: dict) -> dict:
+    batch = [SQSTransport.job_from_message(record) for record in event["Records"]]
+    results = await jobs.process_batch(batch)
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": record["messageId"]}
+            for record, ok in zip(event["Records"], results)
+            if not ok
+        ]
+    }
+
+
+def handler(event, context):
+    return asyncio.get_event_loop().run_until_complete(consume(event))
+
+
+def dispatch_handler(event, context):
+    """
+    Scheduled outbox dispatcher (jobs/outbox.py). Each invocation keeps polling until shortly
+    before its timeout, so with a one-minute schedule events wait about a poll interval, not a
+    minute.
+    """
+    loop = asyncio.get_event_loop()
+    seconds = context.get_remaining_time_in_millis() / 1000 - 5
+    loop.run_until_complete(app.state.outbox.run(until=loop.time() + seconds))
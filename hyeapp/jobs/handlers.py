@@ -0,0 +1,36 @@
+"""
+Job handlers, registered by name with @job_handler. Friend outbox events are delivered as jobs
+named after the event type (jobs/outbox.py), so registering a handler for an event type is all
+it takes to act on it.
+
+Jobs are delivered at least once (a retried enqueue, an SQS redelivery after a timeout), so every
+handler must be idempotent: running it twice with the same payload has the same effect as once.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def job_handler(name: str):
+    def register(fn):
+        HANDLERS[name] = fn
+        return fn
+
+    return register
+
+
+@job_handler("friend_request.sent")
+async def friend_request_sent(state, payload: dict) -> None:
+    """
+    Fan-out after a friend request is committed (delivered from the outbox, jobs/outbox.py).
+    There is no push provider yet, so the recipient notification is only logged; new side effects
+    of sending a request belong here rather than in the endpoint.
+    """
+    logger.info(
+        "Notifying %s of a friend request from %s",
+        payload["recipient_id"],
+        payload["sender_id"],
+    )
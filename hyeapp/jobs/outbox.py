@@ -0,0 +1,165 @@
+"""
+Dispatcher for the friend outbox (db/sql/005_friend_outbox.sql).
+
+Events are claimed in id order with FOR UPDATE SKIP LOCKED by setting a lease
+(db/sql/008_friend_outbox_leases.sql) in a short transaction, then handed to a sink with no
+transaction open, and deleted once delivered. No row locks are held and no transaction is open
+while the sink talks to SQS, so that neither blocks writers nor holds back the snapshot xmin that
+/friends/changes waits on. If the sink raises, the lease is released and the events are claimed
+again on the next poll; if the dispatcher dies, they are claimed again once the lease expires.
+Delivery is therefore at least once, and sinks receive the outbox id to dedupe.
+
+Runs as a task in each long-running server worker (started by the app lifespan) and as the
+scheduled Lambda jobs.consumer.dispatch_handler.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.sql import text
+
+from jobs.transports import Job
+
+logger = logging.getLogger(__name__)
+
+CLAIM_OUTBOX_EVENTS = text(
+    """
+    UPDATE friend_outbox SET claimed_until = now() + make_interval(secs => :lease_seconds)
+    WHERE id IN (
+        SELECT id FROM friend_outbox
+        WHERE claimed_until IS NULL OR claimed_until < now()
+        ORDER BY id LIMIT :limit FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, event_type, sender_id, recipient_id, created_at
+"""
+)
+
+DELETE_OUTBOX_EVENTS = text(
+    """
+    DELETE FROM friend_outbox WHERE id = ANY(CAST(:ids AS BIGINT[]))
+"""
+)
+
+RELEASE_OUTBOX_EVENTS = text(
+    """
+    UPDATE friend_outbox SET claimed_until = NULL WHERE id = ANY(CAST(:ids AS BIGINT[]))
+"""
+)
+
+
+@dataclass
+class OutboxEvent:
+    id: int
+    # "friend_request.sent", "friend_request.accepted", "friend_request.rejected",
+    # "friend.added" or "friend.removed".
+    event_type: str
+    sender_id: str
+    recipient_id: str
+    created_at: datetime
+
+
+class InMemorySink:
+    """Collects delivered events; for tests and local runs."""
+
+    def __init__(self):
+        self.events: list[OutboxEvent] = []
+
+    async def deliver(self, events: list[OutboxEvent]) -> None:
+        self.events.extend(events)
+
+
+class JobQueueSink:
+    """
+    Turns events into background jobs named after the event type (jobs/handlers.py), so they
+    reach SQS in production, submitted as one batch (SendMessageBatch calls of 10). Events without
+    a handler are dropped. The job id is derived from the outbox id, which makes redelivered events
+    idempotent for the job queue.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+
+    async def deliver(self, events: list[OutboxEvent]) -> None:
+        jobs = [
+            Job(
+                event.event_type,
+                {"sender_id": event.sender_id, "recipient_id": event.recipient_id},
+                f"outbox-{event.id}",
+            )
+            for event in events
+            if event.event_type in self.jobs.handlers
+        ]
+        if jobs:
+            await self.jobs.submit_batch(jobs)
+
+
+class OutboxDispatcher:
+    def __init__(self, database, sink, config):
+        self.database = database
+        self.sink = sink
+        self.config = config
+        self._task: Optional[asyncio.Task] = None
+
+    async def dispatch_once(self) -> int:
+        """Claim, deliver and delete one batch; returns the number of events delivered."""
+        async with self.database.session_maker() as session:
+            async with session.begin():
+                result = await session.execute(
+                    CLAIM_OUTBOX_EVENTS,
+                    {"limit": self.config.BATCH_SIZE, "lease_seconds": self.config.LEASE_SECONDS},
+                )
+                events = sorted(
+                    (OutboxEvent(**row._mapping) for row in result.fetchall()),
+                    key=lambda event: event.id,
+                )
+            if not events:
+                return 0
+            ids = [event.id for event in events]
+            try:
+                await self.sink.deliver(events)
+            except Exception:
+                await self._release(session, ids)
+                raise
+            async with session.begin():
+                await session.execute(DELETE_OUTBOX_EVENTS, {"ids": ids})
+        return len(events)
+
+    async def _release(self, session, ids: list[int]) -> None:
+        # Best effort: the lease expires anyway.
+        try:
+            async with session.begin():
+                await session.execute(RELEASE_OUTBOX_EVENTS, {"ids": ids})
+        except Exception as e:
+            logger.warning("Failed to release outbox events: %s", e)
+
+    async def run(self, until: Optional[float] = None) -> None:
+        """
+        Dispatch until cancelled, or until loop time `until`. Full batches are followed
+        immediately by the next one; otherwise the dispatcher waits POLL_INTERVAL_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        while until is None or loop.time() < until:
+            try:
+                delivered = await self.dispatch_once()
+            except Exception as e:
+                logger.error("Outbox dispatch failed: %s", e)
+                delivered = 0
+            if delivered < self.config.BATCH_SIZE:
+                await asyncio.sleep(self.config.POLL_INTERVAL_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,159 @@
+"""
+Background job queue: endpoints enqueue side effects (notifications, cache warming, counters)
+and return; a consumer runs the handlers in batches, with retries and exponential backoff.
+
+The consumer is a task in the web process for the "inprocess" and "sqlite" transports (started
+on the first enqueue, stopped by the app lifespan), and the jobs Lambda (jobs/consumer.py) for
+"sqs". In "inline" mode handlers run inside the request, which is useful as a baseline.
+"""
+
+import asyncio
+import logging
+import random
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from core.cache import LRUCache
+from jobs.transports import Job, create_transport
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[object, dict], Awaitable[None]]
+
+
+class JobQueue:
+    # Ids of recently completed jobs, to skip duplicate deliveries seen by this process.
+    COMPLETED_IDS_KEPT = 10_000
+
+    def __init__(self, config, handlers: dict[str, Handler], state=None):
+        """`state` (the app.state) is passed to every handler with the job payload."""
+        self.config = config
+        self.handlers = handlers
+        self.state = state
+        self._transport = None
+        self._completed = LRUCache(self.COMPLETED_IDS_KEPT)
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight = 0
+
+    @property
+    def transport(self):
+        """Created on first use, so building the app imports no boto3 and opens no files."""
+        if self._transport is None and self.config.TRANSPORT != "inline":
+            self._transport = create_transport(self.config)
+        return self._transport
+
+    async def enqueue(self, name: str, payload: dict, job_id: Optional[str] = None) -> None:
+        """
+        Queue handler `name` to run with `payload`. `job_id` makes the job idempotent across
+        retried requests (same id, handled once per process); a random id is used otherwise.
+        Never raises: the request that enqueues has already done its work, so a failure to
+        enqueue is logged rather than turned into an error response.
+        """
+        try:
+            await self.submit(name, payload, job_id)
+        except Exception as e:
+            logger.error("Failed to enqueue job %s: %s", name, e, exc_info=True)
+
+    async def submit(self, name: str, payload: dict, job_id: Optional[str] = None) -> None:
+        """enqueue, but failures to enqueue (or, inline, of the handler) are raised."""
+        job = Job(name, payload, job_id or uuid.uuid4().hex)
+        if self.transport is None:
+            await self._run(job)
+            return
+        await self.transport.send(job)
+        if self.config.TRANSPORT != "sqs":
+            self._ensure_worker()
+
+    async def submit_batch(self, jobs: list[Job]) -> None:
+        """submit for several jobs at once, in as few round trips as the transport allows."""
+        if self.transport is None:
+            for job in jobs:
+                await self._run(job)
+            return
+        await self.transport.send_batch(jobs)
+        if self.config.TRANSPORT != "sqs":
+            self._ensure_worker()
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the next delivery after `attempts` failed ones (full jitter)."""
+        ceiling = min(
+            self.config.BACKOFF_MAX_SECONDS,
+            self.config.BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+        )
+        return random.uniform(0, ceiling)
+
+    async def _run(self, job: Job) -> None:
+        handler = self.handlers.get(job.name)
+        if handler is None:
+            raise LookupError(f"No handler for job {job.name}")
+        await handler(self.state, job.payload)
+
+    async def _handle(self, job: Job) -> bool:
+        """Run one delivered job and settle it with the transport; True if it succeeded."""
+        if self._completed.get(job.id):
+            await self.transport.complete(job)
+            return True
+        try:
+            await self._run(job)
+        except Exception as e:
+            attempts = job.attempts + 1
+            if attempts >= self.config.MAX_ATTEMPTS:
+                logger.error(
+                    "Job %s (%s) failed after %d attempts: %s", job.name, job.id, attempts, e,
+                    exc_info=True,
+                )
+                await self.transport.fail(job)
+            else:
+                delay = self.backoff(attempts)
+                logger.warning(
+                    "Job %s (%s) failed, retrying in %.1fs: %s", job.name, job.id, delay, e
+                )
+                await self.transport.retry(job, delay)
+            return False
+        self._completed.set(job.id, True)
+        await self.transport.complete(job)
+        return True
+
+    async def process_batch(self, jobs: list[Job]) -> list[bool]:
+        """Handle a batch of delivered jobs concurrently; one success flag per job."""
+        self._in_flight += len(jobs)
+        try:
+            return list(await asyncio.gather(*(self._handle(job) for job in jobs)))
+        finally:
+            self._in_flight -= len(jobs)
+
+    async def poll(self) -> int:
+        """Receive and handle one batch; returns the number of jobs received."""
+        jobs = await self.transport.receive(self.config.BATCH_SIZE, self.config.POLL_WAIT_SECONDS)
+        if jobs:
+            await self.process_batch(jobs)
+        return len(jobs)
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Job consumer poll failed: %s", e, exc_info=True)
+                await asyncio.sleep(self.config.POLL_WAIT_SECONDS)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._consume())
+
+    async def drain(self, timeout: float) -> None:
+        """Handle the jobs already queued (up to `timeout` seconds), then stop the consumer."""
+        if self._worker is None:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self.transport.pending() or self._in_flight) and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
@@ -0,0 +1,247 @@
+"""
+Job transports: where enqueued jobs wait until a consumer picks them up.
+
+All transports deliver at least once, so handlers must be idempotent (see jobs/handlers.py).
+send_batch enqueues several jobs in as few round trips as the transport allows.
+
+- InProcessTransport: an asyncio queue in the web process; jobs are lost on restart. Local runs
+  and tests.
+- SQLiteTransport: a table in a local SQLite file; survives restarts of a single host.
+- SQSTransport: an SQS queue, consumed only by the jobs Lambda (jobs/consumer.py); other
+  processes using it just send. Backoff uses the message visibility timeout; exhausted jobs are
+  left to the queue's redrive policy (dead-letter queue).
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class Job:
+    name: str
+    payload: dict
+    id: str
+    # Deliveries before this one.
+    attempts: int = 0
+    # Transport-specific handle (SQS receipt handle), not serialized.
+    receipt: Optional[str] = field(default=None, compare=False)
+
+    def to_json(self) -> str:
+        return json.dumps({"id": self.id, "name": self.name, "payload": self.payload})
+
+    @classmethod
+    def from_json(cls, body: str, attempts: int = 0, receipt: Optional[str] = None) -> "Job":
+        data = json.loads(body)
+        return cls(data["name"], data["payload"], data["id"], attempts, receipt)
+
+
+class InProcessTransport:
+    def __init__(self):
+        self._ready: asyncio.Queue = asyncio.Queue()
+
+    async def send(self, job: Job) -> None:
+        self._ready.put_nowait(job)
+
+    async def send_batch(self, jobs: list[Job]) -> None:
+        for job in jobs:
+            self._ready.put_nowait(job)
+
+    async def receive(self, max_jobs: int, wait_seconds: float) -> list[Job]:
+        try:
+            jobs = [await asyncio.wait_for(self._ready.get(), wait_seconds)]
+        except asyncio.TimeoutError:
+            return []
+        while len(jobs) < max_jobs and not self._ready.empty():
+            jobs.append(self._ready.get_nowait())
+        return jobs
+
+    async def complete(self, job: Job) -> None:
+        pass
+
+    async def retry(self, job: Job, delay: float) -> None:
+        job.attempts += 1
+        asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, job)
+
+    async def fail(self, job: Job) -> None:
+        pass
+
+    def pending(self) -> int:
+        return self._ready.qsize()
+
+
+class SQLiteTransport:
+    """
+    Jobs table in a SQLite file. Calls run in a thread so the event loop never waits on disk.
+    Jobs claimed by a process that died are made ready again when the transport is opened.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                state TEXT NOT NULL DEFAULT 'ready'
+            );
+            CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, available_at);
+            UPDATE jobs SET state = 'ready' WHERE state = 'claimed';
+            """
+        )
+
+    def _execute(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _insert(self, jobs: list[Job]) -> None:
+        # The job id is the primary key, so enqueueing the same job twice is a no-op.
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, body, available_at) VALUES (?, ?, ?)",
+                [(job.id, job.to_json(), now) for job in jobs],
+            )
+
+    async def send(self, job: Job) -> None:
+        await asyncio.to_thread(self._insert, [job])
+
+    async def send_batch(self, jobs: list[Job]) -> None:
+        await asyncio.to_thread(self._insert, jobs)
+
+    def _claim(self, max_jobs: int) -> list[Job]:
+        rows = self._execute(
+            """
+            UPDATE jobs SET state = 'claimed'
+            WHERE id IN (
+                SELECT id FROM jobs WHERE state = 'ready' AND available_at <= ?
+                ORDER BY available_at LIMIT ?
+            )
+            RETURNING body, attempts
+            """,
+            (time.time(), max_jobs),
+        )
+        return [Job.from_json(body, attempts) for body, attempts in rows]
+
+    async def receive(self, max_jobs: int, wait_seconds: float) -> list[Job]:
+        deadline = time.monotonic() + wait_seconds
+        while True:
+            jobs = await asyncio.to_thread(self._claim, max_jobs)
+            if jobs or time.monotonic() >= deadline:
+                return jobs
+            await asyncio.sleep(min(0.2, wait_seconds))
+
+    async def complete(self, job: Job) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    async def retry(self, job: Job, delay: float) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET state = 'ready', attempts = attempts + 1, available_at = ? WHERE id = ?",
+            (time.time() + delay, job.id),
+        )
+
+    async def fail(self, job: Job) -> None:
+        # Kept for inspection; never claimed again.
+        await asyncio.to_thread(
+            self._execute, "UPDATE jobs SET state = 'failed' WHERE id = ?", (job.id,)
+        )
+
+    def pending(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE state != 'failed'")[0][0]
+
+
+class SQSTransport:
+    """boto3 is imported here rather than at module level: it ships with the Lambda runtime but is
+    not a dependency of local runs that use the other transports."""
+
+    # SQS caps the visibility timeout at 12 hours, and SendMessageBatch at 10 messages.
+    MAX_VISIBILITY_SECONDS = 43200
+    MAX_BATCH = 10
+
+    def __init__(self, queue_url: str):
+        import boto3
+
+        self.queue_url = queue_url
+        self._client = boto3.client("sqs")
+
+    async def send(self, job: Job) -> None:
+        await asyncio.to_thread(
+            self._client.send_message, QueueUrl=self.queue_url, MessageBody=job.to_json()
+        )
+
+    def _send_chunk(self, jobs: list[Job]) -> None:
+        response = self._client.send_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[
+                {"Id": str(i), "MessageBody": job.to_json()} for i, job in enumerate(jobs)
+            ],
+        )
+        failed = response.get("Failed") or []
+        if failed:
+            codes = sorted({entry.get("Code", "?") for entry in failed})
+            raise RuntimeError(
+                f"SQS rejected {len(failed)} of {len(jobs)} messages: {', '.join(codes)}"
+            )
+
+    async def send_batch(self, jobs: list[Job]) -> None:
+        """SendMessageBatch calls of up to 10 messages, run concurrently; raises if any failed."""
+        chunks = [jobs[i : i + self.MAX_BATCH] for i in range(0, len(jobs), self.MAX_BATCH)]
+        await asyncio.gather(*(asyncio.to_thread(self._send_chunk, chunk) for chunk in chunks))
+
+    async def receive(self, max_jobs: int, wait_seconds: float) -> list[Job]:
+        response = await asyncio.to_thread(
+            self._client.receive_message,
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_jobs, 10),
+            WaitTimeSeconds=min(int(wait_seconds), 20),
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        return [self.job_from_message(message) for message in response.get("Messages", [])]
+
+    @staticmethod
+    def job_from_message(message: dict) -> Job:
+        """Job from a ReceiveMessage result or an SQS event record (which use different casing)."""
+        attributes = message.get("Attributes") or message.get("attributes") or {}
+        body = message.get("Body") or message.get("body")
+        receipt = message.get("ReceiptHandle") or message.get("receiptHandle")
+        attempts = int(attributes.get("ApproximateReceiveCount", 1)) - 1
+        return Job.from_json(body, attempts, receipt)
+
+    async def complete(self, job: Job) -> None:
+        await asyncio.to_thread(
+            self._client.delete_message, QueueUrl=self.queue_url, ReceiptHandle=job.receipt
+        )
+
+    async def retry(self, job: Job, delay: float) -> None:
+        await asyncio.to_thread(
+            self._client.change_message_visibility,
+            QueueUrl=self.queue_url,
+            ReceiptHandle=job.receipt,
+            VisibilityTimeout=min(int(delay), self.MAX_VISIBILITY_SECONDS),
+        )
+
+    async def fail(self, job: Job) -> None:
+        # Not deleted: the redrive policy moves it to the dead-letter queue.
+        pass
+
+
+def create_transport(config):
+    """Transport for a JobsConfig; None for the "inline" mode."""
+    if config.TRANSPORT == "inline":
+        return None
+    if config.TRANSPORT == "inprocess":
+        return InProcessTransport()
+    if config.TRANSPORT == "sqlite":
+        return SQLiteTransport(config.SQLITE_PATH)
+    if config.TRANSPORT == "sqs":
+        return SQSTransport(config.SQS_QUEUE_URL)
+    raise ValueError(f"Unknown jobs transport: {config.TRANSPORT}")
@@ -1,8 +1,136 @@
+"""
+Logging shared by the Lambda handler, the server and the batch jobs.
+
+Records are written as one JSON object per line by JsonFormatter. Off Lambda, the event loop only
+puts records on a queue; a QueueListener thread formats and writes them. On Lambda the runtime's
+own handler is kept (it already writes JSON for LogFormat: JSON), since a listener thread could
+still hold records when the execution environment is frozen.
+
+Info logs of high-volume routes are sampled per request (LoggingConfig.SAMPLE_RATES): a request
+either keeps all of its info records or none, and warnings and errors are always kept.
+"""
+
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from typing import Optional, TextIO
+
+import orjson
+
+from core.config import LoggingConfig
+
+# Whether the current request's info records are kept; set by LogSamplingMiddleware.
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One orjson call per record; the message, traceback and stack are escaped properly."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "module": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return orjson.dumps(entry, default=str).decode()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Like QueueHandler, but leaves rendering the JSON to the listener thread: only the message
+    arguments are merged and the traceback rendered here, since they can change or go away
+    once the call returns.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RequestSamplingFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.INFO or _sampled.get()
+
+
+class LogSamplingMiddleware:
+    """ASGI middleware deciding per request whether its info records are kept."""
+
+    def __init__(self, app, rates: dict[str, float]):
+        self.app = app
+        self.rates = rates
+
+    async def __call__(self, scope, receive, send):
+        rate = self.rates.get(scope.get("path")) if scope["type"] == "http" else None
+        if rate is None:
+            return await self.app(scope, receive, send)
+        token = _sampled.set(random.random() < rate)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _sampled.reset(token)
+
+
+def skip_unused_record_fields() -> None:
+    """
+    Stop filling in LogRecord fields JsonFormatter never writes: the caller's file, line and
+    function (a stack walk per record), thread and process names. Roughly halves the cost of a
+    record, including the ones dropped by sampling.
+    """
+    logging._srcfile = None
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+
+def create_queue_handler(
+    stream: TextIO,
+) -> tuple[logging.Handler, logging.handlers.QueueListener]:
+    """A non-blocking handler writing JSON lines to `stream`, and the listener (not started)."""
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    handler = _QueueHandler(records)
+    handler.addFilter(RequestSamplingFilter())
+    return handler, logging.handlers.QueueListener(records, output)
+
+
+def setup_logging(config: Optional[LoggingConfig] = None) -> None:
+    """Configure the root logger once per process; later calls only adjust the level."""
+    global _listener
+    config = config or LoggingConfig()
+    root = logging.getLogger()
+    root.setLevel(config.LEVEL)
+    if _listener is not None:
+        return
+    skip_unused_record_fields()
 
+    if root.handlers:
+        # The Lambda runtime (or a test harness) already installed its handlers.
+        for handler in root.handlers:
+            if not any(isinstance(f, RequestSamplingFilter) for f in handler.filters):
+                handler.addFilter(RequestSamplingFilter())
+        return
 
-def setup_logging():
-    logging.basicConfig(
-        level=logging.INFO,
-        format='{"timestamp": "%(asctime)s", "level": "%(levelname)s", "module": "%(name)s", "message": "%(message)s"}',
-    )
+    handler, _listener = create_queue_handler(sys.stderr)
+    root.addHandler(handler)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -1,29 +1,18 @@
-from fastapi import FastAPI
-from api.endpoints import user, friends
+import asyncio
 from mangum import Mangum  # Adapter to run FastAPI on AWS Lambda
-from log.logging_config import setup_logging
-import os
+from application import create_app
+from core.warmup import warmup
 
-setup_logging()
-
-app = FastAPI(title="HYE", version="1.0.0")
-
-# Include our user routes under the "/users" path.
-app.include_router(user.router, prefix="/users", tags=["users"])
-app.include_router(friends.router, prefix="/friends", tags=["friends"])
+app = create_app()
 
 # The Mangum handler wraps the ASGI app so it can be called by AWS Lambda.
-handler = Mangum(app)
-
-# import urllib.request
-
-# def handler(event, context):
-#     try:
-#         response = urllib.request.urlopen('https://cognito-idp.us-east-2.amazonaws.com/us-east-2_j7TTNd6qj/.well-known/jwks.json')
-#         status_code = response.getcode()
-#         print('Response Code:', status_code)
-#         print('Response Data:', response.read().decode('utf-8'))
-#         return status_code
-#     except Exception as e:
-#         print('Error:', e)
-#         raise e
+# Mangum would run the lifespan around every invocation (disposing the pool each time), so it is
+# switched off and the warmup runs once here, during the init phase, on the event loop Mangum
+# keeps for all later invocations. The loop is created explicitly (implicit creation by
+# get_event_loop() is deprecated) and set as current, which is the one Mangum picks up.
+handler = Mangum(app, lifespan="off")
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
+loop.run_until_complete(warmup(app))
+if app.state.memory.enabled:
+    app.state.memory.report("init")
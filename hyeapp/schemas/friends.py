@@ -3,8 +3,8 @@ This module defines Pydantic models used for validating and serializing incoming
 data related to friend management.
 """
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, Union
 
 
 class GetFriendListResponse(BaseModel):
@@ -66,3 +66,92 @@ class RemoveFriendResponse(BaseModel):
     """
 
     friend_removed: bool
+
+
+class FriendChange(BaseModel):
+    """
+    One edge of the user's friend graph that changed after the cursor.
+    direction: "sent" if the user sent the request, "received" otherwise.
+    status: "pending", "accepted" or "removed" (request rejected or friend removed).
+    username is None if the other user's account has since been deleted.
+    """
+
+    username: Optional[str]
+    direction: str
+    status: str
+
+
+class GetFriendChangesResponse(BaseModel):
+    """
+    Outgoing response model for /changes endpoint
+    Latest change per edge since the cursor, oldest first; pass next_cursor as `since` next time.
+    has_more is True if more changes are waiting after next_cursor.
+    resync_required is True if changes after the cursor have been pruned from the log; the client
+    must re-download the full lists, then continue from next_cursor.
+    """
+
+    changes: list[FriendChange]
+    next_cursor: int
+    has_more: bool
+    resync_required: bool
+
+
+class FriendSuggestion(BaseModel):
+    """A user the caller may know, with the number of friends they have in common"""
+
+    username: str
+    mutual_count: int
+
+
+class GetFriendSuggestionsResponse(BaseModel):
+    """Outgoing response model for /suggestions endpoint, most mutual friends first"""
+
+    suggestions: list[FriendSuggestion]
+
+
+class GetMutualFriendsResponse(BaseModel):
+    """
+    Outgoing response model for /mutual endpoint
+    One page of the friends both users have; pass next_offset as `offset` for the next page
+    (None on the last page).
+    """
+
+    mutual_count: int
+    mutual_friends: list[str]
+    next_offset: Optional[int]
+
+
+class FriendBatchOperation(BaseModel):
+    """
+    One operation of a /batch request.
+    op: "send" (friend request), "accept" or "reject" (a received request), or "remove" (a friend).
+    """
+
+    op: Literal["send", "accept", "reject", "remove"]
+    recipientUsername: str
+
+
+class FriendBatchRequest(BaseModel):
+    """Incoming request model for /batch endpoint; operations are applied in order"""
+
+    operations: list[FriendBatchOperation] = Field(max_length=100)
+
+
+class FriendBatchResult(BaseModel):
+    """
+    Result of one operation, in the response shape of the single-item endpoint:
+    SendFriendRequestResponse for "send", AcceptFriendRequestResponse for "accept" and "reject",
+    RemoveFriendResponse for "remove".
+    """
+
+    op: str
+    recipientUsername: str
+    result: Union[
+        SendFriendRequestResponse, AcceptFriendRequestResponse, RemoveFriendResponse
+    ]
+
+
+class FriendBatchResponse(BaseModel):
+    """Outgoing response model for /batch endpoint, one result per operation in request order"""
+
+    results: list[FriendBatchResult]
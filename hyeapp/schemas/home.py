@@ -0,0 +1,20 @@
+"""
+This module defines Pydantic models used for serializing outgoing data for the home screen.
+"""
+
+from pydantic import BaseModel
+from schemas.user import UserProfile
+
+
+class HomeResponse(BaseModel):
+    """
+    Outgoing response model for /home endpoint
+    Everything the app shows on open: the user's profile, friends and pending friend requests.
+    version is the user's friend list version the lists were read at (also the basis of the ETag).
+    """
+
+    version: int
+    profile: UserProfile
+    friends: list[str]
+    requests_sent: list[str]
+    requests_received: list[str]
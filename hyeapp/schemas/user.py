@@ -3,8 +3,8 @@ This module defines Pydantic models used for validating and serializing incoming
 data related to the User domain.
 """
 
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, StringConstraints
+from typing import Annotated, Optional
 from datetime import datetime
 
 
@@ -32,3 +32,31 @@ class UserEmailCheckResponse(BaseModel):
     """Outgoing response model for /checkUserEmailExistence endpoint"""
 
     exists: bool
+
+
+class ContactMatchRequest(BaseModel):
+    """
+    Incoming request model for /matchContacts endpoint
+    Each entry is hex(sha256(lower(trim(email)))) of one of the caller's contacts.
+    """
+
+    emailHashes: list[Annotated[str, StringConstraints(pattern=r"^[0-9a-fA-F]{64}$")]] = Field(
+        max_length=10000
+    )
+
+
+class ContactMatch(BaseModel):
+    """
+    One contact that is a registered user.
+    friendship_status: "friends", "request_sent", "request_received" or "none".
+    """
+
+    email_hash: str
+    username: str
+    friendship_status: str
+
+
+class ContactMatchResponse(BaseModel):
+    """Outgoing response model for /matchContacts endpoint"""
+
+    matches: list[ContactMatch]
@@ -0,0 +1,57 @@
+"""
+Entry point for running the API as a long-running server (e.g. a container behind a load balancer).
+
+    python server.py
+
+Runs HYE_SERVER_WORKERS uvicorn worker processes, each building the app with the same factory as
+the Lambda handler. On SIGTERM uvicorn stops accepting connections, lets in-flight requests finish
+for up to HYE_SERVER_GRACEFUL_SHUTDOWN_SECONDS, then runs the lifespan shutdown, which disposes
+the connection pool.
+
+Unlike on Lambda, responses can be streamed here, so the /friends/events stream is enabled unless
+HYE_EVENTS_ENABLED says otherwise. Each worker also admits at most as many requests at once as its
+connection pool holds (core/admission.py) unless HYE_ADMISSION_MAX_CONCURRENCY says otherwise.
+"""
+
+import logging
+import os
+import uvicorn
+from core.config import Settings
+from log.logging_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    # Set before the workers start, so the app factory in each of them sees it.
+    os.environ.setdefault("HYE_EVENTS_ENABLED", "true")
+    settings = Settings()
+    os.environ.setdefault(
+        "HYE_ADMISSION_MAX_CONCURRENCY",
+        str(settings.db.DB_POOL_SIZE + settings.db.DB_MAX_OVERFLOW),
+    )
+    logger.info(
+        "Starting %d worker(s) on %s:%d with a DB pool of %d (+%d overflow) each",
+        settings.server.WORKERS,
+        settings.server.HOST,
+        settings.server.PORT,
+        settings.db.DB_POOL_SIZE,
+        settings.db.DB_MAX_OVERFLOW,
+    )
+    uvicorn.run(
+        "application:create_app",
+        factory=True,
+        host=settings.server.HOST,
+        port=settings.server.PORT,
+        workers=settings.server.WORKERS,
+        loop=settings.server.LOOP,
+        http=settings.server.HTTP,
+        timeout_graceful_shutdown=settings.server.GRACEFUL_SHUTDOWN_SECONDS,
+        # The app configures its own JSON logging in create_app.
+        log_config=None,
+    )
+
+
+if __name__ == "__main__":
+    setup_logging()
+    main()
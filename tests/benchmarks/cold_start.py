@@ -0,0 +1,125 @@
+"""
+Cold-start benchmark for the Lambda handler.
+
+Every measurement spawns a fresh interpreter so nothing is shared with the current process,
+which is what a Lambda init phase sees. Run from the repository root:
+
+    python -m tests.benchmarks.cold_start [--runs N] [--report PATH]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HYEAPP_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "hyeapp"
+)
+
+# Executed in the child interpreter: time `import main`, then one request through the Mangum handler.
+# /openapi.json needs no token or database, so it measures framework cost on the first request only.
+_CHILD_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+event = {
+    "resource": "/{proxy+}",
+    "path": "/openapi.json",
+    "httpMethod": "GET",
+    "headers": {"Host": "localhost"},
+    "multiValueHeaders": {},
+    "queryStringParameters": None,
+    "multiValueQueryStringParameters": None,
+    "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "stage": "Prod"},
+    "body": None,
+    "isBase64Encoded": False,
+}
+response = main.handler(event, None)
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "first_request_s": t2 - t1, "status": response["statusCode"]}))
+"""
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = HYEAPP_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    # Behave like the Lambda runtime, which skips local .env loading.
+    env.setdefault("AWS_LAMBDA_FUNCTION_NAME", "cold-start-benchmark")
+    # The init-phase warmup depends on the network (RDS, Cognito); set HYE_WARMUP_ENABLED=true
+    # in the calling environment to include it in the measurement.
+    env.setdefault("HYE_WARMUP_ENABLED", "false")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def profile_imports(module: str = "main") -> list[tuple[str, int, int]]:
+    """
+    Import `module` in a fresh interpreter with `-X importtime` and return
+    (module, self_us, cumulative_us) rows sorted by cumulative import cost.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HYEAPP_DIR,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+
+def format_import_report(rows: list[tuple[str, int, int]], limit: int = 50) -> str:
+    """Render the rows of `profile_imports` as a fixed-width text report."""
+    lines = [f"{'cumulative ms':>14} {'self ms':>9}  module"]
+    for name, self_us, cumulative_us in rows[:limit]:
+        lines.append(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    return "\n".join(lines) + "\n"
+
+
+def measure_cold_start() -> dict:
+    """Time `import main` and the first request in a fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-c", _CHILD_SCRIPT],
+        cwd=HYEAPP_DIR,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--report", help="Write the import-time report to this path.")
+    args = parser.parse_args()
+
+    report = format_import_report(profile_imports())
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+    samples = [measure_cold_start() for _ in range(args.runs)]
+    for key in ("import_s", "first_request_s"):
+        values = [sample[key] * 1000 for sample in samples]
+        print(
+            f"{key[:-2]:<16} median {statistics.median(values):8.1f} ms"
+            f"   min {min(values):8.1f} ms   max {max(values):8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Request latency of a friend mutation endpoint with its fan-out run inline vs. offloaded to the
+background job queue (HYE_JOBS_TRANSPORT=inline vs. inprocess).
+
+The endpoint is a stand-in for sendFriendRequest registered by this benchmark: same auth and
+session dependencies, a simulated write (--db-ms) and one enqueued job whose handler stands in
+for a push notification call (--fanout-ms). sendFriendRequest itself no longer enqueues, its
+events come from the friend outbox, so it pays the offloaded cost minus the enqueue.
+Run from the repository root:
+
+    python -m tests.benchmarks.job_offload [--requests N] [--concurrency C]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+from tests.benchmarks.cold_start import HYEAPP_DIR
+
+if HYEAPP_DIR not in sys.path:
+    sys.path.insert(0, HYEAPP_DIR)
+
+import httpx
+
+from fastapi import Depends
+
+from api.auth import verify_token
+from application import create_app
+from core.config import JobsConfig, Settings, WarmupConfig
+from db.session import get_db_session
+
+
+def _build_app(transport: str, db_ms: float, fanout_ms: float, handled: list):
+    app = create_app(
+        Settings(warmup=WarmupConfig(ENABLED=False), jobs=JobsConfig(TRANSPORT=transport))
+    )
+
+    async def no_session():
+        yield None
+
+    @app.post("/bench/sendFriendRequest")
+    async def send_friend_request(
+        token_payload: dict = Depends(verify_token), db=Depends(get_db_session)
+    ):
+        await asyncio.sleep(db_ms / 1000)
+        await app.state.jobs.enqueue("friend_request.sent", {"sender_id": token_payload["sub"]})
+        return {"friend_request_sent": True, "friend_request_already_exist": False}
+
+    async def fanout(state, payload):
+        await asyncio.sleep(fanout_ms / 1000)
+        handled.append(payload)
+
+    # Per-request info logs would dominate both modes equally.
+    logging.disable(logging.INFO)
+    app.dependency_overrides[verify_token] = lambda: {"sub": "user-1"}
+    app.dependency_overrides[get_db_session] = no_session
+    app.state.jobs.handlers = {"friend_request.sent": fanout}
+    return app
+
+
+async def _run(transport: str, args) -> tuple[list[float], float]:
+    """Per-request latencies (ms), and the time until every fan-out job had run (s)."""
+    handled = []
+    app = _build_app(transport, args.db_ms, args.fanout_ms, handled)
+    latencies = []
+    remaining = args.requests
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await client.post("/bench/sendFriendRequest")
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        await app.state.jobs.drain(timeout=60)
+        assert len(handled) == args.requests
+        return latencies, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--db-ms", type=float, default=2.0)
+    parser.add_argument("--fanout-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'p50 ms':>8} {'p99 ms':>8} {'all jobs done s':>16}")
+    for transport in ("inline", "inprocess"):
+        latencies, total = asyncio.run(_run(transport, args))
+        p99 = statistics.quantiles(latencies, n=100)[98]
+        print(f"{transport:<10} {statistics.median(latencies):>8.2f} {p99:>8.2f} {total:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
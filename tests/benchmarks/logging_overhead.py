@@ -0,0 +1,113 @@
+"""
+Per-request logging overhead of GET /friends/getFriendList, before and after the logging rework.
+
+"before" is the old setup: a logging.basicConfig format string and a StreamHandler writing on the
+calling thread, with the endpoint's eager f-strings (including the whole friend list). "after" is
+log/logging_config.py: lazy arguments, a friend count instead of the list, and a queue handler
+whose listener thread renders and writes the JSON; shown with all requests logged and with the
+default sampling rate of the polling endpoints. Output goes to a pipe read by a child process, as
+stdout is in a container, or to os.devnull with --devnull. Run from the repository root:
+
+    python -m tests.benchmarks.logging_overhead [--requests N] [--friends F] [--devnull]
+"""
+
+import argparse
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+from tests.benchmarks.cold_start import HYEAPP_DIR
+
+if HYEAPP_DIR not in sys.path:
+    sys.path.insert(0, HYEAPP_DIR)
+
+from log import logging_config
+from log.logging_config import create_queue_handler, skip_unused_record_fields
+
+OLD_FORMAT = (
+    '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "module": "%(name)s", '
+    '"message": "%(message)s"}'
+)
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.handlers = [handler]
+    return logger
+
+
+def old_request(logger: logging.Logger, user_id: str, friends: list[str]) -> None:
+    logger.info(f"Acquired signing key")
+    logger.info(f"Getting friend list for user: {user_id}")
+    logger.info(f"Friend list for user {user_id}: {friends}")
+
+
+def new_request(logger: logging.Logger, user_id: str, friends: list[str]) -> None:
+    logger.info("Acquired signing key")
+    logger.info("Getting friend list for user: %s", user_id)
+    logger.info("Friend list for user %s: %d friends", user_id, len(friends))
+
+
+def bench(request, logger, requests: int, friends: list[str], rate: float = 1.0) -> float:
+    """Microseconds per request spent on the calling (event loop) thread."""
+    elapsed = 0.0
+    for i in range(requests):
+        token = logging_config._sampled.set(random.random() < rate)
+        started = time.perf_counter()
+        request(logger, f"user-{i}", friends)
+        elapsed += time.perf_counter() - started
+        logging_config._sampled.reset(token)
+    return elapsed / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--friends", type=int, default=200)
+    parser.add_argument("--devnull", action="store_true")
+    args = parser.parse_args()
+    friends = [f"user_{i:06d}" for i in range(args.friends)]
+    rate = logging_config.LoggingConfig().SAMPLE_RATES.get("/friends/getFriendList", 1.0)
+
+    if args.devnull:
+        reader = None
+        output = open(os.devnull, "w")
+    else:
+        drain_stdin = f"import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open({os.devnull!r}, 'wb'))"
+        reader = subprocess.Popen(
+            [sys.executable, "-c", drain_stdin], stdin=subprocess.PIPE, text=True
+        )
+        output = reader.stdin
+
+    old_handler = logging.StreamHandler(output)
+    old_handler.setFormatter(logging.Formatter(OLD_FORMAT))
+    old = _logger("bench.old", old_handler)
+    before = bench(old_request, old, args.requests, friends)
+
+    skip_unused_record_fields()
+    handler, listener = create_queue_handler(output)
+    new = _logger("bench.new", handler)
+    listener.start()
+    after = bench(new_request, new, args.requests, friends)
+    sampled = bench(new_request, new, args.requests, friends, rate)
+    started = time.perf_counter()
+    listener.stop()
+    drain = time.perf_counter() - started
+    output.close()
+    if reader is not None:
+        reader.wait()
+
+    print(f"{'setup':<32} {'us/request on loop':>20}")
+    print(f"{'before (sync, f-strings)':<32} {before:>20.1f}")
+    print(f"{'after (queue, lazy)':<32} {after:>20.1f}")
+    print(f"{f'after, sampled at {rate:g}':<32} {sampled:>20.1f}")
+    print(f"listener backlog drained in {drain * 1000:.0f} ms after the run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Per-request overhead of the metrics middleware (core/metrics.py).
+
+Drives a trivial ASGI app directly, with and without MetricsMiddleware, so the difference is the
+middleware alone: the request timings context, the latency measurement and four histogram
+updates (latency plus the auth, db and serialize phases reported by the app). Histograms are
+flushed to os.devnull at the Lambda rate (every request) and at the server rate (every 60 s).
+Run from the repository root:
+
+    python -m tests.benchmarks.metrics_overhead [--requests N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from tests.benchmarks.cold_start import HYEAPP_DIR
+
+if HYEAPP_DIR not in sys.path:
+    sys.path.insert(0, HYEAPP_DIR)
+
+from core import timing
+from core.config import MetricsConfig
+from core.metrics import MetricsMiddleware, MetricsRegistry
+
+ROUTE = SimpleNamespace(path="/friends/getFriendList")
+
+
+async def app(scope, receive, send):
+    scope["route"] = ROUTE
+    for phase in ("auth", "db", "serialize"):
+        timing.record(phase, 0.001)
+
+
+async def _per_request_us(handler, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await handler({"type": "http", "path": "/friends/getFriendList"}, None, None)
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        results = {"bare app": asyncio.run(_per_request_us(app, args.requests))}
+        for label, interval in (("flush every 60 s", 60), ("flush every request", 0)):
+            config = MetricsConfig(FLUSH_INTERVAL_SECONDS=interval)
+            middleware = MetricsMiddleware(app, MetricsRegistry(config, devnull), config)
+            results[label] = asyncio.run(_per_request_us(middleware, args.requests))
+
+    bare = results["bare app"]
+    print(f"{'':<22} {'us/request':>11} {'overhead us':>12}")
+    for label, us in results.items():
+        print(f"{label:<22} {us:>11.2f} {us - bare:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Serialization microbenchmark for friend list responses.
+
+Compares the classic FastAPI response path (dump the returned model, re-validate it against
+response_model, jsonable_encoder, json.dumps) with ModelResponse (one pydantic-core pass).
+Run from the repository root:
+
+    python -m tests.benchmarks.serialization
+"""
+
+import sys
+import timeit
+
+from tests.benchmarks.cold_start import HYEAPP_DIR
+
+if HYEAPP_DIR not in sys.path:
+    sys.path.insert(0, HYEAPP_DIR)
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.responses import ModelResponse
+from schemas.friends import GetFriendListResponse
+
+SIZES = (10, 1_000, 10_000)
+
+
+def classic_path(model: GetFriendListResponse) -> bytes:
+    data = model.model_dump(by_alias=True)
+    value = GetFriendListResponse.model_validate(data)
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+def model_response_path(model: GetFriendListResponse) -> bytes:
+    return ModelResponse(model).body
+
+
+def main() -> None:
+    print(f"{'friends':>8} {'classic us':>12} {'ModelResponse us':>17} {'speedup':>8}")
+    for size in SIZES:
+        model = GetFriendListResponse(friends=[f"user_{i:06d}" for i in range(size)])
+        assert classic_path(model).replace(b" ", b"") == model_response_path(model)
+        number = max(1, 100_000 // size)
+        classic = min(timeit.repeat(lambda: classic_path(model), number=number, repeat=5))
+        fast = min(timeit.repeat(lambda: model_response_path(model), number=number, repeat=5))
+        print(
+            f"{size:>8} {classic / number * 1e6:>12.1f} {fast / number * 1e6:>17.1f}"
+            f" {classic / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Throughput of the Mangum (Lambda) path against the uvicorn server path (server.py).
+
+Both paths serve GET /health from the same app factory, so the numbers compare the adapter and
+server overhead rather than auth or database work. Run from the repository root:
+
+    python -m tests.benchmarks.throughput [--requests N] [--workers W] [--concurrency C]
+
+The Mangum path is driven sequentially in-process, which is how a Lambda container handles
+invocations (one at a time). The server path is started as a subprocess and driven over HTTP.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from tests.benchmarks.cold_start import HYEAPP_DIR, _child_env
+
+_HEALTH_EVENT = {
+    "resource": "/{proxy+}",
+    "path": "/health",
+    "httpMethod": "GET",
+    "headers": {"Host": "localhost"},
+    "multiValueHeaders": {},
+    "queryStringParameters": None,
+    "multiValueQueryStringParameters": None,
+    "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "GET", "stage": "Prod"},
+    "body": None,
+    "isBase64Encoded": False,
+}
+
+
+def bench_mangum(requests: int) -> float:
+    """Return requests/second through the Mangum handler in this process."""
+    os.environ.update({k: v for k, v in _child_env().items() if k.startswith(("HYE_", "AWS_"))})
+    if HYEAPP_DIR not in sys.path:
+        sys.path.insert(0, HYEAPP_DIR)
+    import main
+
+    main.handler(_HEALTH_EVENT, None)
+    started = time.perf_counter()
+    for _ in range(requests):
+        main.handler(_HEALTH_EVENT, None)
+    return requests / (time.perf_counter() - started)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _drive_http(port: int, path: str, requests: int, concurrency: int) -> float:
+    """
+    Keep-alive load generator on raw asyncio streams; an HTTP client library in the same
+    process would saturate before the server does.
+    """
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+    remaining = requests
+
+    async def fetch(reader, writer):
+        writer.write(request)
+        status_line = await reader.readline()
+        if b" 200 " not in status_line:
+            raise RuntimeError(f"unexpected response: {status_line!r}")
+        length = 0
+        while (line := await reader.readline()) != b"\r\n":
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await reader.readexactly(length)
+
+    async def worker():
+        nonlocal remaining
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                await fetch(reader, writer)
+        finally:
+            writer.close()
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await fetch(reader, writer)
+    writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+def _server_env() -> dict:
+    """
+    _child_env() without the Lambda runtime's variables, which would give the server Lambda
+    behaviour (an EMF flush on every request, the Lambda logging path).
+    """
+    env = _child_env()
+    for name in list(env):
+        if name.startswith(("AWS_LAMBDA_", "_X_AMZN_")) or name in (
+            "AWS_EXECUTION_ENV",
+            "LAMBDA_TASK_ROOT",
+        ):
+            del env[name]
+    return env
+
+
+def bench_server(requests: int, workers: int, concurrency: int) -> float:
+    """Return requests/second against `python server.py` started with `workers` processes."""
+    port = _free_port()
+    env = _server_env()
+    env.update(
+        HYE_SERVER_HOST="127.0.0.1",
+        HYE_SERVER_PORT=str(port),
+        HYE_SERVER_WORKERS=str(workers),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "server.py"],
+        cwd=HYEAPP_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            except OSError:
+                if time.monotonic() > deadline or proc.poll() is not None:
+                    raise RuntimeError("server.py did not start")
+                time.sleep(0.1)
+        return asyncio.run(_drive_http(port, "/health", requests, concurrency))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    server_rps = bench_server(args.requests, args.workers, args.concurrency)
+    mangum_rps = bench_mangum(args.requests)
+    # The Mangum figure excludes API Gateway and Lambda invoke overhead, which the server path
+    # pays no equivalent of; it is an upper bound for a single warm container.
+    print(f"mangum (1 invocation at a time)    {mangum_rps:10.0f} req/s")
+    print(
+        f"uvicorn ({args.workers} workers, {args.concurrency} conc.)"
+        f"   {server_rps:10.0f} req/s   ({server_rps / args.workers:.0f} req/s per worker)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The Lambda code root is hyeapp/ (see CodeUri in template.yaml), so the application modules
+# import each other as top-level packages (`api`, `db`, `dbcrud`, ...).
+HYEAPP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hyeapp")
+if HYEAPP_DIR not in sys.path:
+    sys.path.insert(0, HYEAPP_DIR)
@@ -0,0 +1,78 @@
+import asyncio
+
+import httpx
+
+from core.admission import CACHED_READ, READ, WRITE, AdmissionController, AdmissionMiddleware
+from core.config import AdmissionConfig
+
+
+def _config(**overrides):
+    defaults = dict(MAX_CONCURRENCY=1, MAX_QUEUE=2, QUEUE_TIMEOUT_SECONDS=1, RETRY_AFTER_SECONDS=3)
+    return AdmissionConfig(**{**defaults, **overrides})
+
+
+def test_waiters_are_admitted_by_priority_and_displaced_when_full():
+    async def main():
+        controller = AdmissionController(_config())
+        order = []
+
+        async def request(name, priority):
+            admitted = await controller.acquire(priority)
+            order.append((name, admitted))
+            if admitted:
+                await asyncio.sleep(0)
+                controller.release()
+
+        assert await controller.acquire(READ)
+        tasks = [asyncio.create_task(request("write", WRITE))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("read", READ)))
+        await asyncio.sleep(0)
+        # The queue is full: the cached read displaces the write, a second write is refused.
+        tasks.append(asyncio.create_task(request("cached", CACHED_READ)))
+        await asyncio.sleep(0)
+        assert not await controller.acquire(WRITE)
+
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert order == [("write", False), ("cached", True), ("read", True)]
+        assert (controller.active, controller.queued) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_frees_the_place():
+    async def main():
+        controller = AdmissionController(_config(QUEUE_TIMEOUT_SECONDS=0.01))
+        assert await controller.acquire(READ)
+        assert not await controller.acquire(READ)
+        assert controller.queued == 0
+        controller.release()
+        assert controller.active == 0
+
+    asyncio.run(main())
+
+
+def test_overloaded_requests_get_503_with_retry_after():
+    async def main():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        middleware = AdmissionMiddleware(app, _config(MAX_QUEUE=0))
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/friends/getFriendList"))
+            await asyncio.sleep(0.01)
+            shed = await client.post("/friends/sendFriendRequest")
+            release.set()
+            exempt = await client.get("/health")
+            assert (await first).status_code == 200
+
+        assert shed.status_code == 503 and shed.headers["retry-after"] == "3"
+        assert exempt.status_code == 200
+
+    asyncio.run(main())
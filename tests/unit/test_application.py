@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from fastapi import Depends
+from fastapi.testclient import TestClient
+
+from api.auth import verify_token
+from application import create_app
+from core.config import DatabaseConfig, Settings, WarmupConfig
+from db.session import get_db_session
+
+
+def _settings(**db):
+    return Settings(db=DatabaseConfig(**db), warmup=WarmupConfig(ENABLED=False))
+
+
+def test_create_app_is_lazy_and_isolated():
+    small = create_app(_settings(DB_POOL_SIZE=1, DB_HOST="db-a"))
+    large = create_app(_settings(DB_POOL_SIZE=20, DB_HOST="db-b"))
+
+    # Building an app must not create an engine.
+    assert small.state.database._engine is None
+    assert large.state.database._engine is None
+
+    assert small.state.database.engine.pool.size() == 1
+    assert large.state.database.engine.pool.size() == 20
+    assert small.state.database.engine.url.host == "db-a"
+    assert small.state.database.engine is small.state.database.engine
+    assert small.state.verifier is not large.state.verifier
+
+
+def test_dependencies_resolve_from_app_state():
+    app = create_app(_settings())
+    seen = {}
+
+    class _Verifier:
+        async def verify(self, token):
+            if token != "good":
+                raise ValueError("bad token")
+            return {"sub": "user-1"}
+
+    class _Session:
+        async def __aenter__(self):
+            return "session"
+
+        async def __aexit__(self, *exc):
+            return False
+
+    app.state.verifier = _Verifier()
+    async def dispose():
+        pass
+
+    app.state.database = SimpleNamespace(session_maker=_Session, dispose=dispose)
+
+    @app.get("/probe")
+    async def probe(payload: dict = Depends(verify_token), db=Depends(get_db_session)):
+        seen.update(payload=payload, db=db)
+        return {}
+
+    with TestClient(app) as client:
+        assert client.get("/probe", headers={"Authorization": "Bearer good"}).status_code == 200
+        assert client.get("/probe", headers={"Authorization": "Bearer bad"}).status_code == 401
+
+    assert seen == {"payload": {"sub": "user-1"}, "db": "session"}
@@ -0,0 +1,145 @@
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError
+
+import dbcrud.friends as dbcrudfriends
+from api.auth import verify_token
+from application import create_app
+from core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from core.config import Settings, WarmupConfig
+from db.session import (
+    DatabaseUnavailable,
+    get_db_session,
+    instrument_breaker,
+    is_connection_failure,
+)
+
+
+def test_breaker_opens_fails_fast_and_probes():
+    now = [0.0]
+    breaker = CircuitBreaker("db", failures=3, reset_seconds=10, clock=lambda: now[0])
+
+    breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    now[0] = 4.5
+    assert breaker.retry_after == 6
+
+    # One probe after the reset time; its failure reopens the breaker at once.
+    now[0] = 10
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] = 20
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_connection_failures():
+    class _PostgresError(Exception):
+        def __init__(self, sqlstate):
+            self.sqlstate = sqlstate
+
+    assert is_connection_failure(ConnectionRefusedError())
+    assert is_connection_failure(TimeoutError())
+    assert is_connection_failure(_PostgresError("57P03"))  # cannot connect now, e.g. failover
+    assert is_connection_failure(_PostgresError("08006"))
+    assert not is_connection_failure(_PostgresError("23505"))  # unique violation
+    assert not is_connection_failure(ValueError())
+
+
+def test_friend_list_is_served_stale_while_the_database_is_unavailable(monkeypatch):
+    available = [True]
+
+    async def get_friend_list_version(user_id, db):
+        if not available[0]:
+            raise DatabaseUnavailable(retry_after=7)
+        return 3
+
+    async def get_friend_list(user_id, db):
+        return ["alice"] if user_id == "user-1" else ["bob"]
+
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list_version", get_friend_list_version)
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list", get_friend_list)
+
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+
+    async def no_db():
+        yield None
+
+    user = {"sub": "user-1"}
+    app.dependency_overrides[verify_token] = lambda: user
+    app.dependency_overrides[get_db_session] = no_db
+    client = TestClient(app)
+
+    fresh = client.get("/friends/getFriendList")
+    assert fresh.status_code == 200 and "x-hye-stale" not in fresh.headers
+
+    available[0] = False
+    stale = client.get("/friends/getFriendList")
+    assert stale.status_code == 200
+    assert stale.json() == {"friends": ["alice"]}
+    assert stale.headers["x-hye-stale"] == "true"
+    assert int(stale.headers["age"]) >= 0
+    assert stale.headers["etag"] == fresh.headers["etag"]
+    revalidated = client.get(
+        "/friends/getFriendList", headers={"If-None-Match": fresh.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["x-hye-stale"] == "true"
+
+    # Nothing cached for this user: the 503 goes through.
+    user["sub"] = "user-2"
+    unavailable = client.get("/friends/getFriendList")
+    assert unavailable.status_code == 503
+    assert unavailable.headers["retry-after"] == "7"
+
+
+def test_failures_on_a_checked_out_connection_raise_database_unavailable():
+    engine = create_engine("sqlite://")
+    breaker = CircuitBreaker("db", failures=2, reset_seconds=10)
+    instrument_breaker(SimpleNamespace(sync_engine=engine), breaker)
+    failure = [None]
+
+    @event.listens_for(engine, "do_execute")
+    def do_execute(cursor, statement, parameters, context):
+        if failure[0] is not None:
+            raise failure[0]
+
+    class _Disconnected(sqlite3.OperationalError):
+        sqlstate = "57P01"  # terminating connection due to administrator command
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        # asyncpg raises a bare TimeoutError when a statement exceeds its command_timeout.
+        failure[0] = TimeoutError()
+        with pytest.raises(DatabaseUnavailable) as raised:
+            conn.execute(text("SELECT 2"))
+        assert raised.value.status_code == 503
+        assert isinstance(raised.value.__cause__, TimeoutError)
+        assert breaker.failures == 1
+
+    with engine.connect() as conn:
+        failure[0] = _Disconnected()
+        with pytest.raises(DatabaseUnavailable) as raised:
+            conn.execute(text("SELECT 3"))
+        assert breaker.state == OPEN
+        assert raised.value.headers["Retry-After"] == "10"
+
+    # Errors in the statement itself still reach the CRUD functions as SQLAlchemy errors.
+    breaker.record_success()
+    with engine.connect() as conn:
+        failure[0] = sqlite3.IntegrityError("UNIQUE constraint failed")
+        with pytest.raises(IntegrityError):
+            conn.execute(text("SELECT 4"))
+    assert breaker.state == CLOSED and breaker.failures == 0
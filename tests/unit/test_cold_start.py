@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+from tests.benchmarks.cold_start import (
+    HYEAPP_DIR,
+    _child_env,
+    format_import_report,
+    profile_imports,
+)
+
+# Modules that must not be imported while the Lambda init phase imports `main`.
+DEFERRED_MODULES = ("passlib", "httpx", "dotenv")
+
+
+def test_import_profile_report(tmp_path):
+    """Write the per-module cumulative import cost of `main` as a test artifact"""
+    rows = profile_imports("main")
+    assert rows[0][0] == "main"
+
+    artifact_dir = os.environ.get("HYE_TEST_ARTIFACT_DIR", str(tmp_path))
+    os.makedirs(artifact_dir, exist_ok=True)
+    with open(os.path.join(artifact_dir, "import_profile.txt"), "w") as f:
+        f.write(format_import_report(rows))
+
+
+def test_main_does_not_import_deferred_modules():
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, main; print(','.join(m for m in %r if m in sys.modules))"
+            % (DEFERRED_MODULES,),
+        ],
+        cwd=HYEAPP_DIR,
+        env=_child_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert proc.stdout.strip() == ""
@@ -0,0 +1,56 @@
+import asyncio
+import hashlib
+
+import pytest
+from pydantic import ValidationError
+
+import dbcrud.user as dbcruduser
+from schemas.user import ContactMatchRequest
+
+
+def _hash(email):
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class _Row:
+    def __init__(self, **mapping):
+        self._mapping = mapping
+
+
+class _Session:
+    def __init__(self):
+        self.chunks = []
+
+    async def execute(self, statement, params):
+        self.chunks.append(params["email_hashes"])
+        return _Result(
+            [_Row(email_hash=h.hex(), username="u", friendship_status="none") for h in params["email_hashes"][:1]]
+        )
+
+
+def test_match_contacts_dedupes_and_chunks(monkeypatch):
+    monkeypatch.setattr(dbcruduser, "CONTACT_MATCH_CHUNK_SIZE", 2)
+    hashes = [_hash(f"user{i}@example.com") for i in range(5)]
+    db = _Session()
+
+    matches = asyncio.run(dbcruduser.match_contacts("me", hashes + hashes[:2], db))
+
+    assert [len(chunk) for chunk in db.chunks] == [2, 2, 1]
+    assert sorted(h for chunk in db.chunks for h in chunk) == sorted(bytes.fromhex(h) for h in hashes)
+    assert len(matches) == 3
+
+
+def test_contact_match_request_validates_hashes():
+    assert ContactMatchRequest(emailHashes=[_hash(" Alice@Example.com ")])
+    with pytest.raises(ValidationError):
+        ContactMatchRequest(emailHashes=["alice@example.com"])
+    with pytest.raises(ValidationError):
+        ContactMatchRequest(emailHashes=[_hash("a")] * 10001)
@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+
+import dbcrud.friends as dbcrudfriends
+from api.auth import verify_token
+from api.etag import if_none_match, make_etag
+from application import create_app
+from core.config import Settings, WarmupConfig
+from db.session import get_db_session
+
+
+def test_make_etag_is_strong_and_scoped():
+    etag = make_etag("friends", "user-1", 3)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag("friends", "user-1", 3)
+    assert etag != make_etag("friends", "user-2", 3)
+    assert etag != make_etag("friends", "user-1", 4)
+    assert etag != make_etag("requests", "user-1", 3)
+
+
+def test_if_none_match():
+    etag = make_etag("friends", "user-1", 3)
+    assert if_none_match(etag, etag)
+    assert if_none_match(f'"other", W/{etag}', etag)
+    assert if_none_match("*", etag)
+    assert not if_none_match(None, etag)
+    assert not if_none_match('"other"', etag)
+
+
+def test_friend_list_not_modified_skips_list_queries(monkeypatch):
+    calls = []
+
+    async def get_friend_list_version(user_id, db):
+        return 7
+
+    async def get_friend_list(user_id, db):
+        calls.append(user_id)
+        return ["alice"]
+
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list_version", get_friend_list_version)
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list", get_friend_list)
+
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[verify_token] = lambda: {"sub": "user-1"}
+    app.dependency_overrides[get_db_session] = no_db
+    client = TestClient(app)
+
+    first = client.get("/friends/getFriendList")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+
+    second = client.get("/friends/getFriendList", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+    assert calls == ["user-1"]
@@ -0,0 +1,55 @@
+from dbcrud.friends import plan_friend_batch
+
+EDGES = {
+    "pending_in": ("id-in", ("received", "pending")),
+    "pending_out": ("id-out", ("sent", "pending")),
+    "friend": ("id-friend", ("received", "accepted")),
+    "stranger": ("id-stranger", None),
+}
+
+
+def test_plan_results_match_single_item_endpoints():
+    results, changes = plan_friend_batch(
+        "me",
+        [
+            ("send", "nobody"),
+            ("send", "friend"),
+            ("send", "pending_out"),
+            ("send", "stranger"),
+            ("accept", "pending_in"),
+            ("remove", "friend"),
+            ("remove", "stranger"),
+        ],
+        EDGES,
+    )
+
+    assert results == [
+        {"friend_request_sent": False, "friend_request_already_exist": False},
+        {"friend_request_sent": True, "friend_request_already_exist": True},
+        {"friend_request_sent": False, "friend_request_already_exist": True},
+        {"friend_request_sent": True, "friend_request_already_exist": False},
+        {"friend_request_accepted": True},
+        {"friend_removed": True},
+        {"friend_removed": False},
+    ]
+    assert changes == {
+        "delete": [("id-friend", "me")],
+        "accept": ["id-in"],
+        "insert": ["id-stranger"],
+    }
+
+
+def test_plan_nets_out_sequential_operations():
+    results, changes = plan_friend_batch(
+        "me",
+        [("reject", "pending_in"), ("send", "pending_in"), ("accept", "pending_out")],
+        EDGES,
+    )
+
+    assert results == [
+        {"friend_request_accepted": False},
+        {"friend_request_sent": True, "friend_request_already_exist": False},
+        {"friend_request_accepted": False},
+    ]
+    # The received request is replaced by one sent the other way; nothing else changes.
+    assert changes == {"delete": [("id-in", "me")], "accept": [], "insert": ["id-in"]}
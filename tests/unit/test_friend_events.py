@@ -0,0 +1,59 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from api.auth import verify_token
+from api.endpoints.friends import _friend_event_stream
+from application import create_app
+from core.config import DatabaseConfig, Settings, WarmupConfig
+from core.friend_events import FriendEventHub
+
+
+class _Hub(FriendEventHub):
+    async def _ensure_listening(self):
+        pass
+
+
+def test_notifications_wake_both_users_and_coalesce():
+    async def scenario():
+        hub = _Hub(DatabaseConfig())
+        sender = await hub.subscribe("user-1")
+        recipient = await hub.subscribe("user-2")
+        bystander = await hub.subscribe("user-3")
+
+        hub.publish("user-1,user-2")
+        hub.publish("user-1,user-2")
+        assert await sender.wait(0.01)
+        assert not await sender.wait(0.01)
+        assert await recipient.wait(0.01)
+        assert not await bystander.wait(0.01)
+
+        hub.unsubscribe(sender)
+        hub.unsubscribe(bystander)
+        assert len(hub) == 1
+        assert hub._subscribers.keys() == {"user-2"}
+
+    asyncio.run(scenario())
+
+
+def test_event_stream_sends_changes_and_heartbeats_then_unsubscribes():
+    async def scenario():
+        hub = _Hub(DatabaseConfig())
+        subscription = await hub.subscribe("user-1")
+        stream = _friend_event_stream(hub, subscription, heartbeat=0.01)
+
+        assert await stream.__anext__() == b"event: ready\ndata: {}\n\n"
+        assert await stream.__anext__() == b": heartbeat\n\n"
+        hub.publish("user-2,user-1")
+        assert await stream.__anext__() == b"event: friends_changed\ndata: {}\n\n"
+        await stream.aclose()
+        assert len(hub) == 0
+
+    asyncio.run(scenario())
+
+
+def test_events_endpoint_is_off_unless_enabled():
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+    app.state.settings.events.ENABLED = False
+    app.dependency_overrides[verify_token] = lambda: {"sub": "user-1"}
+    assert TestClient(app).get("/friends/events").status_code == 404
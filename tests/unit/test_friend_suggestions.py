@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+import batch.friend_suggestions as friend_suggestions
+from batch.friend_suggestions import build_matrix, top_k_mutual_friends
+
+
+def _edges(pairs):
+    senders, recipients = zip(*pairs)
+    return np.array(senders, dtype=np.int32), np.array(recipients, dtype=np.int32)
+
+
+def _collect(adjacency, pending, k, block_rows):
+    suggestions = {}
+    for _, users, ranks, suggested, counts in top_k_mutual_friends(adjacency, pending, k, block_rows):
+        for user, rank, other, count in zip(users, ranks, suggested, counts):
+            suggestions.setdefault(int(user), []).append((int(rank), int(other), int(count)))
+    return suggestions
+
+
+def test_top_k_mutual_friends_masks_friends_pending_and_self():
+    # 0 is friends with 1, 2, 3; 4 is friends with 1, 2; 5 is friends with 3.
+    adjacency = build_matrix(*_edges([(0, 1), (0, 2), (0, 3), (4, 1), (4, 2), (5, 3)]), 7, symmetric=True)
+    # 5 has a pending request to 0; 6 has no friends at all.
+    pending = build_matrix(*_edges([(5, 0)]), 7, symmetric=False)
+
+    for block_rows in (1, 3, 7):
+        suggestions = _collect(adjacency, pending, k=2, block_rows=block_rows)
+        # 0 and 4 share two friends; 5 is excluded for 0 because of the pending request.
+        assert suggestions[0] == [(0, 4, 2)]
+        assert suggestions[4] == [(0, 0, 2)]
+        # 1's friends are 0 and 4: 2 is a friend of both, 3 only of 0.
+        assert suggestions[1] == [(0, 2, 2), (1, 3, 1)]
+        assert 6 not in suggestions
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalar_one(self):
+        return len(self.rows)
+
+    async def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start : start + size]
+
+
+class _Connection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, statement, params):
+        return _Result(self.rows)
+
+    async def stream(self, statement, params):
+        return _Result(self.rows)
+
+
+def test_edges_of_unknown_users_are_dropped():
+    user_ids = np.sort(np.array(["b", "d", "f"], dtype=str))
+    # "a" sorts before every id, "c" between two and "g" after all of them.
+    rows = [("b", "d"), ("a", "b"), ("d", "c"), ("f", "b"), ("d", "g"), ("b", "f")]
+
+    senders, recipients = asyncio.run(
+        friend_suggestions._load_edges(_Connection(rows), "accepted", user_ids, fetch_size=4)
+    )
+
+    assert list(zip(senders.tolist(), recipients.tolist())) == [(0, 1), (2, 0), (0, 2)]
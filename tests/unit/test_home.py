@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import dbcrud.friends as dbcrudfriends
+import dbcrud.user as dbcruduser
+from api.auth import verify_token
+from application import create_app
+from core.config import Settings, WarmupConfig
+from db.session import get_session_maker
+from models.models import Users
+
+
+class _Session:
+    opened = 0
+
+    async def __aenter__(self):
+        _Session.opened += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _client(monkeypatch, in_flight):
+    async def read(value):
+        in_flight.append(1)
+        await asyncio.sleep(0.01)
+        # Every read must still be in flight when the last one starts.
+        assert len(in_flight) >= 3
+        return value
+
+    async def get_friend_list_version(user_id, db):
+        return 5
+
+    async def get_user_profile(user_id, db):
+        return await read(Users(user_id, "alice", "alice@example.com", datetime(2025, 1, 1)))
+
+    async def get_friend_list(user_id, db):
+        return await read(["bob"])
+
+    async def get_friend_request_list(user_id, db):
+        return await read((["carol"], ["dave"]))
+
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list_version", get_friend_list_version)
+    monkeypatch.setattr(dbcruduser, "get_user_profile", get_user_profile)
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list", get_friend_list)
+    monkeypatch.setattr(dbcrudfriends, "get_friend_request_list", get_friend_request_list)
+
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+    app.dependency_overrides[verify_token] = lambda: {"sub": "user-1"}
+    app.dependency_overrides[get_session_maker] = lambda: _Session
+    return TestClient(app)
+
+
+def test_home_reads_concurrently_and_supports_304(monkeypatch):
+    client = _client(monkeypatch, in_flight=[])
+
+    response = client.get("/home")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["version"] == 5
+    assert body["profile"]["username"] == "alice"
+    assert body["friends"] == ["bob"]
+    assert (body["requests_sent"], body["requests_received"]) == (["carol"], ["dave"])
+
+    opened = _Session.opened
+    again = client.get("/home", headers={"If-None-Match": response.headers["etag"]})
+    assert again.status_code == 304
+    # Only the version probe ran.
+    assert _Session.opened == opened + 1
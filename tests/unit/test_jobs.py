@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from core.config import JobsConfig
+from jobs.queue import JobQueue
+from jobs.transports import Job, SQLiteTransport, SQSTransport
+
+
+def _config(**overrides):
+    values = dict(
+        TRANSPORT="inprocess",
+        POLL_WAIT_SECONDS=0.01,
+        MAX_ATTEMPTS=3,
+        BACKOFF_BASE_SECONDS=0.001,
+        BACKOFF_MAX_SECONDS=0.01,
+    )
+    values.update(overrides)
+    return JobsConfig(**values)
+
+
+def test_enqueued_jobs_are_handled_in_the_background_with_retries():
+    calls = []
+
+    async def flaky(state, payload):
+        calls.append(payload["n"])
+        if payload["n"] == 1 and calls.count(1) < 3:
+            raise RuntimeError("transient")
+
+    async def scenario():
+        queue = JobQueue(_config(), {"flaky": flaky})
+        await queue.enqueue("flaky", {"n": 0})
+        await queue.enqueue("flaky", {"n": 1})
+        assert calls == []
+        await asyncio.sleep(0.3)
+        await queue.drain(timeout=1)
+
+    asyncio.run(scenario())
+    assert calls.count(0) == 1
+    assert calls.count(1) == 3
+
+
+def test_job_is_dropped_after_max_attempts_and_duplicates_are_skipped():
+    calls = []
+
+    async def failing(state, payload):
+        calls.append(payload)
+        raise RuntimeError("permanent")
+
+    async def ok(state, payload):
+        calls.append(payload)
+
+    async def scenario():
+        queue = JobQueue(_config(), {"failing": failing, "ok": ok})
+        job = Job("failing", {}, "job-1", attempts=2)
+        assert await queue.process_batch([job]) == [False]
+        assert queue.transport.pending() == 0
+
+        duplicate = [Job("ok", {}, "job-2"), Job("ok", {}, "job-2")]
+        assert await queue.process_batch(duplicate[:1]) == [True]
+        assert await queue.process_batch(duplicate[1:]) == [True]
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_inline_mode_runs_handler_during_enqueue():
+    calls = []
+
+    async def handler(state, payload):
+        calls.append((state, payload))
+
+    async def scenario():
+        queue = JobQueue(_config(TRANSPORT="inline"), {"job": handler}, state="state")
+        await queue.enqueue("job", {"n": 1})
+
+    asyncio.run(scenario())
+    assert calls == [("state", {"n": 1})]
+
+
+def test_sqlite_transport_dedupes_claims_and_recovers(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+
+    async def scenario():
+        transport = SQLiteTransport(path)
+        await transport.send(Job("a", {"x": 1}, "id-1"))
+        await transport.send_batch([Job("a", {"x": 1}, "id-1"), Job("b", {}, "id-2")])
+        assert transport.pending() == 2
+
+        jobs = await transport.receive(max_jobs=1, wait_seconds=0)
+        assert [job.id for job in jobs] == ["id-1"]
+        await transport.retry(jobs[0], delay=60)
+        assert [job.id for job in await transport.receive(10, 0)] == ["id-2"]
+
+        # id-2 is still claimed; a new process makes it ready again.
+        reopened = SQLiteTransport(path)
+        [job] = await reopened.receive(10, 0)
+        assert (job.id, job.name, job.attempts) == ("id-2", "b", 0)
+        await reopened.complete(job)
+        assert reopened.pending() == 1
+
+    asyncio.run(scenario())
+
+
+def test_sqs_event_record_to_job():
+    record = {
+        "messageId": "m-1",
+        "receiptHandle": "handle",
+        "body": Job("a", {"x": 1}, "id-1").to_json(),
+        "attributes": {"ApproximateReceiveCount": "3"},
+    }
+    job = SQSTransport.job_from_message(record)
+    assert (job.id, job.name, job.payload, job.attempts, job.receipt) == (
+        "id-1", "a", {"x": 1}, 2, "handle"
+    )
+
+
+def test_sqs_send_batch_uses_batches_of_ten_and_raises_on_failures():
+    class _Client:
+        def __init__(self):
+            self.batches = []
+
+        def send_message_batch(self, QueueUrl, Entries):
+            self.batches.append([entry["MessageBody"] for entry in Entries])
+            failed = [{"Id": entry["Id"], "Code": "Throttled"} for entry in Entries[:1]]
+            return {"Failed": failed if "fail" in Entries[0]["MessageBody"] else []}
+
+    transport = SQSTransport.__new__(SQSTransport)
+    transport.queue_url = "queue"
+    transport._client = _Client()
+
+    jobs = [Job("a", {}, f"id-{i}") for i in range(23)]
+    asyncio.run(transport.send_batch(jobs))
+    assert sorted(len(batch) for batch in transport._client.batches) == [3, 10, 10]
+    assert sorted(sum(transport._client.batches, [])) == sorted(job.to_json() for job in jobs)
+
+    with pytest.raises(RuntimeError, match="Throttled"):
+        asyncio.run(transport.send_batch([Job("a", {}, "fail-1")]))
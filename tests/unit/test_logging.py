@@ -0,0 +1,58 @@
+import asyncio
+import io
+import json
+import logging
+
+from log.logging_config import LogSamplingMiddleware, create_queue_handler
+
+
+def _logged(emit):
+    stream = io.StringIO()
+    handler, listener = create_queue_handler(stream)
+    logger = logging.getLogger("tests.logging")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    listener.start()
+    try:
+        emit(logger)
+    finally:
+        listener.stop()
+        logger.removeHandler(handler)
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_valid_json_with_separate_exception():
+    def emit(logger):
+        logger.info('User "%s" said: \\ %s', "bob", {"a": [1]})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.error("Failed", exc_info=True)
+
+    info, error = _logged(emit)
+    assert info["message"] == 'User "bob" said: \\ {\'a\': [1]}'
+    assert (info["level"], info["module"]) == ("INFO", "tests.logging")
+    assert error["message"] == "Failed"
+    assert "ValueError: boom" in error["exception"]
+
+
+def test_sampled_out_requests_keep_only_warnings():
+    async def app(scope, receive, send):
+        logger = logging.getLogger("tests.logging")
+        logger.info("polled %s", scope["path"])
+        logger.warning("slow %s", scope["path"])
+
+    def emit(logger):
+        middleware = LogSamplingMiddleware(app, {"/sampled": 0.0, "/kept": 1.0})
+        for path in ("/sampled", "/kept", "/other"):
+            asyncio.run(middleware({"type": "http", "path": path}, None, None))
+
+    messages = [entry["message"] for entry in _logged(emit)]
+    assert messages == [
+        "slow /sampled",
+        "polled /kept",
+        "slow /kept",
+        "polled /other",
+        "slow /other",
+    ]
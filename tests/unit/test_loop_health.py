@@ -0,0 +1,66 @@
+import asyncio
+import io
+import json
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from core.config import MetricsConfig
+from core.loop_health import LoopMonitor
+from core.metrics import MetricsRegistry
+from db.session import instrument_pool
+
+
+def _flushed(registry, stream):
+    registry.flush()
+    return {doc["Route"]: doc for doc in map(json.loads, stream.getvalue().splitlines())}
+
+
+def test_pool_state_is_recorded_at_checkout():
+    stream = io.StringIO()
+    registry = MetricsRegistry(MetricsConfig(FLUSH_INTERVAL_SECONDS=60), stream)
+    engine = create_engine("sqlite://", poolclass=QueuePool)
+    instrument_pool(SimpleNamespace(sync_engine=engine), registry)
+
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("SELECT 1"))
+        second.execute(text("SELECT 1"))
+    with engine.connect():
+        pass
+
+    pool = _flushed(registry, stream)["pool"]
+    units = {m["Name"]: m["Unit"] for m in pool["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert units["pool_checked_out"] == "Count"
+    assert units["pool_connection_age"] == "Seconds"
+    # Counts are exact: one checkout with one connection out, two with two.
+    assert pool["pool_checked_out"] == {"Values": [1, 2], "Counts": [2, 1]}
+    assert pool["pool_connections"] == {"Values": [1, 2], "Counts": [1, 2]}
+    assert sum(pool["pool_checkout_wait"]["Counts"]) == 3
+
+
+def test_blocked_loop_is_recorded_and_its_stack_logged(caplog):
+    stream = io.StringIO()
+    registry = MetricsRegistry(MetricsConfig(FLUSH_INTERVAL_SECONDS=60), stream)
+    monitor = LoopMonitor(
+        registry, MetricsConfig(LOOP_PROBE_INTERVAL_SECONDS=0.01, LOOP_STALL_MS=50)
+    )
+
+    def verify_signature_synchronously():
+        time.sleep(0.2)
+
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        verify_signature_synchronously()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(main())
+
+    loop = _flushed(registry, stream)["event_loop"]
+    assert sum(loop["loop_lag"]["Counts"]) >= 3
+    assert loop["loop_stall"]["Counts"] == [1]
+    assert max(loop["loop_stall"]["Values"]) > 100
+    assert "verify_signature_synchronously" in caplog.text
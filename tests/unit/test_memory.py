@@ -0,0 +1,52 @@
+import io
+import json
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from application import create_app
+from core.config import MemoryConfig, MetricsConfig, Settings, WarmupConfig
+from core.memory import MemoryMonitor
+from core.metrics import MetricsRegistry
+
+
+def test_reports_every_n_requests():
+    app = create_app(
+        Settings(warmup=WarmupConfig(ENABLED=False), memory=MemoryConfig(EVERY_N_REQUESTS=2))
+    )
+    stream = app.state.memory.stream = io.StringIO()
+    client = TestClient(app)
+
+    for _ in range(5):
+        client.get("/health")
+
+    reports = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [report["memory"] for report in reports] == ["after 2 requests", "after 4 requests"]
+    assert reports[0]["rss_mb"] > 0
+
+
+def test_tracemalloc_reports_growth_since_init():
+    config = MemoryConfig(EVERY_N_REQUESTS=1, TRACEMALLOC=True, TOP=5)
+    stream = io.StringIO()
+    registry = MetricsRegistry(MetricsConfig(FLUSH_INTERVAL_SECONDS=60), io.StringIO())
+    monitor = MemoryMonitor(config, registry, stream)
+    leaked = []
+    monitor.start()
+    try:
+        init = monitor.report("init")
+        leaked.extend(bytearray(1000) for _ in range(2000))
+        report = monitor.report("after 1 requests")
+    finally:
+        tracemalloc.stop()
+
+    assert "growth_since_init" not in init and init["top"]
+    growth = report["growth_since_init"][0]
+    assert growth["where"].endswith(f"test_memory.py:{_leak_line()}")
+    assert growth["kb"] > 1900
+    assert report["growth_since_previous"][0]["where"] == growth["where"]
+    assert set(registry._routes["memory"]) == {"rss", "traced"}
+
+
+def _leak_line() -> int:
+    with open(__file__) as f:
+        return next(i for i, line in enumerate(f, 1) if "leaked.extend" in line)
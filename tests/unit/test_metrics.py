@@ -0,0 +1,80 @@
+import io
+import json
+
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from application import create_app
+from core import timing
+from core.config import MetricsConfig, Settings, WarmupConfig
+from core.metrics import MetricsRegistry
+
+
+def test_flush_writes_one_emf_document_per_route():
+    stream = io.StringIO()
+    registry = MetricsRegistry(MetricsConfig(NAMESPACE="Test", FLUSH_INTERVAL_SECONDS=60), stream)
+    for seconds in (0.010, 0.010, 0.100):
+        registry.record_request("/a", seconds, {"db": 0.004})
+    registry.record_request("/b", 0.002, {})
+    registry.flush()
+
+    a, b = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert a["Route"] == "/a"
+    [directive] = a["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == "Test"
+    assert directive["Dimensions"] == [["Route"]]
+    assert {metric["Name"] for metric in directive["Metrics"]} == {"latency", "db"}
+    assert a["latency"]["Counts"] == [2, 1]
+    # Bucket values are within ~10% of the observations (milliseconds).
+    assert abs(a["latency"]["Values"][0] - 10) < 1 and abs(a["latency"]["Values"][1] - 100) < 10
+    assert b["Route"] == "/b" and b["latency"]["Counts"] == [1]
+
+    registry.flush()
+    assert len(stream.getvalue().splitlines()) == 2
+
+
+def test_middleware_records_route_template_and_phases():
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+    stream = io.StringIO()
+    app.state.metrics.stream = stream
+
+    assert TestClient(app).get("/health").status_code == 200
+    TestClient(app).get("/no-such-route")
+    app.state.metrics.flush()
+
+    documents = {doc["Route"]: doc for doc in map(json.loads, stream.getvalue().splitlines())}
+    assert documents.keys() == {"/health", "unmatched"}
+    assert documents["/health"]["latency"]["Counts"] == [1]
+
+
+def _timing_app(mode, token_payload):
+    app = create_app(
+        Settings(
+            warmup=WarmupConfig(ENABLED=False),
+            metrics=MetricsConfig(SERVER_TIMING=mode, FLUSH_INTERVAL_SECONDS=60),
+        )
+    )
+
+    @app.get("/timed")
+    async def timed_route(request: Request):
+        request.state.token_payload = token_payload
+        timing.record("db", 0.0125)
+        return {}
+
+    return TestClient(app)
+
+
+def test_server_timing_header_is_gated_by_mode_header_and_claim():
+    debug = {"cognito:groups": ["debug"]}
+    asked = {"X-Server-Timing": "1"}
+
+    response = _timing_app("claim", debug).get("/timed", headers=asked)
+    entries = response.headers["server-timing"].split(", ")
+    assert entries[0] == "db;dur=12.50"
+    assert entries[-1].startswith("total;dur=")
+
+    assert "server-timing" not in _timing_app("claim", {}).get("/timed", headers=asked).headers
+    assert "server-timing" not in _timing_app("claim", debug).get("/timed").headers
+    assert "server-timing" in _timing_app("header", {}).get("/timed", headers=asked).headers
+    assert "server-timing" in _timing_app("always", {}).get("/timed").headers
+    assert "server-timing" not in _timing_app("off", debug).get("/timed", headers=asked).headers
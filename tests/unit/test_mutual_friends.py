@@ -0,0 +1,38 @@
+from array import array
+
+from core.cache import LRUCache
+from core.friend_graph import FriendSetCache, build_friend_set, intersect_sorted, user_key
+
+
+def test_intersect_sorted_returns_positions_in_first_array():
+    a = array("q", [1, 3, 5, 7, 9])
+    b = array("q", [0, 3, 4, 9, 10])
+    assert intersect_sorted(a, b) == [1, 4]
+    assert intersect_sorted(a, array("q")) == []
+
+
+def test_build_friend_set_orders_ids_by_key():
+    friend_set = build_friend_set(3, ["carol", "alice", "bob", "alice"])
+    assert list(friend_set.keys) == sorted(user_key(id_) for id_ in ("alice", "bob", "carol"))
+    assert [user_key(id_) for id_ in friend_set.user_ids] == list(friend_set.keys)
+
+    mutual = build_friend_set(1, ["bob", "dave", "carol"])
+    positions = intersect_sorted(friend_set.keys, mutual.keys)
+    assert sorted(friend_set.user_ids[i] for i in positions) == ["bob", "carol"]
+
+
+def test_friend_set_cache_misses_on_newer_version():
+    cache = FriendSetCache(max_users=2)
+    cache.set("user-1", build_friend_set(4, ["user-2"]))
+    assert cache.get("user-1", 4).user_ids == ("user-2",)
+    assert cache.get("user-1", 5) is None
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
@@ -0,0 +1,69 @@
+import asyncio
+import time
+from collections import Counter
+
+from core import profiling
+from core.config import ProfilingConfig
+from core.profiling import ProfilingMiddleware, StackSampler
+
+
+async def _wait_for_rows():
+    await asyncio.sleep(0.05)
+
+
+def _verify_signature():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+async def _app(scope, receive, send):
+    await _wait_for_rows()
+    _verify_signature()
+
+
+def _profile(config, headers=()):
+    written = []
+    middleware = ProfilingMiddleware(_app, config)
+    middleware.write = lambda scope, seconds, counts: written.append(counts)
+    scope = {"type": "http", "path": "/p", "method": "GET", "headers": list(headers)}
+    asyncio.run(middleware(scope, None, None))
+    return written
+
+
+def test_profiles_cover_awaited_and_running_time():
+    [counts] = _profile(ProfilingConfig(RATE=1.0, INTERVAL_MS=1))
+    awaiting = sum(n for stack, n in counts.items() if "_wait_for_rows" in stack)
+    running = sum(n for stack, n in counts.items() if "_verify_signature" in stack)
+    assert awaiting > 5 and running > 2
+    assert any(stack.endswith("[await Future]") for stack in counts)
+    # Stacks start at the request's root coroutine, not in the event loop.
+    assert all(stack.startswith("ProfilingMiddleware.__call__") for stack in counts)
+
+
+def test_secret_header_selects_requests():
+    config = ProfilingConfig(RATE=0.0, SECRET="s3cret", INTERVAL_MS=1)
+    assert _profile(config) == []
+    assert _profile(config, [(b"x-profile", b"wrong")]) == []
+    assert len(_profile(config, [(b"x-profile", b"s3cret")])) == 1
+
+
+def test_counts_are_final_once_sampling_stops(monkeypatch):
+    sampler = StackSampler(interval=60)
+
+    async def main():
+        task = asyncio.current_task()
+        counts = sampler.start(task)
+        assert sampler._active.is_set()
+
+        # The request finishes while the sampler thread is walking its stack.
+        def stop_then_walk(frame, root_code):
+            sampler.stop(task)
+            return ["handler"]
+
+        monkeypatch.setattr(profiling, "_running_stack", stop_then_walk)
+        sampler.sample()
+        return counts
+
+    assert asyncio.run(main()) == Counter()
+    assert not sampler._active.is_set()
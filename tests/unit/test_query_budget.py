@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import dbcrud.friends as dbcrudfriends
+from api.auth import verify_token
+from application import create_app
+from core.config import DatabaseConfig, Settings, WarmupConfig
+from db.session import (
+    QueryBudgetExceeded,
+    begin_query_stats,
+    check_query_budget,
+    get_db_session,
+    get_session_maker,
+    instrument_engine,
+    query_budget,
+)
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    instrument_engine(SimpleNamespace(sync_engine=engine))
+    return engine
+
+
+def test_statements_are_counted_and_repeats_flagged():
+    engine = _engine()
+    stats = begin_query_stats()
+    with engine.connect() as conn:
+        for _ in range(3):
+            conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+
+    assert stats.statements == 4
+    assert stats.seconds > 0
+    assert stats.fingerprints["SELECT 1"] == 3
+
+    @query_budget(4)
+    def endpoint():
+        pass
+
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        check_query_budget(stats, "/x", endpoint, "raise")
+
+    endpoint.query_budget = (3, 3)
+    with pytest.raises(QueryBudgetExceeded, match="ran 4 statements .*budget 3"):
+        check_query_budget(stats, "/x", endpoint, "raise")
+    check_query_budget(stats, "/x", endpoint, "off")
+
+
+def test_over_budget_request_is_warned_or_raised(monkeypatch, caplog):
+    engine = _engine()
+
+    async def remove_friend(sender_id, recipient_username, db):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return True
+
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(dbcrudfriends, "remove_friend", remove_friend)
+
+    for mode in ("warn", "raise"):
+        settings = Settings(
+            db=DatabaseConfig(DB_QUERY_BUDGET=mode), warmup=WarmupConfig(ENABLED=False)
+        )
+        app = create_app(settings)
+        app.state.database = SimpleNamespace(session_maker=_Session)
+        app.dependency_overrides[verify_token] = lambda: {"sub": "user-1"}
+        # As a client sees it: the budget is checked before the response goes out.
+        client = TestClient(app, raise_server_exceptions=False)
+
+        response = client.post("/friends/removeFriend", json={"recipientUsername": "bob"})
+        if mode == "warn":
+            assert response.status_code == 200
+            assert "/friends/removeFriend ran 2 statements" in caplog.text
+        else:
+            assert response.status_code == 500
+
+
+def test_every_database_route_declares_a_budget():
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+
+    def dependencies(dependant):
+        for dependency in dependant.dependencies:
+            yield dependency.call
+            yield from dependencies(dependency)
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        calls = set(dependencies(route.dependant))
+        if calls & {get_db_session, get_session_maker}:
+            assert hasattr(route.endpoint, "query_budget"), route.path
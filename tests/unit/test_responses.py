@@ -0,0 +1,61 @@
+import json
+
+from fastapi.testclient import TestClient
+
+import dbcrud.friends as dbcrudfriends
+import dbcrud.user as dbcruduser
+from api.auth import verify_token
+from api.responses import ModelResponse
+from application import create_app
+from core.config import Settings, WarmupConfig
+from db.session import get_db_session
+from models.models import Users
+from schemas.friends import GetFriendListResponse
+
+
+def _client():
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False)))
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[verify_token] = lambda: {"sub": "user-1"}
+    app.dependency_overrides[get_db_session] = no_db
+    return TestClient(app)
+
+
+def test_model_response_renders_model_and_plain_data():
+    model = GetFriendListResponse(friends=["a", 'quote"d'])
+    assert json.loads(ModelResponse(model).body) == {"friends": ["a", 'quote"d']}
+    assert ModelResponse({"status": "ok"}).body == b'{"status":"ok"}'
+
+
+def test_friend_list_endpoint_uses_model_response(monkeypatch):
+    async def get_friend_list_version(user_id, db):
+        return 0
+
+    async def get_friend_list(user_id, db):
+        return ["alice", "bob"]
+
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list_version", get_friend_list_version)
+    monkeypatch.setattr(dbcrudfriends, "get_friend_list", get_friend_list)
+
+    response = _client().get("/friends/getFriendList")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == {"friends": ["alice", "bob"]}
+
+
+def test_signup_keeps_created_status(monkeypatch):
+    async def create_user(db, user):
+        return Users(created_at=None, **user)
+
+    monkeypatch.setattr(dbcruduser, "create_user", create_user)
+
+    response = _client().post(
+        "/users/signup", json={"email": "a@example.com", "username": "alice"}
+    )
+
+    assert response.status_code == 201
+    assert response.json()["id"] == "user-1"
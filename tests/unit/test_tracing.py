@@ -0,0 +1,115 @@
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from api.responses import ModelResponse
+from application import create_app
+from core import tracing
+from core.config import Settings, TracingConfig, WarmupConfig
+from core.tracing import XRayExporter, parse_trace_header
+from db.session import instrument_engine
+
+
+def _client(tmp_path, rate):
+    path = tmp_path / "traces.jsonl"
+    config = TracingConfig(EXPORTER="file", FILE_PATH=str(path), RATE=rate)
+    app = create_app(Settings(warmup=WarmupConfig(ENABLED=False), tracing=config))
+    engine = create_engine("sqlite://")
+    instrument_engine(SimpleNamespace(sync_engine=engine))
+
+    @app.get("/probe")
+    async def probe():
+        with tracing.span("verify_token"):
+            pass
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return ModelResponse({"ok": True})
+
+    def spans():
+        if not path.exists():
+            return []
+        return [json.loads(line) for line in path.read_text().splitlines()]
+
+    return TestClient(app), spans
+
+
+def test_sampled_request_exports_nested_spans(tmp_path):
+    client, spans = _client(tmp_path, rate=1.0)
+
+    assert client.get("/probe").status_code == 200
+
+    by_name = {span["name"]: span for span in spans()}
+    root = by_name["GET /probe"]
+    assert root["parent_id"] is None and root["attributes"] == {"status": 200}
+    assert by_name["SQL"]["attributes"] == {"statement": "SELECT 1"}
+    for name in ("verify_token", "SQL", "serialize"):
+        assert by_name[name]["parent_id"] == root["span_id"]
+        assert by_name[name]["trace_id"] == root["trace_id"]
+        assert root["start"] <= by_name[name]["start"] <= by_name[name]["end"] <= root["end"]
+
+
+def test_sampling_decision_follows_the_incoming_header(tmp_path):
+    client, spans = _client(tmp_path, rate=0.0)
+
+    client.get("/probe")
+    assert spans() == []
+
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    client.get("/probe", headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+    root = next(span for span in spans() if span["name"] == "GET /probe")
+    assert (root["trace_id"], root["parent_id"]) == (trace_id, parent_id)
+
+    (tmp_path / "sampled").mkdir()
+    client, spans = _client(tmp_path / "sampled", rate=1.0)
+    header = "Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=0"
+    client.get("/probe", headers={"x-amzn-trace-id": header})
+    assert spans() == []
+
+
+def test_spans_outside_sampled_requests_are_no_ops():
+    assert tracing.start_span("SQL") is None
+    with tracing.span("serialize") as span:
+        assert span is None
+
+
+def test_xray_documents():
+    assert parse_trace_header(
+        "Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1"
+    ) == ("5759e988bd862e3fe1be46a994272793", "53995c3f42cd8ad8", True)
+
+    root = tracing.Span("GET /x", "5759e988bd862e3fe1be46a994272793", None, [], {})
+    statement = root.child("SQL", {"statement": "SELECT 1"})
+    statement.finish(ValueError("boom"))
+    root.finish()
+
+    segment = XRayExporter.document(root, "hye-api")
+    assert segment["trace_id"] == "1-5759e988-bd862e3fe1be46a994272793"
+    assert segment["name"] == "hye-api" and "type" not in segment
+    subsegment = XRayExporter.document(statement, "hye-api")
+    assert subsegment["type"] == "subsegment" and subsegment["parent_id"] == root.span_id
+    assert subsegment["sql"] == {"sanitized_query": "SELECT 1"}
+    assert subsegment["fault"] is True
+
+
+def test_malformed_trace_headers_are_ignored(tmp_path):
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    for header in (
+        f"00-{trace_id}-{parent_id}-zz",
+        f"00-{trace_id}-{parent_id}-1",
+        f"00-{'g' * 32}-{parent_id}-01",
+        f"00-{'0' * 32}-{parent_id}-01",
+        f"00-{trace_id}-{'0' * 16}-01",
+        "Root=1-5759e988-bd86;Parent=53995c3f42cd8ad8;Sampled=1",
+        "Root=1-5759e988-bd862e3fe1be46a994272793;Parent=xyz;Sampled=1",
+        "Root=2-5759e988-bd862e3fe1be46a994272793;Sampled=1",
+        "Sampled=1;",
+    ):
+        assert parse_trace_header(header) == (None, None, None), header
+
+    client, spans = _client(tmp_path, rate=1.0)
+    response = client.get("/probe", headers={"traceparent": f"00-{trace_id}-{parent_id}-zz"})
+    assert response.status_code == 200
+    root = next(span for span in spans() if span["name"] == "GET /probe")
+    assert root["trace_id"] != trace_id and root["parent_id"] is None
@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.config import Settings, WarmupConfig
+import core.warmup as warmup_module
+
+
+class _UnreachableDatabase:
+    @property
+    def engine(self):
+        raise ConnectionRefusedError("database is down")
+
+
+class _SlowVerifier:
+    async def fetch_jwks(self):
+        await asyncio.sleep(10)
+
+
+def _app(warmup_config):
+    state = SimpleNamespace(
+        settings=Settings(warmup=warmup_config),
+        database=_UnreachableDatabase(),
+        verifier=_SlowVerifier(),
+    )
+    return SimpleNamespace(state=state)
+
+
+def test_warmup_steps_are_bounded_and_never_raise():
+    app = _app(WarmupConfig(ENABLED=True, STEP_TIMEOUT_SECONDS=0.05))
+
+    results = asyncio.run(warmup_module.warmup(app))
+
+    assert results == {"db_connection": False, "jwks": False}
+
+
+def test_warmup_disabled():
+    app = _app(WarmupConfig(ENABLED=False))
+    assert asyncio.run(warmup_module.warmup(app)) == {}